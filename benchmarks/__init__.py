@@ -0,0 +1,14 @@
+"""
+fJson 基准测试，在仓库根目录用 python -m benchmarks.<模块> 运行，不随包发布
+
+suite           全部语料上的词法分析、解析、编码吞吐量，可以保存结果并在之后的运行中检查性能回退
+corpus          suite使用的语料
+bench_lexer     词法分析吞吐量
+bench_decode    decode吞吐量以及分组表的复用次数
+bench_literal   只含字面量的分组跳过表达式匹配器的收益
+bench_encode    encode吞吐量，与json.dumps对比
+bench_file      decode_file的峰值内存
+bench_depth     深层嵌套时各个引擎每一层的耗时
+bench_batch     decode_batch随工作进程数的扩展
+bench_parallel  decode_parallel的吞吐量
+"""
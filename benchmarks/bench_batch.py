@@ -0,0 +1,64 @@
+"""
+decode_batch 吞吐量随工作进程数的扩展
+
+在仓库根目录运行:
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --workers 1,2,4,8 --items 20000
+
+生成大量互相独立的LLM输出风格的短文本，对每个工作进程数先预热进程池，再报告decode_batch的吞吐量、
+相对单进程(workers=1，在当前进程中解析)的加速比和并行效率(加速比/进程数)
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from fJson import fjson
+
+
+def make_corpus(items=20000, seed=0):
+    # 每一项都是一段单独的回复: 带注释和不带引号键的字典、多行字符串、列表
+    rng = random.Random(seed)
+    return [
+        '// response %d\n{role: assistant, id: %d, score: %.3f, tags: [a, b, c], '
+        'content: R"text(line one\n    line "two" %d\n)text", ok: %s}' % (i, i, rng.random(), i, rng.choice(('true', 'false')))
+        for i in range(items)
+    ]
+
+
+def measure(texts, workers, chunksize, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, _, error in fjson.decode_batch(texts, workers=workers, chunksize=chunksize):
+            if error is not None:
+                raise error
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=','.join(str(x) for x in sorted({1, 2, 4, os.cpu_count() or 1})))
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--chunksize', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    texts = make_corpus(args.items)
+    print('%d items, %d CPUs' % (len(texts), os.cpu_count() or 1))
+    single = None
+    for workers in [int(x) for x in args.workers.split(',')]:
+        # 预热: 创建进程池，之后的调用复用同一组工作进程
+        list(fjson.decode_batch(texts[:workers * args.chunksize], workers=workers, chunksize=args.chunksize))
+        elapsed = measure(texts, workers, args.chunksize, args.repeat)
+        single = elapsed if single is None else single
+        print('workers %3d %10.0f items/s   speedup %5.2fx   efficiency %3.0f%%' % (
+            workers, len(texts) / elapsed, single / elapsed, single / elapsed / workers * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+decode 吞吐量基准
+
+在仓库根目录运行:
+    python -m benchmarks.bench_decode
+    python -m benchmarks.bench_decode --engine parser --baseline old_fjson.py
+
+使用与bench_lexer相同的语料，报告decode的吞吐量；builder引擎还会报告顶层分组表的扫描次数和复用次数，
+即各个匹配器共用分组表省去的重复扫描。--baseline的含义与bench_lexer相同，当前版本更慢时以非零状态退出
+"""
+import argparse
+import sys
+import time
+
+from fJson import fjson
+from benchmarks.bench_lexer import make_corpus, load_module
+
+
+def measure(module, text, engine, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        module.decode(text, engine=engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def group_counters(text, engine):
+    tokens = fjson.fJsonTokenStream(text).extend(fjson.fJsonLexer().iter_tokens(text))
+    fjson.decode_tokens(tokens, engine)
+    return tokens.group_scans, tokens.group_hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help='path of another fjson.py to compare against')
+    parser.add_argument('--engine', default='builder')
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = load_module(args.baseline) if args.baseline else None
+    slower = False
+    for name, text in make_corpus(args.records).items():
+        elapsed = measure(fjson, text, args.engine, args.repeat)
+        size = len(text.encode('utf-8')) / 1e6
+        scans, hits = group_counters(text, args.engine)
+        line = '%-6s %7.2f MB %8.2f MB/s   group scans %7d reused %8d' % (name, size, size / elapsed, scans, hits)
+        if baseline is not None:
+            base_elapsed = measure(baseline, text, args.engine, args.repeat)
+            line += '   baseline %8.2f MB/s   speedup %.2fx' % (size / base_elapsed, base_elapsed / elapsed)
+            slower = slower or base_elapsed < elapsed
+        print(line)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+嵌套深度基准，对比递归引擎与不使用递归的stack引擎
+
+在仓库根目录运行:
+    python -m benchmarks.bench_depth
+    python -m benchmarks.bench_depth --depths 100,200 --deep 100000
+
+对每个深度生成嵌套的列表、字典和元组，报告每一层的平均耗时(同一深度下减去单层文档的耗时后除以层数)；
+递归引擎超出递归深度限制时记为RecursionError。--deep给出只有stack引擎能解析的深度。
+另外在bench_lexer的语料上对比stack与parser引擎的吞吐量，stack引擎更慢时以非零状态退出
+"""
+import argparse
+import sys
+import time
+
+from fJson import fjson
+from benchmarks.bench_lexer import make_corpus
+
+SHAPES = {
+    'list': ('[', '1', ']'),
+    'dict': ('{a: ', '1', '}'),
+    'tuple': ('(', '1,', ')'),
+}
+
+
+def nested(shape, depth):
+    opening, leaf, closing = SHAPES[shape]
+    return opening * depth + leaf + closing * depth
+
+
+def measure(text, engine, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fjson.decode(text, engine=engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def per_level(shape, depth, engine, repeat):
+    # 每一层的耗时(微秒)，超出递归深度限制时返回None
+    try:
+        elapsed = measure(nested(shape, depth), engine, repeat)
+    except RecursionError:
+        return None
+    return (elapsed - measure(nested(shape, 1), engine, repeat)) / (depth - 1) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depths', default='50,100,200,400')
+    parser.add_argument('--deep', type=int, default=100000)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    engines = ('builder', 'parser', 'stack')
+    for shape in SHAPES:
+        for depth in [int(x) for x in args.depths.split(',')]:
+            cells = []
+            for engine in engines:
+                cost = per_level(shape, depth, engine, args.repeat)
+                cells.append('%-7s %s' % (engine, 'RecursionError' if cost is None else '%7.2f us/level' % cost))
+            print('%-5s depth %6d   %s' % (shape, depth, '   '.join(cells)))
+        elapsed = measure(nested(shape, args.deep), 'stack', 1)
+        print('%-5s depth %6d   stack   %7.2f us/level' % (shape, args.deep, elapsed / args.deep * 1e6))
+
+    slower = False
+    for name, text in make_corpus(args.records).items():
+        size = len(text.encode('utf-8')) / 1e6
+        stack_elapsed = measure(text, 'stack', args.repeat)
+        parser_elapsed = measure(text, 'parser', args.repeat)
+        print('%-6s %7.2f MB   stack %8.2f MB/s   parser %8.2f MB/s   speedup %.2fx' % (
+            name, size, size / stack_elapsed, size / parser_elapsed, parser_elapsed / stack_elapsed))
+        slower = slower or parser_elapsed < stack_elapsed
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+encode 吞吐量基准，与标准库json.dumps对比
+
+在仓库根目录运行:
+    python -m benchmarks.bench_encode
+    python -m benchmarks.bench_encode --baseline old_fjson.py
+
+两者编码相同的数据(只包含JSON类型，单行、indent=2多行和ascii_only三种格式)，json.dumps的ensure_ascii
+与fJson的ascii_only一致。--baseline的含义与bench_lexer相同，当前版本更慢时以非零状态退出
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from fJson import fjson
+from benchmarks.bench_lexer import load_module
+
+
+def make_corpus(records=20000, seed=0):
+    # 两类典型数据: 扁平的记录列表、嵌套的配置字典(包含中文和需要转义的字符串)
+    rng = random.Random(seed)
+    records_data = [
+        {"id": i, "name": "user%d" % i, "score": rng.random() * 100, "tags": ["a", "b", "c"][:rng.randint(0, 3)], "active": i % 2 == 0, "parent": None}
+        for i in range(records)
+    ]
+    config = {
+        'svc%d' % i: {
+            'description': '服务说明 ' * rng.randint(1, 8),
+            'command': 'run --name "svc%d"\n\tnext line' % i,
+            'limits': {'cpu': rng.random() * 4, 'memory': rng.randint(128, 8192), 'offset': -rng.randint(0, 100)},
+            'hosts': ['10.0.%d.%d' % (i % 256, x) for x in range(rng.randint(1, 4))],
+        }
+        for i in range(records // 4)
+    }
+    return {'records': records_data, 'config': config}
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help='path of another fjson.py to compare against')
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = load_module(args.baseline) if args.baseline else None
+    slower = False
+    for name, data in make_corpus(args.records).items():
+        for indent, ascii_only in ((None, False), (2, False), (None, True)):
+            options = {'indent': indent, 'multi_line': indent is not None, 'ascii_only': ascii_only}
+            elapsed, size = measure(lambda: fjson.encode(data, **options), args.repeat)
+            json_elapsed, _ = measure(lambda: json.dumps(data, indent=indent, ensure_ascii=ascii_only), args.repeat)
+            line = '%-8s %-11s %7.2f MB %8.2f MB/s   json.dumps %8.2f MB/s (%.1fx)' % (
+                name, 'ascii' if ascii_only else 'indent=%s' % indent, size / 1e6, size / 1e6 / elapsed, size / 1e6 / json_elapsed, elapsed / json_elapsed)
+            if baseline is not None:
+                base_elapsed, _ = measure(lambda: baseline.encode(data, **options), args.repeat)
+                line += '   baseline %8.2f MB/s   speedup %.2fx' % (size / 1e6 / base_elapsed, base_elapsed / elapsed)
+                slower = slower or base_elapsed < elapsed
+            print(line)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
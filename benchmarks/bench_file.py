@@ -0,0 +1,82 @@
+"""
+decode_file 峰值内存基准
+
+在仓库根目录运行:
+    python -m benchmarks.bench_file
+    python -m benchmarks.bench_file --records 50000 --engine parser
+
+生成一个配置导出风格的大文件，分别在子进程中用 open().read() 之后 decode 与 decode_file 解析，
+报告两者的耗时和峰值RSS(ru_maxrss)，并检查结果一致
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from fJson import encode
+
+CHILD = r'''
+import hashlib, pickle, resource, sys, time
+from fJson import fjson
+path, mode, engine = sys.argv[1:4]
+start = time.perf_counter()
+if mode == 'read':
+    with open(path, encoding='utf-8') as fp:
+        value = fjson.decode(fp.read(), engine=engine)
+else:
+    value = fjson.decode_file(path, engine=engine)
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+sys.stdout.buffer.write(pickle.dumps((elapsed, peak, hashlib.md5(repr(value).encode()).hexdigest())))
+'''
+
+
+def write_corpus(path, records, seed=0):
+    # 配置导出: 多层字典、长字符串、负数、中文，以及注释和不带引号的键
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write('// config dump\n{\n')
+        for i in range(records):
+            entry = {
+                'name': 'service-%d' % i,
+                'description': '服务说明 ' * rng.randint(1, 8),
+                'limits': {'cpu': rng.random() * 4, 'memory': rng.randint(128, 8192), 'offset': -rng.randint(0, 100)},
+                'hosts': ['10.0.%d.%d' % (i % 256, x) for x in range(rng.randint(1, 4))],
+                'enabled': i % 3 != 0,
+            }
+            fp.write('%s    svc%d: %s' % (',\n' if i else '', i, encode(entry)))
+        fp.write('\n}\n')
+
+
+def run_child(path, mode, engine):
+    import pickle
+    output = subprocess.run([sys.executable, '-c', CHILD, path, mode, engine], check=True, stdout=subprocess.PIPE,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return pickle.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--engine', default='parser')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dump.fjson')
+        write_corpus(path, args.records)
+        size = os.path.getsize(path) / 1e6
+        results = {}
+        for mode in ('read', 'mmap'):
+            elapsed, peak, digest = results[mode] = run_child(path, mode, args.engine)
+            print('%-5s %7.2f MB file %8.2f s   peak RSS %8.1f MB' % (mode, size, elapsed, peak / 1e6))
+        if results['read'][2] != results['mmap'][2]:
+            print('results differ')
+            return 1
+        print('peak RSS saved %.1f MB' % ((results['read'][1] - results['mmap'][1]) / 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+fJsonLexer.tokenize 吞吐量基准
+
+在仓库根目录运行:
+    python -m benchmarks.bench_lexer
+    python -m benchmarks.bench_lexer --baseline old_fjson.py
+
+--baseline 指向另一个版本的 fjson.py(例如 git show <rev>:fJson/fjson.py > old_fjson.py)，
+会在相同语料上对比两者的吞吐量，当前版本更慢时以非零状态退出
+"""
+import argparse
+import importlib.util
+import json
+import random
+import sys
+import time
+
+from fJson import fjson
+
+
+def make_corpus(records=2000, seed=0):
+    # 生成几类典型输入: 普通JSON、带注释和不带引号键的宽松格式、包含多行字符串的LLM输出
+    rng = random.Random(seed)
+    plain = json.dumps([
+        {"id": i, "name": "user%d" % i, "score": rng.random() * 100, "tags": ["a", "b", "c"][:rng.randint(0, 3)], "active": i % 2 == 0}
+        for i in range(records)
+    ])
+    loose = '\n'.join(
+        '{id: %d, name: user%d, score: %d * 2, tags: [a, b] + [c], ok: TRUE} // record %d,' % (i, i, i, i)
+        for i in range(records)
+    )
+    llm = '\n'.join(
+        '{role: assistant, content: R"code(def f%d(x):\n    return x * %d  # "quoted"\n)code"},' % (i, i)
+        for i in range(records)
+    )
+    return {'plain': plain, 'loose': loose, 'llm': llm}
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('fjson_baseline', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(module, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = module.fJsonLexer().tokenize(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(tokens)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help='path of another fjson.py to compare against')
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline = load_module(args.baseline) if args.baseline else None
+    slower = False
+    for name, text in make_corpus(args.records).items():
+        elapsed, count = measure(fjson, text, args.repeat)
+        size = len(text.encode('utf-8')) / 1e6
+        line = '%-6s %7.2f MB %9d tokens %8.2f MB/s %10.0f tokens/s' % (name, size, count, size / elapsed, count / elapsed)
+        if baseline is not None:
+            base_elapsed, _ = measure(baseline, text, args.repeat)
+            line += '   baseline %8.2f MB/s   speedup %.2fx' % (size / base_elapsed, base_elapsed / elapsed)
+            slower = slower or base_elapsed < elapsed
+        print(line)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+只含字面量的分组走fJsonLiteral的收益
+
+在仓库根目录运行:
+    python -m benchmarks.bench_literal
+    python -m benchmarks.bench_literal --scale 0.5 --baseline old_fjson.py
+
+在不含表达式的文档(benchmarks.corpus中的plain、wide、deep、llm，以及带集合、元组和不带引号键的literal)
+和作为对照的expr语料上，对比builder引擎使用literal_groups和把它清零(每个分组都经过全部表达式匹配器)时的吞吐量，
+并报告被标记为只含字面量的分组所占的比例。使用literal_groups更慢时以非零状态退出；
+--baseline给出另一个fjson.py时另外与它对比，当前版本更慢时同样以非零状态退出
+"""
+import argparse
+import random
+import sys
+import time
+
+from fJson import fjson
+from benchmarks.bench_lexer import load_module
+from benchmarks.corpus import make_corpora
+
+
+def make_literal(count, seed=0):
+    # fJson写法的纯字面量: 不带引号的键、集合、元组
+    rng = random.Random(seed)
+    return '[' + ',\n'.join(
+        '{id: %d, name: "item %d", tags: {%s}, point: (%d, %d), flags: [true, false, null], ratio: %.3f}'
+        % (i, i, ', '.join(rng.sample(('a', 'b', 'c', 'd'), rng.randint(1, 3))), rng.randint(0, 99), rng.randint(0, 99), rng.random())
+        for i in range(count)
+    ) + ']'
+
+
+def lex(module, text):
+    tokens = module.fJsonTokenStream(text).extend(module.fJsonLexer().iter_tokens(text))
+    tokens.pair_brackets()
+    return tokens
+
+
+def decode_without_literals(text):
+    tokens = lex(fjson, text)
+    tokens.literal_groups = bytearray(len(tokens))
+    return fjson.build_tokens(tokens, 'builder')
+
+
+def measure(function, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', help='path of another fjson.py to compare against')
+    parser.add_argument('--scale', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = load_module(args.baseline) if args.baseline else None
+    corpora = {name: text for name, (text, _) in make_corpora(args.scale).items() if name in ('plain', 'wide', 'deep', 'llm', 'expr')}
+    corpora['literal'] = make_literal(max(int(1000 * args.scale), 1))
+    slower = False
+    for name, text in corpora.items():
+        size = len(text.encode('utf-8')) / 1e6
+        tokens = lex(fjson, text)
+        groups = sum(1 for pair in tokens.pairs if pair >= 0) // 2
+        literal = sum(tokens.literal_groups)
+        elapsed = measure(fjson.decode, text, args.repeat)
+        plain_elapsed = measure(decode_without_literals, text, args.repeat)
+        line = '%-7s %6.2f MB   literal groups %3.0f%%   %7.2f MB/s   without %7.2f MB/s   speedup %5.2fx' % (
+            name, size, literal * 100 / max(groups, 1), size / elapsed, size / plain_elapsed, plain_elapsed / elapsed)
+        slower = slower or plain_elapsed < elapsed
+        if baseline is not None:
+            base_elapsed = measure(baseline.decode, text, args.repeat)
+            line += '   baseline %7.2f MB/s   speedup %5.2fx' % (size / base_elapsed, base_elapsed / elapsed)
+            slower = slower or base_elapsed < elapsed
+        print(line)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
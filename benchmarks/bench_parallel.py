@@ -0,0 +1,67 @@
+"""
+decode_parallel 吞吐量基准
+
+在仓库根目录运行:
+    python -m benchmarks.bench_parallel
+    python -m benchmarks.bench_parallel --workers 2,4,8 --records 100000 --engine parser
+
+生成一个很大的顶层记录列表，报告split_top_level切分扫描的速度(按顺序执行的部分)、
+decode按顺序解析的吞吐量，以及各个工作进程数下decode_parallel的吞吐量和加速比，并检查结果一致
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from fJson import fjson, encode
+
+
+def make_corpus(records=50000, seed=0):
+    # 一个顶层列表: 每条记录带注释、不带引号的键、转义的字符串和多行字符串
+    rng = random.Random(seed)
+    items = []
+    for i in range(records):
+        entry = encode({'id': i, 'name': 'user "%d"' % i, 'score': rng.random() * 100, 'tags': ['a', 'b,c'][:rng.randint(0, 2)]})
+        items.append('  // record %d\n  %s + {note: R"n(line one, ]\nline two)n"}' % (i, entry))
+    return '[\n' + ',\n'.join(items) + '\n]\n'
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=','.join(str(x) for x in sorted({2, 4, os.cpu_count() or 1} - {1})))
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--engine', default='parser')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    text = make_corpus(args.records)
+    size = len(text.encode('utf-8')) / 1e6
+    print('%.2f MB, %d CPUs' % (size, os.cpu_count() or 1))
+    elapsed, (_, ranges) = measure(lambda: fjson.split_top_level(text), args.repeat)
+    print('split scan   %8.2f MB/s   %d elements' % (size / elapsed, len(ranges)))
+    serial, expected = measure(lambda: fjson.decode(text, args.engine), args.repeat)
+    print('decode       %8.2f MB/s' % (size / serial))
+    for workers in [int(x) for x in args.workers.split(',')]:
+        # 预热: 创建进程池
+        fjson.decode_parallel(text[:1 << 16].rsplit(',\n', 1)[0] + ']', workers, args.engine, min_size=0)
+        elapsed, value = measure(lambda: fjson.decode_parallel(text, workers, args.engine, min_size=0), args.repeat)
+        if value != expected:
+            print('results differ')
+            return 1
+        print('workers %3d  %8.2f MB/s   speedup %5.2fx' % (workers, size / elapsed, serial / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+基准语料
+
+make_corpora生成覆盖主要使用场景的语料，每一项是(文本, 是否是标准JSON)，标准JSON的语料同时用json模块对比:
+    llm     LLM输出: 注释、不带引号的键、R"code(...)code"代码块
+    plain   普通JSON: 记录列表
+    wide    很宽的字典: 一个字典里有大量键
+    deep    深层嵌套: 多个嵌套100层的列表和字典
+    args    参数组: (--key value ...)形式的命令行参数
+    expr    表达式较多的配置: 连接、重复、条件表达式、笛卡尔积
+    base64  较大的$"..."二进制数据
+scale按比例调整各个语料的大小
+"""
+import base64
+import json
+import random
+
+
+def make_llm(rng, count):
+    items = []
+    for i in range(count):
+        items.append(
+            '// turn %d\n{role: assistant, id: %d, content: R"code(def handler_%d(event):\n'
+            '    if event["type"] == "click":\n        return {"x": %d, "y": %d}  # "quoted", [brackets]\n'
+            '    return None\n)code", finish: %s}' % (i, i, i, rng.randint(0, 999), rng.randint(0, 999), rng.choice(('stop', 'length'))))
+    return ',\n'.join(items)
+
+
+def make_plain(rng, count):
+    return json.dumps([
+        {"id": i, "name": "user%d" % i, "email": "user%d@example.com" % i, "score": rng.random() * 100,
+         "tags": ["a", "b", "c"][:rng.randint(0, 3)], "active": i % 2 == 0, "parent": None}
+        for i in range(count)
+    ])
+
+
+def make_wide(rng, count):
+    return json.dumps({'key_%05d' % i: rng.choice((i, 'value %d' % i, rng.random(), True, None)) for i in range(count * 8)})
+
+
+def make_deep(rng, count, depth=100):
+    documents = []
+    for i in range(max(count // 20, 1)):
+        value = i
+        for level in range(depth):
+            value = [value, level] if rng.random() < 0.5 else {"level": level, "child": value}
+        documents.append(value)
+    return json.dumps(documents)
+
+
+def make_args(rng, count):
+    return ',\n'.join(
+        '(--name svc%d --port %d --replicas %d --hosts "h%d.local" "h%d.local" --verbose true)' % (i, 8000 + i, rng.randint(1, 9), i, i + 1)
+        for i in range(count)
+    )
+
+
+def make_expr(rng, count):
+    return ',\n'.join(
+        '{name: "svc" + "-%d", replicas: %d * 2, ports: [80, 443] + [%d], weights: [1, 2, 3] * [%d, %d, %d], '
+        'mode: (%s ? fast : slow), grid: {a, b} * {1, 2}, banner: "=" * 20, ok: %d :> [1, 2, 3]}'
+        % (i, rng.randint(1, 5), 8000 + i, i, i + 1, i + 2, rng.choice(('true', 'false')), i % 4)
+        for i in range(count)
+    )
+
+
+def make_base64(rng, count):
+    return ',\n'.join(
+        '{name: blob%d, data: $"%s"}' % (i, base64.b64encode(bytes(rng.getrandbits(8) for _ in range(4096))).decode())
+        for i in range(max(count // 10, 1))
+    )
+
+
+def make_corpora(scale=1.0, seed=0):
+    rng = random.Random(seed)
+    count = max(int(1000 * scale), 1)
+    return {
+        'llm': (make_llm(rng, count), False),
+        'plain': (make_plain(rng, count), True),
+        'wide': (make_wide(rng, count), True),
+        'deep': (make_deep(rng, count), True),
+        'args': (make_args(rng, count), False),
+        'expr': (make_expr(rng, count), False),
+        'base64': (make_base64(rng, count), False),
+    }
@@ -0,0 +1,122 @@
+"""
+基准套件: 在benchmarks.corpus的全部语料上测量词法分析、解析和编码的吞吐量
+
+在仓库根目录运行:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.15
+
+每项结果记为"语料/操作"，包含MB/s、ops/s(每秒完成的次数)和最短耗时，取--repeat次中最快的一次:
+    tokenize          fJsonLexer().tokenize
+    decode/<engine>   decode，--engines选择引擎
+    decode/json_first decode(json_first=True)，标准JSON的语料由json模块解析，其余语料只增加预检查的开销
+    encode            encode解析得到的值，MB/s按输出的长度计算
+标准JSON的语料另外测量json.loads和json.dumps作为参照，括号中是fJson相对json模块的耗时倍数。
+--save把结果保存为JSON；--compare读取之前保存的结果，任何一项fJson操作的MB/s比它低超过--threshold时以非零状态退出，
+json模块的参照项只打印不参与判断
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from fJson import fjson
+from benchmarks.corpus import make_corpora
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def record(results, key, size, elapsed):
+    results[key] = {'mb_s': size / 1e6 / elapsed, 'ops_s': 1 / elapsed, 'seconds': elapsed}
+    return results[key]
+
+
+def run(corpora, engines, repeat):
+    results = {}
+    for name, (text, is_json) in corpora.items():
+        size = len(text.encode('utf-8'))
+        rows = []
+        elapsed, _ = measure(lambda: fjson.fJsonLexer().tokenize(text), repeat)
+        rows.append(('tokenize', record(results, name + '/tokenize', size, elapsed), None))
+        if is_json:
+            json_elapsed, json_value = measure(lambda: json.loads(text), repeat)
+            record(results, name + '/json.loads', size, json_elapsed)
+        value = None
+        for engine in engines:
+            elapsed, value = measure(lambda: fjson.decode(text, engine), repeat)
+            rows.append(('decode/' + engine, record(results, name + '/decode/' + engine, size, elapsed), json_elapsed if is_json else None))
+        elapsed, _ = measure(lambda: fjson.decode(text, json_first=True), repeat)
+        rows.append(('decode/json_first', record(results, name + '/decode/json_first', size, elapsed), json_elapsed if is_json else None))
+        if value is None:
+            value = fjson.decode(text, 'parser')
+        elapsed, output = measure(lambda: fjson.encode(value), repeat)
+        if is_json:
+            json_elapsed, json_output = measure(lambda: json.dumps(json_value), repeat)
+            record(results, name + '/json.dumps', len(json_output), json_elapsed)
+        rows.append(('encode', record(results, name + '/encode', len(output), elapsed), json_elapsed if is_json else None))
+        for operation, result, reference in rows:
+            line = '%-7s %-17s %8.2f MB/s %10.1f ops/s' % (name, operation, result['mb_s'], result['ops_s'])
+            if reference is not None:
+                line += '   (%.1fx json)' % (result['seconds'] / reference)
+            print(line)
+    return results
+
+
+def compare(results, baseline, threshold):
+    # 返回比baseline慢超过threshold的项
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None or '/json.' in key:
+            continue
+        ratio = result['mb_s'] / base['mb_s']
+        if ratio < 1 - threshold:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engines', default='builder,parser,stack')
+    parser.add_argument('--corpora', help='comma-separated subset of corpora to run')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON file saved by an earlier --save run')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown as a fraction (default 0.15)')
+    args = parser.parse_args(argv)
+
+    corpora = make_corpora(args.scale)
+    if args.corpora:
+        corpora = {name: corpora[name] for name in args.corpora.split(',')}
+    results = run(corpora, args.engines.split(','), args.repeat)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as fp:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'scale': args.scale,
+                       'results': results}, fp, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+        if baseline.get('scale') != args.scale:
+            print('warning: baseline was recorded with --scale %s' % baseline.get('scale'))
+        regressions = compare(results, baseline['results'], args.threshold)
+        for key, ratio in regressions:
+            print('REGRESSION %-22s %.2fx of baseline' % (key, ratio))
+        if regressions:
+            return 1
+        print('no regressions beyond %.0f%%' % (args.threshold * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
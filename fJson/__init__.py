@@ -17,6 +17,12 @@ FlexibleJSON (fJson)
     # 解析 JSON 字符串
     obj = decode('{"name": "张三", "age": 18}')
     
+    # 边接收流式输出边解析
+    decoder = IncrementalDecoder()
+    for chunk in chunks:
+        values = decoder.feed(chunk)
+    values = decoder.close()
+
     # 序列化 Python 对象
     json_str = encode(obj, indent=2)
     
@@ -28,4 +34,4 @@ FlexibleJSON (fJson)
             self.age = age
 
 """
-from .fjson import decode, encode, DataClass, fJsonSpecialType
\ No newline at end of file
+from .fjson import decode, encode, iterencode, encode_to, DataClass, fJsonSpecialType, IncrementalDecoder, iterdecode, decode_file, compile, DecodeCache, fJsonProductView, fJsonRepeatView, DecodeBudget, BudgetExceeded, decode_batch, BatchDecoder, decode_parallel, DecodeHook, DecodeProfile
\ No newline at end of file
@@ -76,9 +76,201 @@ print(decode(text))
 对于base64编码字符串，使用`$"base64字符串"`的形式，其最终会被解码为二进制字符串
 """
 import re
+import os
+import json
+import sys
+import mmap
+import time
+import atexit
+import codecs
 import base64
+import bisect
+import queue
+import threading
+import multiprocessing
+from array import array
+from functools import partial
+from itertools import islice
+from types import MappingProxyType
+from collections import OrderedDict, deque
+from collections.abc import Set, Sequence
+
+BRACKET_PAIRS = {'{': '}', '[': ']', '(': ')'}
+
+OPERATORS = frozenset({"+", "-", "*", "/", "\\", "%", "&", "!", "^", "~", "=", "==", ">", "<", "<=", ">=", "!=", "?=", "|", "?", ":>",
+                       "&&", ",", ".", "\n", ":", "->", "<<", ">>", "/*", "*/", ";", " ", ":=", "|>", "<|", "::", "--", "=>", "++", "||", '"""', "'''"})
+BRACKETS = frozenset({"(", ")", "[", "]", "{", "}"})
+
+NUMBER_PATTERN = r'\d*\.?\d+(?:[eE][-+]?\d+)?'
+
+# 词法分析的主正则，先跳过空白，再按fJsonLexer原有的尝试顺序排列各分支；
+# 引号开头的运算符由字符串分支处理，其余运算符按长度从长到短排列，单独的'-'另设一个分支以便合并负数，
+# 末尾只剩空白时匹配\Z，此时lastgroup为None
+TOKEN_PATTERN = re.compile(
+    r'[ \t\n\r]*(?:'
+    r'(?P<comment>//(?P<line>[^\n\r]*)|/\*(?P<block>.*?)(?:\*/|\Z))'
+    r'|(?P<number>' + NUMBER_PATTERN + ')'
+    r'|(?P<string>R"|"""|\'\'\'|"|\'|“)'
+    r'|(?P<base64>\$")'
+    r'|(?P<symbol>' + '|'.join(re.escape(x) for x in sorted((OPERATORS | BRACKETS) - {' ', '\n', '"""', "\'\'\'", '-'}, key=lambda x: (-len(x), x))) + ')'
+    r'|(?P<minus>-)'
+    r'|(?P<identifier>[^ \t\n\r\'"+\-*/\\%&!^~=><|?,.:;()\[\]{}]+)'
+    r'|\Z)',
+    re.S)
+
+UTF8_TOKEN_PATTERN = None
+
+# split_top_level使用的正则，每次匹配一段不影响切分的文本加一个需要处理的token:
+# 不含转义的普通字符串整个匹配，其余字符串交给scan_literal，注释直接跳过
+SPLIT_PATTERN = re.compile(
+    r'(?:[^"\'“R/\[\]{}(),*]|R(?!")|\*(?!/)|/(?![/*]))*(?:'
+    r'(?P<string>"(?!"")[^"\\]*"|\'(?!\'\')[^\'\\]*\')'
+    r'|(?P<comment>//[^\n\r]*|/\*.*?(?:\*/|\Z))'
+    r'|(?P<literal>R"|"""|\'\'\'|"|\'|“)'
+    r'|(?P<opening>[\[{(])'
+    r'|(?P<closing>[\]})])'
+    r'|(?P<comma>,)'
+    r'|(?P<unsure>\*/)'
+    r'|\Z)',
+    re.S)
+
+# 标识符中不能出现的字符，R"和“紧跟在其他字符之后时可能属于标识符
+IDENTIFIER_BREAKS = frozenset(' \t\n\r\'"+-*/\\%&!^~=><|?,.:;()[]{}')
+
+# decode(json_first=True)的预检查: 开头的第一个值必须是标准JSON能接受的写法，字典的第一个键必须带双引号，
+# 结尾必须是标准JSON的值能够结束的字符，不满足时直接使用fJson语法，不先尝试json模块
+STRICT_JSON_START = re.compile(r'[ \t\n\r]*(?:\[[ \t\n\r]*)*(?:\{[ \t\n\r]*["}]|["\]0-9-]|true|false|null)')
+STRICT_JSON_END = frozenset(']}"0123456789el')
+# fJson对\/、\b、\f、\r原样保留，与json模块的结果不同
+STRICT_JSON_ESCAPES = re.compile(r'\\[/bfr]')
+# fJson中的空字典{}是{None}
+STRICT_JSON_EMPTY_OBJECT = re.compile(r'\{[ \t\n\r]*\}')
+
+
+def utf8_token_pattern():
+    """
+    UTF-8字节输入使用的主正则，第一次使用时编译
+
+    与TOKEN_PATTERN逐字节对应。str正则中的\\d包括全部Unicode十进制数字，这里把它们的UTF-8编码也列入数字分支；
+    数字后面没有紧跟数字、'.'、指数或非ASCII字符时走只含ASCII数字的快速分支，结果与完整分支相同
+    """
+    global UTF8_TOKEN_PATTERN
+    if UTF8_TOKEN_PATTERN is None:
+        # Unicode十进制数字都在0号和1号平面，按除最后一个字节外的前缀分组
+        groups = {}
+        for char in map(chr, range(0x80, 0x20000)):
+            if char.isdecimal():
+                encoded = char.encode('utf-8')
+                groups.setdefault(encoded[:-1], bytearray()).append(encoded[-1])
+        digit = b'(?:[0-9]|' + b'|'.join(prefix + b'[' + bytes(last) + b']' for prefix, last in groups.items()) + b')'
+        number = (rb'[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?(?![0-9\x80-\xff]|\.[0-9\x80-\xff]|[eE][-+]?[0-9\x80-\xff])'
+                  rb'|(?=[0-9.\x80-\xff])' + digit + rb'*\.?' + digit + rb'+(?:[eE][-+]?' + digit + rb'+)?')
+        UTF8_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern.encode('utf-8').replace(NUMBER_PATTERN.encode('utf-8'), number), re.S)
+    return UTF8_TOKEN_PATTERN
+
+# 各种字符串开头对应的结束符，以及除反斜杠外可以被转义的引号；UTF-8字节输入使用编码后的开头和结束符
+LITERAL_TERMINATORS = {
+    '"""': ('"""', '"'),
+    "'''": ("'''", '"'),
+    '"': ('"', '"'),
+    "'": ("'", "'"),
+    '“': ('”', '“'),
+    '$"': ('"', '"'),
+}
+LITERAL_TERMINATORS.update({opener.encode('utf-8'): (terminator.encode('utf-8'), quote) for opener, (terminator, quote) in LITERAL_TERMINATORS.items()})
+
+HEX4_PATTERN = re.compile(r'[0-9a-fA-F]{4}')
+
+
+def decode_escape(text, backslash, quote):
+    """
+    解码text中backslash处的转义序列，返回(转义后的文本, 转义序列之后的位置)
+    支持\\n、\\t、\\\\、转义quote和\\uXXXX(相邻的代理对合并为一个字符)，其余转义序列(包括不合法的\\u)原样保留
+    """
+    position = backslash + 1
+    char = text[position]
+    if char == 'n':
+        return '\n', position + 1
+    if char == 't':
+        return '\t', position + 1
+    if char == quote or char == '\\':
+        return char, position + 1
+    if char == 'u' and HEX4_PATTERN.match(text, position + 1):
+        code = int(text[position + 1:position + 5], 16)
+        if 0xD800 <= code < 0xDC00 and text.startswith('\\u', position + 5) and HEX4_PATTERN.match(text, position + 7):
+            low = int(text[position + 7:position + 11], 16)
+            if 0xDC00 <= low < 0xE000:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), position + 11
+        return chr(code), position + 5
+    return '\\' + char, position + 1
+
+
+def unescape(text, quote):
+    """
+    解码字符串内容(不含结束符)中的全部转义序列
+    """
+    parts = []
+    current = 0
+    backslash = text.find('\\')
+    while backslash >= 0:
+        parts.append(text[current:backslash])
+        escaped, current = decode_escape(text, backslash, quote)
+        parts.append(escaped)
+        backslash = text.find('\\', current)
+    parts.append(text[current:])
+    return ''.join(parts)
+
+
+def literal_terminator(text, position, opener):
+    """
+    返回text中position处以opener开头的字符串字面量的(结束符, 可以被转义的引号, 内容起点)
+    R"delimiter(还没有出现'('时返回None
+    """
+    if opener == 'R"':
+        paren = text.find('(', position + 2)
+        if paren < 0:
+            return None
+        return ')' + text[position + 2:paren] + '"', '"', paren + 1
+    if opener == b'R"':
+        paren = text.find(b'(', position + 2)
+        if paren < 0:
+            return None
+        return b')' + text[position + 2:paren] + b'"', '"', paren + 1
+    terminator, quote = LITERAL_TERMINATORS[opener]
+    return terminator, quote, position + len(opener)
+
+
+def scan_literal(text, position, opener):
+    """
+    读取text中position处以opener开头的字符串字面量，text可以是str或UTF-8字节缓冲区(此时偏移均为字节偏移)
+    返回(内容起点, 内容终点, 转义后的文本, 字面量之后的位置)，内容中没有转义时文本为None，可以直接取text[内容起点:内容终点]
+    字符串未闭合时返回None
+    """
+    literal = literal_terminator(text, position, opener)
+    if literal is None:
+        return None
+    terminator, quote, start = literal
+    end = text.find(terminator, start)
+    if end < 0:
+        return None
+    backslash_char = '\\' if text.__class__ is str else b'\\'
+    backslash = text.find(backslash_char, start, end)
+    if backslash < 0:
+        return start, end, None, end + len(terminator)
+    # 先找到真正的结束符: 转义序列吃掉结束符的开头时向后重新查找；
+    # \\uXXXX中的十六进制数字和多字节字符的后续字节都不会是反斜杠或结束符的开头，所以每个转义只需跳过一个字符(字节)
+    while backslash >= 0:
+        current = backslash + 2
+        if current > end:
+            end = text.find(terminator, current)
+            if end < 0:
+                return None
+        backslash = text.find(backslash_char, current, end)
+    content = text[start:end]
+    if content.__class__ is not str:
+        content = content.decode('utf-8')
+    return start, end, unescape(content, quote), end + len(terminator)
 
-DEBUG = False
 
 class fJsonTokenType:
     TokenType_COMMENT = 'COMMENT'
@@ -88,335 +280,126 @@ class fJsonTokenType:
     TokenType_IDENTIFIER = 'IDENTIFIER'
     TokenType_BASE64 = 'BASE64'
 
+    # 紧凑token流(fJsonTokenStream)中使用的类型编号
+    TokenKind_COMMENT = 0
+    TokenKind_NUMBER = 1
+    TokenKind_STRING = 2
+    TokenKind_SYMBOL = 3
+    TokenKind_IDENTIFIER = 4
+    TokenKind_BASE64 = 5
+
+    names = (TokenType_COMMENT, TokenType_NUMBER, TokenType_STRING, TokenType_SYMBOL, TokenType_IDENTIFIER, TokenType_BASE64)
+
+# TOKEN_PATTERN中文本即为匹配内容的分支
+SIMPLE_TOKEN_KINDS = {
+    'symbol': fJsonTokenType.TokenKind_SYMBOL,
+    'identifier': fJsonTokenType.TokenKind_IDENTIFIER,
+    'number': fJsonTokenType.TokenKind_NUMBER,
+}
+
 
 class fJsonLexer:
     def tokenize(self, str):
-        tokens = []
-        currpos = 0
-
-        def skip_space():
-            nonlocal currpos
-            while currpos < len(str) and str[currpos] in (' ', '\t', '\n', '\r'):
-                currpos += 1
-
-        def next_line():
-            nonlocal currpos
-            while currpos < len(str) and str[currpos] not in ('\n', '\r'):
-                currpos += 1
-
-        def test_string(test_str):
-            nonlocal currpos
-            if currpos + len(test_str) > len(str):
-                return False
-            return str[currpos:currpos + len(test_str)] == test_str
-
-        def test_number(pos):
-            number_pattern = re.compile(r'^\d*\.?\d+([eE][-+]?\d+)?')
-            match_ = number_pattern.match(str[pos:])
-            return match_.end() if match_ else 0
-
-        def read_number():
-            nonlocal currpos
-            length = test_number(currpos)
-            if length:
-                current_token = str[currpos:currpos + length]
-                currpos += length
-                return current_token
-            return None
-
-        def read_base64():
-            nonlocal currpos
-            current_token = ''
-            if test_string('$"'):
-                currpos += 2
-                while currpos < len(str):
-                    if str[currpos] == '\\':
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == 'n':
-                                current_token += '\n'
-                            elif escape_char == 't':
-                                current_token += '\t'
-                            elif escape_char in ('"', '\\'):
-                                current_token += escape_char
-                            elif escape_char == 'u':
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos:currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None  # Error: unexpected end of string
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += '\\' + escape_char
-                            currpos += 1
-                        else:
-                            return None  # Error: unexpected end of string
-                    elif str[currpos] == '"':
-                        currpos += 1
-                        return current_token
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-        def read_string():
-            nonlocal currpos
-            current_token = ''
-            if test_string('R"'):
-                currpos += 2
-                divider = ''
-                while currpos < len(str) and str[currpos] != '(':
-                    divider += str[currpos]
-                    currpos += 1
-                if currpos < len(str):
-                    currpos += 1  # skip '('
-                    end_divider = ')' + divider + '"'
-                    while currpos < len(str) and not test_string(end_divider):
-                        if str[currpos] == '\\':  # Handle escape sequences
-                            currpos += 1
-                            if currpos < len(str):
-                                escape_char = str[currpos]
-                                if escape_char == 'n':
-                                    current_token += '\n'
-                                elif escape_char == 't':
-                                    current_token += '\t'
-                                elif escape_char in ('"', '\\'):
-                                    current_token += escape_char
-                                elif escape_char == 'u':
-                                    try:
-                                        currpos += 1
-                                        if currpos < len(str):
-                                            hex_str = str[currpos:currpos + 4]
-                                            current_token += chr(int(hex_str, 16))
-                                            currpos += 3
-                                        else:
-                                            return None  # Error: unexpected end of string
-                                    except ValueError:
-                                        return None
-                                else:
-                                    current_token += '\\' + escape_char  # Keep unrecognized escape sequences
-                                currpos += 1
-                            else:
-                                return None  # Error: unexpected end of string
-                        else:
-                            current_token += str[currpos]
-                            currpos += 1
-                    if currpos < len(str):
-                        currpos += len(end_divider)  # Skip the closing delimiter
-                        return current_token
-            if test_string('"""'):
-                currpos += 3
-                while currpos < len(str):
-                    if test_string('"""'):
-                        currpos += 3
-                        return current_token
-                    if str[currpos] == '\\':
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == 'n':
-                                current_token += '\n'
-                            elif escape_char == 't':
-                                current_token += '\t'
-                            elif escape_char in ('"', '\\'):
-                                current_token += escape_char
-                            elif escape_char == 'u':
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos:currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += '\\' + escape_char
-                            currpos += 1
-                        else:
-                            return None
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-
-            if test_string("'''"):
-                currpos += 3
-                while currpos < len(str):
-                    if test_string("'''"):
-                        currpos += 3
-                        return current_token
-                    if str[currpos] == '\\':
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == 'n':
-                                current_token += '\n'
-                            elif escape_char == 't':
-                                current_token += '\t'
-                            elif escape_char in ('"', '\\'):
-                                current_token += escape_char
-                            elif escape_char == 'u':
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos:currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += '\\' + escape_char
-                            currpos += 1
+        source, text, start = lexer_input(str)
+        return fJsonTokenStream(source).extend(self.iter_tokens(text, comments=True, merge_negative=False, start=start))
+
+    def iter_tokens(self, text, comments=False, merge_negative=True, previous=fJsonTokenType.TokenKind_SYMBOL, start=0):
+        """
+        逐个生成(类型编号, 位置, 文本起点, 文本终点, 文本)，文本为None时token的文本就是text[起点:终点]
+
+        comments为False时直接跳过注释，不生成注释token；merge_negative为True时把跟在运算符后面(或位于开头)的'-'与数字合并为负数。
+        默认参数下的结果与tokenize之后依次调用reject_comments、concat_negative_number相同，但不生成中间的token流。
+        text也可以是UTF-8编码的bytes、bytearray或mmap，此时偏移都是字节偏移，转义后的字符串和合并后的负数仍是str
+        previous是text之前最后一个token的类型，接着之前的文本继续分析时用来判断开头的'-'能否合并，start是开始分析的偏移
+        """
+        SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+        NUMBER = fJsonTokenType.TokenKind_NUMBER
+        # minus是还没有生成的'-'的位置，held是暂存在它后面的注释，previous是上一个非注释token的类型
+        minus = -1
+        held = []
+        currpos = start
+
+        # 主正则每次匹配一段空白加一个token，任何位置都能匹配；
+        # 字符串交给scan_literal读取，之后从字符串结尾重新开始finditer
+        pattern = TOKEN_PATTERN if text.__class__ is str else utf8_token_pattern()
+        while currpos < len(text):
+            for match in pattern.finditer(text, currpos):
+                kind = match.lastgroup
+                simple_kind = SIMPLE_TOKEN_KINDS.get(kind)
+                if simple_kind is not None and minus < 0:
+                    # 运算符、标识符和数字的文本就是匹配到的内容
+                    previous = simple_kind
+                    yield simple_kind, match.start(kind), match.start(kind), match.end(), None
+                    continue
+                if kind is None:
+                    continue
+                if kind == 'comment':
+                    if comments:
+                        start, end = match.span('line') if match.group('line') is not None else match.span('block')
+                        if minus >= 0:
+                            held.append((fJsonTokenType.TokenKind_COMMENT, match.start(kind), start, end, None))
                         else:
-                            return None
-                    else:
-                        current_token += str[currpos]
-                        currpos += 1
-            match_pair = {
-                '"': '"',
-                "'": "'",
-                '“': '”',
-                # Add more pairs as needed
-            }
-            start_char = str[currpos]
-            if start_char in match_pair:
-                currpos += 1
-                while currpos < len(str):
-                    if str[currpos] == '\\':
-                        currpos += 1
-                        if currpos < len(str):
-                            escape_char = str[currpos]
-                            if escape_char == 'n':
-                                current_token += '\n'
-                            elif escape_char == 't':
-                                current_token += '\t'
-                            elif escape_char in (start_char, '\\'):
-                                current_token += escape_char
-                            elif escape_char == 'u':
-                                try:
-                                    currpos += 1
-                                    if currpos < len(str):
-                                        hex_str = str[currpos:currpos + 4]
-                                        current_token += chr(int(hex_str, 16))
-                                        currpos += 3
-                                    else:
-                                        return None  # Error: unexpected end of string
-                                except ValueError:
-                                    return None
-                            else:
-                                current_token += '\\' + escape_char
-                            currpos += 1
+                            yield fJsonTokenType.TokenKind_COMMENT, match.start(kind), start, end, None
+                    continue
+                position = match.start(kind)
+                if minus >= 0:
+                    if simple_kind == NUMBER:
+                        # 负数的文本是'-'加上数字，中间隔着空白或注释时另外记录
+                        if position == minus + 1:
+                            yield NUMBER, minus, minus, match.end(), None
                         else:
-                            return None  # Error: unexpected end of string
-                    elif str[currpos] == match_pair[start_char]:
-                        currpos += 1
-                        return current_token
+                            number = match.group(kind)
+                            yield NUMBER, minus, minus, match.end(), '-' + (number if number.__class__ is str else number.decode('utf-8'))
+                        previous = NUMBER
+                        minus = -1
+                        if len(held) != 0:
+                            yield from held
+                            held = []
+                        continue
+                    yield SYMBOL, minus, minus, minus + 1, None
+                    previous = SYMBOL
+                    minus = -1
+                    if len(held) != 0:
+                        yield from held
+                        held = []
+                    if simple_kind is not None:
+                        previous = simple_kind
+                        yield simple_kind, position, position, match.end(), None
+                        continue
+                if kind == 'minus':
+                    if merge_negative and previous == SYMBOL:
+                        minus = position
                     else:
-                        current_token += str[currpos]
-                        currpos += 1
-
-            return None
-
-
-        def read_token():
-            nonlocal currpos
-            current_token = ''
-            while currpos < len(str):
-                if str[currpos] in (' ', '\t', '\n', '\r', '\'', '"'):
-                    break
-                if currpos < len(str) - 2:
-                    three_char = str[currpos:currpos + 3]
-                    if self.is_operator(three_char, 0):
-                        break
-                if currpos < len(str) - 1:
-                    two_char = str[currpos:currpos + 2]
-                    if self.is_operator(two_char, 0):
-                        break
-                one_char = str[currpos]
-                if self.is_operator(one_char, 0):
-                    break
-                current_token += one_char
-                currpos += 1
-            return current_token
-
-        def read_operator():
-            nonlocal currpos
-            if currpos < len(str) - 2:
-                three_char = str[currpos:currpos + 3]
-                if self.is_operator(three_char, 0):
-                    currpos += 3
-                    return three_char
-            if currpos < len(str) - 1:
-                two_char = str[currpos:currpos + 2]
-                if self.is_operator(two_char, 0):
-                    currpos += 2
-                    return two_char
-            if currpos < len(str):
-                one_char = str[currpos]
-                if self.is_operator(one_char, 0):
-                    currpos += 1
-                    return one_char
-            return None
-
-        def read_comment():
-            nonlocal currpos
-            current_token = ''
-            if test_string('//'):
-                currpos += 2
-                while currpos < len(str) and str[currpos] not in ('\n', '\r'):
-                    current_token += str[currpos]
-                    currpos += 1
-                return current_token
-            if test_string('/*'):
-                currpos += 2
-                while currpos < len(str) and not test_string('*/'):
-                    current_token += str[currpos]
-                    currpos += 1
-                if currpos < len(str):
-                    currpos += 2  # Skip closing */
-                return current_token
-            return None
-
-        while True:
-            skip_space()
-            if currpos >= len(str):
+                        previous = SYMBOL
+                        yield SYMBOL, position, position, position + 1, None
+                    continue
+                literal = scan_literal(text, position, match.group(kind))
+                if literal is None:
+                    # 未闭合的字符串，丢弃余下的内容
+                    currpos = len(text)
+                else:
+                    start, end, string, currpos = literal
+                    previous = fJsonTokenType.TokenKind_STRING if kind == 'string' else fJsonTokenType.TokenKind_BASE64
+                    yield previous, position, start, end, string
                 break
-            
-            token = None
-            position = currpos
-
-            if (comment := read_comment()) is not None:
-                tokens.append({'token': comment, 'type': fJsonTokenType.TokenType_COMMENT, 'position': position})
-            elif (number := read_number()) is not None:
-                tokens.append({'token': number, 'type': fJsonTokenType.TokenType_NUMBER, 'position': position})
-            elif (string := read_string()) is not None:
-                tokens.append({'token': string, 'type': fJsonTokenType.TokenType_STRING, 'position': position})
-            elif (string := read_base64()) is not None:
-                tokens.append({'token': string, 'type': fJsonTokenType.TokenType_BASE64, 'position': position})
-            elif (operator := read_operator()) is not None:
-                tokens.append({'token': operator, 'type': fJsonTokenType.TokenType_SYMBOL, 'position': position})
             else:
-                token = read_token()
-                if token:
-                    tokens.append({'token': token, 'type': fJsonTokenType.TokenType_IDENTIFIER, 'position': position})
+                break
 
-        return tokens
+        if minus >= 0:
+            yield SYMBOL, minus, minus, minus + 1, None
+            yield from held
 
     def is_operator(self, t, type):
-        l = (t in {"+", "-", "*", "/", "\\", "%", "&", "!", "^", "~", "=", "==", ">", "<", "<=", ">=", "!=", "?=", "|", "?", ":>",
-                    "&&", ",", ".", "\n", ":", "->", "<<", ">>", "/*", "*/", ";", " ", ":=", "|>", "<|", "::", "--", "=>", "++", "||", ">>", "<<", '"""', "'''"})
         if type == 0:
-            l = l or (t in {"(", ")", "[", "]", "{", "}"})
-        return l
+            return t in OPERATORS or t in BRACKETS
+        return t in OPERATORS
 
     def reject_comments(self, tokens):
-        return [token for token in tokens if token['type'] != fJsonTokenType.TokenType_COMMENT]
+        if not isinstance(tokens, fJsonTokenStream):
+            tokens = fJsonTokenStream.from_tokens(tokens)
+        if fJsonTokenType.TokenKind_COMMENT not in tokens.kinds:
+            return tokens
+        return tokens.select(array('q', [i for i, kind in enumerate(tokens.kinds) if kind != fJsonTokenType.TokenKind_COMMENT]))
     
     def concat_multi_line_string(self, tokens):
         new_tokens = []
@@ -441,65 +424,1021 @@ class fJsonLexer:
     
     # 合并负数
     def concat_negative_number(self, tokens):
-        new_tokens = []
+        if not isinstance(tokens, fJsonTokenStream):
+            tokens = fJsonTokenStream.from_tokens(tokens)
+        kinds = tokens.kinds
+        indices = array('q')
+        merged = []
         offset = 0
         while offset < len(tokens):
-            if tokens[offset]['token'] == '-' and tokens[offset]['type'] == fJsonTokenType.TokenType_SYMBOL:
-                if offset + 1 < len(tokens) and tokens[offset + 1]['type'] == fJsonTokenType.TokenType_NUMBER and (offset == 0 or tokens[offset - 1]['type'] == fJsonTokenType.TokenType_SYMBOL):
-                    new_tokens.append({'token': '-' + tokens[offset + 1]['token'], 'type': fJsonTokenType.TokenType_NUMBER, 'position': tokens[offset]['position']})
+            if tokens.is_symbol(offset, '-'):
+                if offset + 1 < len(tokens) and kinds[offset + 1] == fJsonTokenType.TokenKind_NUMBER and (offset == 0 or kinds[offset - 1] == fJsonTokenType.TokenKind_SYMBOL):
+                    merged.append((len(indices), offset + 1))
+                    indices.append(offset)
                     offset += 2
                     continue
-            new_tokens.append(tokens[offset])
+            indices.append(offset)
             offset += 1
+        if len(merged) == 0:
+            return tokens
+        new_tokens = tokens.select(indices)
+        for index, number in merged:
+            new_tokens.kinds[index] = fJsonTokenType.TokenKind_NUMBER
+            new_tokens.ends[index] = tokens.ends[number]
+            new_tokens.texts[index] = '-' + tokens.text(number)
         return new_tokens
 
+class fJsonUtf8Source:
+    """
+    UTF-8字节缓冲区(bytes、bytearray、mmap)的str视图，作为fJsonTokenStream的源文本
+
+    偏移都是字节偏移，只有切片取出token文本时才解码，运算符、标识符和字符串都不会预先转换为str
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __getitem__(self, index):
+        return self.buffer[index].decode('utf-8')
+
+
+def bom_encoding(head):
+    """
+    按开头(至少4个字节)的BOM判断bytes输入的编码: 'utf-32'、'utf-16'，其余为'utf-8-sig'(UTF-8，跳过UTF-8 BOM)
+    """
+    if head.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        return 'utf-32'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return 'utf-8-sig'
+
+
+def lexer_input(data):
+    """
+    把decode、tokenize接受的输入整理为(token流的源文本, 交给iter_tokens的文本, 起始偏移)
+
+    str原样使用；bytes、bytearray、memoryview和mmap按开头的BOM判断编码：UTF-16、UTF-32先整体解码为str，
+    纯ASCII的直接转为str，其余按UTF-8直接做词法分析(偏移是字节偏移，UTF-8 BOM从第3个字节开始跳过)，只有取出token文本时才解码
+    """
+    if isinstance(data, str):
+        return data, data, 0
+    if isinstance(data, memoryview):
+        # memoryview没有find，扫描字符串时需要，复制一次字节但不做转码
+        data = data.tobytes()
+    head = data[:4]
+    encoding = bom_encoding(head)
+    if encoding != 'utf-8-sig':
+        text = str(data, encoding)
+        return text, text, 0
+    if not isinstance(data, mmap.mmap) and data.isascii():
+        # 纯ASCII时字符偏移就是字节偏移，整体转为str几乎没有开销，比逐个token解码快
+        text = str(data, 'ascii')
+        return text, text, 0
+    return fJsonUtf8Source(data), data, len(codecs.BOM_UTF8) if head.startswith(codecs.BOM_UTF8) else 0
+
+
+class fJsonTokenStream:
+    """
+    紧凑的token流
+
+    类型以小整数存放在kinds中，位置存放在positions中，token文本用源字符串中的[starts, ends)偏移表示，
+    只有转义后的字符串、合并后的负数这类无法直接从源字符串切片得到的文本才另外记录在texts中。
+    按下标访问时返回与旧版相同的{'token', 'type', 'position'}字典。
+
+    pairs是括号配对表，对左括号记录对应右括号的下标，对右括号记录对应左括号的下标，其余为-1，
+    所有匹配器共享同一个token流，通过配对表以O(1)取得一个括号分组的范围。
+    literal_groups与pairs同时生成，对括号内(不含更深的分组)除逗号和冒号外没有运算符的左括号记为1，见fJsonLiteral。
+
+    group_memo是按窗口(start, stop)记录的顶层分组表(见fJsonTokenView.groups)，fJsonValue的各个匹配器共用，
+    每个窗口只扫描一次；group_scans、group_hits分别是实际扫描和复用的次数
+
+    lazy为True时集合相乘和list/str/bytes重复的结果为惰性的视图(见mul_div_values)；
+    budget是DecodeBudget，pair_brackets检查嵌套深度，运算时检查结果的大小；
+    hook是DecodeHook，fJsonValue向它报告每个匹配器的尝试；max_depth是pair_brackets得到的最大嵌套深度
+    """
+    def __init__(self, source=''):
+        self.source = source
+        self.kinds = array('B')
+        self.positions = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts = {}
+        self.pairs = None
+        self.literal_groups = None
+        self.group_memo = {}
+        self.group_scans = 0
+        self.group_hits = 0
+        self.lazy = False
+        self.budget = None
+        self.hook = None
+        self.max_depth = 0
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        # 由{'token', 'type', 'position'}字典列表构造，源字符串为各token文本的拼接
+        stream = cls()
+        texts = []
+        offset = 0
+        for token in tokens:
+            stream.append(fJsonTokenType.names.index(token['type']), token['position'], offset, offset + len(token['token']))
+            texts.append(token['token'])
+            offset += len(token['token'])
+        stream.source = ''.join(texts)
+        return stream
+
+    def append(self, kind, position, start, end, text=None):
+        if text is not None:
+            self.texts[len(self.kinds)] = text
+        self.kinds.append(kind)
+        self.positions.append(position)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, tokens):
+        # 追加iter_tokens生成的(类型编号, 位置, 文本起点, 文本终点, 文本)
+        kinds_append = self.kinds.append
+        positions_append = self.positions.append
+        starts_append = self.starts.append
+        ends_append = self.ends.append
+        texts = self.texts
+        for kind, position, start, end, text in tokens:
+            if text is not None:
+                texts[len(self.kinds)] = text
+            kinds_append(kind)
+            positions_append(position)
+            starts_append(start)
+            ends_append(end)
+        return self
+
+    def select(self, indices):
+        # 按下标批量取出token，组成新的token流
+        stream = fJsonTokenStream(self.source)
+        stream.kinds = array('B', map(self.kinds.__getitem__, indices))
+        stream.positions = array('q', map(self.positions.__getitem__, indices))
+        stream.starts = array('q', map(self.starts.__getitem__, indices))
+        stream.ends = array('q', map(self.ends.__getitem__, indices))
+        if len(self.texts) != 0:
+            texts = self.texts
+            stream.texts = {new: texts[old] for new, old in enumerate(indices) if old in texts}
+        return stream
+
+    def text(self, index):
+        text = self.texts.get(index)
+        if text is None:
+            return self.source[self.starts[index]:self.ends[index]]
+        return text
+
+    def is_symbol(self, index, symbol):
+        return self.kinds[index] == fJsonTokenType.TokenKind_SYMBOL and self.source[self.starts[index]:self.ends[index]] == symbol
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index.__class__ is slice:
+            return [self[i] for i in range(*index.indices(len(self.kinds)))]
+        if index < 0:
+            index += len(self.kinds)
+        return {'token': self.text(index), 'type': fJsonTokenType.names[self.kinds[index]], 'position': self.positions[index]}
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self[i]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def pair_brackets(self):
+        pairs = array('q', [-1]) * len(self.kinds)
+        literal_groups = bytearray(len(self.kinds))
+        stack = []
+        # 与stack对应，各个未闭合的分组中到目前为止是否只出现过逗号和冒号
+        literal = []
+        max_depth = self.budget.max_depth if self.budget is not None else None
+        depth = 0
+        for i in range(len(self.kinds)):
+            if self.kinds[i] != fJsonTokenType.TokenKind_SYMBOL:
+                continue
+            token = self.source[self.starts[i]:self.ends[i]]
+            if token in ('{', '[', '('):
+                stack.append(i)
+                literal.append(True)
+                if len(stack) > depth:
+                    depth = len(stack)
+                    if max_depth is not None and depth > max_depth:
+                        raise BudgetExceeded('max_depth', max_depth, self.positions[i])
+            elif token in ('}', ']', ')'):
+                if len(stack) == 0 or BRACKET_PAIRS[self.text(stack[-1])] != token:
+                    raise Exception('Unmatched bracket ' + token + ' at position ' + str(self.positions[i]))
+                opening = stack.pop()
+                pairs[opening] = i
+                pairs[i] = opening
+                if literal.pop():
+                    literal_groups[opening] = 1
+            elif token != ',' and token != ':' and len(literal) != 0:
+                literal[-1] = False
+        if len(stack) != 0:
+            raise Exception('Unmatched bracket ' + self.text(stack[-1]) + ' at position ' + str(self.positions[stack[-1]]))
+        self.pairs = pairs
+        self.literal_groups = literal_groups
+        self.group_memo = {}
+        self.max_depth = depth
+        return self
+
+    def view(self, start=0, stop=None):
+        if self.pairs is None:
+            self.pair_brackets()
+        return fJsonTokenView(self, start, len(self.kinds) if stop is None else stop)
+
+
+class fJsonTokenView:
+    """
+    token流上的[start, stop)窗口，下标相对于start，切片得到新的窗口而不复制token
+    """
+    __slots__ = ('stream', 'start', 'stop')
+
+    def __init__(self, stream, start, stop):
+        self.stream = stream
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if index.__class__ is slice:
+            start, stop, _ = index.indices(self.stop - self.start)
+            return fJsonTokenView(self.stream, self.start + start, self.start + max(start, stop))
+        return self.stream[self.absolute(index)]
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.stream[i]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def absolute(self, index):
+        # 相对下标转换为token流中的下标，支持负数下标
+        if index < 0:
+            index += self.stop - self.start
+            if index < 0:
+                raise IndexError('token index out of range')
+        elif index >= self.stop - self.start:
+            raise IndexError('token index out of range')
+        return self.start + index
+
+    # 以下访问方法由匹配器在已检查长度后调用，不再做越界检查
+    def text(self, index):
+        return self.stream.text(self.start + index if index >= 0 else self.stop + index)
+
+    def kind(self, index):
+        return self.stream.kinds[self.start + index if index >= 0 else self.stop + index]
+
+    def is_symbol(self, index, symbol):
+        stream = self.stream
+        index = self.start + index if index >= 0 else self.stop + index
+        return stream.kinds[index] == fJsonTokenType.TokenKind_SYMBOL and stream.source[stream.starts[index]:stream.ends[index]] == symbol
+
+    def group_end(self, offset):
+        # 从offset开始的分组的结尾(不含)，遇到多余的右括号时返回offset本身
+        index = self.start + offset
+        pair = self.stream.pairs[index]
+        if pair < 0:
+            return offset + 1
+        if pair < index:
+            return offset
+        return min(pair + 1, self.stop) - self.start
+
+    def groups(self):
+        """
+        窗口的顶层分组边界(相对下标)，第i个分组为[bounds[i], bounds[i + 1])；
+        遇到多余的右括号时停止扫描，此时bounds[-1] < len(self)
+
+        结果记录在token流中，同一窗口的多个匹配器共用一次扫描
+        """
+        stream = self.stream
+        key = (self.start, self.stop)
+        bounds = stream.group_memo.get(key)
+        if bounds is not None:
+            stream.group_hits += 1
+            return bounds
+        stream.group_scans += 1
+        bounds = [0]
+        offset = 0
+        length = self.stop - self.start
+        while offset < length:
+            end = self.group_end(offset)
+            if end == offset:
+                break
+            bounds.append(end)
+            offset = end
+        stream.group_memo[key] = bounds
+        return bounds
+
+
+def split_items(stream, lo, hi):
+    """
+    按顶层逗号切分token流中的[lo, hi)，返回每一项的(起点, 终点, 第一个顶层冒号的位置, 之后的顶层冒号数)，
+    没有冒号时位置为-1。括号分组整体跳过，与fJsonDict相同，fJsonLiteral和各个解析引擎共用
+    """
+    kinds = stream.kinds
+    pairs = stream.pairs
+    SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+    items = []
+    begin = lo
+    colon = -1
+    extra = 0
+    offset = lo
+    while offset < hi:
+        if kinds[offset] == SYMBOL:
+            symbol = stream.source[stream.starts[offset]:stream.ends[offset]]
+            if symbol == ',':
+                items.append((begin, offset, colon, extra))
+                begin = offset + 1
+                colon = -1
+                extra = 0
+            elif symbol == ':':
+                if colon < 0:
+                    colon = offset
+                else:
+                    extra += 1
+        offset = pairs[offset] + 1 if pairs[offset] >= 0 else offset + 1
+    items.append((begin, hi, colon, extra))
+    return items
+
+def collection_production(stream, head, lo, hi):
+    """
+    {...}或[...]内[lo, hi)的产生式，返回(产生式, 各项的(起点, 终点, 被忽略的冒号数), None)
+
+    '['为'List'，忽略空项；'{'时每一项都有键和值为'Dict'，各项依次为键和值，值中第一个冒号之后的顶层冒号被忽略，
+    冒号数不为0时要用strip_colons去掉它们再解析；任意一项缺少值时为'Set'，各项为整个元素
+    """
+    items = split_items(stream, lo, hi)
+    if head == '[':
+        return 'List', [(begin, end, 0) for begin, end, colon, extra in items if begin < end], None
+    for begin, end, colon, extra in items:
+        if colon < 0 or end - colon - 1 == extra:
+            return 'Set', [(begin, end, 0) for begin, end, colon, extra in items], None
+    operands = []
+    for begin, end, colon, extra in items:
+        operands.append((begin, colon, 0))
+        operands.append((colon + 1, end, extra))
+    return 'Dict', operands, None
+
+def value_production(stream, starts, semicolons, commas, dots, lo, hi):
+    """
+    [lo, hi)对应的产生式，starts、semicolons、commas、dots是fJsonParser.scan_groups的结果
+
+    有顶层分号时为'Lines'(保留空行)，有顶层逗号时为'Tuple'(忽略空项)，各项为(起点, 终点, 0)；
+    否则由expression_production选择
+    """
+    if len(semicolons) != 0:
+        operands = []
+        begin = lo
+        for index in semicolons:
+            operands.append((begin, starts[index], 0))
+            begin = starts[index] + 1
+        operands.append((begin, hi, 0))
+        return 'Lines', operands, None
+    if len(commas) != 0:
+        operands = []
+        begin = lo
+        for index in commas:
+            if begin < starts[index]:
+                operands.append((begin, starts[index], 0))
+            begin = starts[index] + 1
+        if begin < hi:
+            operands.append((begin, hi, 0))
+        return 'Tuple', operands, None
+    return expression_production(stream, starts, dots, 0, len(starts) - 1)
+
+def expression_production(stream, starts, dots, first, last):
+    """
+    第first到第last-1个顶层分组(没有顶层的分号和逗号)对应的产生式，fJsonParser、fJsonStackParser、fJsonCompiler共用，
+    优先级与fJsonValue中匹配器的顺序相同
+
+    返回(产生式, 操作数, 附加数据)，PRODUCTION_REDUCERS[产生式](stream, 各操作数的值, 附加数据)是结果。
+    产生式在VALUE_PRODUCTIONS中时操作数是token范围(起点, 终点, 被忽略的冒号数)，按parse_value解析；
+    否则是分组范围(first, last)，按parse_expression解析。'Token'和'Constant'没有操作数
+    """
+    if first >= last:
+        return 'Constant', (), None
+    kinds = stream.kinds
+    SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+    lo = starts[first]
+    hi = starts[last]
+    if hi - lo == 1 and kinds[lo] != SYMBOL:
+        return 'Token', (), lo
+    source = stream.source
+    token_starts = stream.starts
+    token_ends = stream.ends
+    count = last - first
+    operator = None
+    if count >= 2:
+        index = starts[first + 1]
+        if kinds[index] == SYMBOL:
+            operator = source[token_starts[index]:token_ends[index]]
+    head = source[token_starts[lo]:token_ends[lo]] if kinds[lo] == SYMBOL else None
+    tail = source[token_starts[hi - 1]:token_ends[hi - 1]] if kinds[hi - 1] == SYMBOL else None
+
+    if operator is not None:
+        if operator == ':' and count >= 4 and stream.is_symbol(starts[first + 3], ':='):
+            return 'Declaration', ((first, first + 1), (first + 2, first + 3)), (starts[first + 3] + 1, hi)
+        if operator == '=':
+            return 'Assign', ((first, first + 1), (first + 2, last)), None
+        if operator == '|>':
+            return 'Pipe', ((first, first + 1), (first + 2, last)), None
+        if operator == '?' and count >= 4 and stream.is_symbol(starts[first + 3], ':'):
+            return 'If', ((first, first + 1), (first + 2, first + 3), (first + 4, last)), None
+        if operator == '+':
+            return 'Concat', ((first, first + 1), (first + 2, last)), stream.positions[starts[first + 1]]
+        if operator == '*' or operator == '/':
+            return 'MulDiv', ((first, first + 1), (first + 2, last)), (operator, stream.positions[starts[first + 1]])
+        if operator == ':>':
+            return 'Contains', ((first, first + 1), (first + 2, last)), None
+    if hi - lo >= 2 and head == '--':
+        return argument_production(stream, starts, first, last)
+    if operator == '->':
+        return 'FunctionType', ((first, first + 1), (first + 2, last)), None
+    if (head == '{' and tail == '}') or (head == '[' and tail == ']'):
+        return collection_production(stream, head, lo + 1, stream.pairs[lo])
+    name_hi = starts[last - 1]
+    if stream.is_symbol(name_hi, '(') and name_hi > lo and not (name_hi - lo == 1 and kinds[lo] == fJsonTokenType.TokenKind_IDENTIFIER
+                                                                and stream.text(lo).lower() in ('null', 'none')):
+        # 函数名为空或是null时fJsonFunctionCall不匹配，继续尝试后面的产生式；其余写法的函数名都不会是None
+        return 'FunctionCall', ((first, last - 1), (last - 1, last)), None
+    index = bisect.bisect_left(dots, last) - 1
+    if index >= 0 and first < dots[index] < last - 1:
+        return 'GetMember', ((first, dots[index]), (dots[index] + 1, last)), None
+    if count == 1 and head == '(':
+        if hi - lo == 2:
+            return 'Constant', (), () # 空元组
+        return 'Paren', ((lo + 1, hi - 1, 0),), None
+    if hi - lo == 1:
+        return 'Token', (), lo
+    raise Exception('Invalid JSON value')
+
+def argument_production(stream, starts, first, last):
+    # 对应fJsonArgument，--key value1 value2 ...；操作数依次为每个键和它的各个值，附加数据是每个键的值的个数
+    pairs = []
+    key = None
+    values = []
+    for index in range(first, last):
+        if stream.is_symbol(starts[index], '--'):
+            if key is not None:
+                pairs.append((key, values))
+            key = None
+            values = []
+            continue
+        if key is None:
+            key = index
+            continue
+        values.append(index)
+    if key is None:
+        raise Exception('Invalid JSON value') # 非法格式
+    pairs.append((key, values))
+
+    operands = []
+    counts = []
+    for key, values in pairs:
+        operands.append((key, key + 1))
+        operands.extend([(index, index + 1) for index in values])
+        counts.append(len(values))
+    return 'Argument', operands, counts
+
+def reduce_if(stream, values, data):
+    # 与fJsonIfExpression相同，两个分支都已求值
+    condition_value, true_value, false_value = values
+    if type(condition_value) != bool:
+        raise Exception('Invalid if condition: ' + str(condition_value))
+    result = true_value if condition_value else false_value
+    if result is None:
+        # 级联中条件表达式返回None时，后续匹配器最终都会失败
+        raise Exception('Invalid JSON value')
+    return result
+
+def reduce_argument(stream, values, counts):
+    match_dict = {}
+    offset = 0
+    for count in counts:
+        match_dict[values[offset]] = values[offset + 1:offset + 1 + count]
+        offset += 1 + count
+    return match_dict
+
+def reduce_function_type(stream, values, data):
+    left_value, right_value = values
+    if not isinstance(left_value, tuple):
+        left_value = (left_value,)
+    if not isinstance(right_value, tuple):
+        right_value = (right_value,)
+    return fJsonSpecialType("FunctionType", (left_value, right_value))
+
+def function_call_value(function_name, arguments):
+    if function_name is None:
+        # 只在compile的函数名被绑定为None时出现，decode之后的产生式都无法匹配
+        raise Exception('Invalid JSON value')
+    if not isinstance(arguments, tuple):
+        arguments = (arguments,)
+    return fJsonSpecialType("FunctionCall", (function_name, arguments))
+
+def dict_key(key):
+    # 字典的键转换为字符串，None保持为None(该项被跳过)
+    if key is None:
+        return None
+    try:
+        return str(key)
+    except:
+        raise Exception('Invalid JSON key')
+
+def reduce_dict(stream, values, data):
+    # values依次为各项的键和值，键为None的项被跳过
+    match_dict = {}
+    items = iter(values)
+    for key in items:
+        value = next(items)
+        if key.__class__ is not str:
+            key = dict_key(key)
+            if key is None:
+                continue
+        match_dict[key] = value
+    return match_dict
+
+def paren_value(value):
+    if value is None:
+        raise Exception('Invalid JSON value')
+    return value
+
+# 各产生式由操作数的值得到结果的函数，参数为(token流, 操作数的值, 附加数据)
+PRODUCTION_REDUCERS = {
+    'Lines': lambda stream, values, data: fJsonSpecialType("Lines", values),
+    'Tuple': lambda stream, values, data: tuple(values),
+    'Declaration': lambda stream, values, body: fJsonSpecialType("Declaration", (values[0], values[1], stream[body[0]:body[1]])),
+    'Assign': lambda stream, values, data: fJsonSpecialType("Assign", (values[0], values[1])),
+    'Pipe': lambda stream, values, data: fJsonSpecialType("Pipe", (values[0], values[1])),
+    'If': reduce_if,
+    'Concat': lambda stream, values, position: concat_values(values[0], values[1], stream.budget, position),
+    'MulDiv': lambda stream, values, data: mul_div_values(values[0], data[0], values[1], stream.lazy, stream.budget, data[1]),
+    'Contains': lambda stream, values, data: contains_values(values[0], values[1]),
+    'Argument': reduce_argument,
+    'FunctionType': reduce_function_type,
+    'Dict': reduce_dict,
+    'Set': lambda stream, values, data: set(values),
+    'List': lambda stream, values, data: values,
+    'FunctionCall': lambda stream, values, data: function_call_value(values[0], values[1]),
+    'GetMember': lambda stream, values, data: fJsonSpecialType("GetMember", (values[0], values[1])),
+    'Paren': lambda stream, values, data: paren_value(values[0]),
+    'Constant': lambda stream, values, value: value,
+    'Token': lambda stream, values, index: get_value_from_token(stream.kinds[index], stream.text(index)),
+}
+
+# 操作数是token范围而不是分组范围的产生式
+VALUE_PRODUCTIONS = frozenset(('Lines', 'Tuple', 'Dict', 'Set', 'List', 'Paren'))
+
 class fJsonParser:
+    """
+    单遍解析器，与fJsonBuilder的匹配器级联产生相同的值
+
+    fJsonValue会依次尝试全部匹配器，每个匹配器都要重新扫描token并复制列表；
+    这里先一次性计算括号配对表，再对每一层只扫描一遍顶层分组，
+    根据分号、逗号以及第一个分组之后的运算符直接决定产生式(见expression_production)，右侧操作数复用同一份分组表
+    """
     def __init__(self):
         self.lexer = fJsonLexer()
+        self.stream = None
+        self.pairs = None
 
     def parse(self, text):
         tokens = self.lexer.tokenize(text)
         tokens = self.lexer.reject_comments(tokens)
+        tokens = self.lexer.concat_negative_number(tokens)
+        return self.parse_tokens(tokens)
+
+    def parse_tokens(self, tokens):
+        if not isinstance(tokens, fJsonTokenStream):
+            tokens = fJsonTokenStream.from_tokens(tokens)
+        if tokens.pairs is None:
+            tokens.pair_brackets()
+        self.stream = tokens
+        self.pairs = tokens.pairs
+        return self.parse_value(0, len(tokens))
+
+    def scan_groups(self, lo, hi):
+        # 扫描[lo, hi)的顶层分组，返回各分组起点(末尾附加hi)以及分号、逗号、点号所在的分组下标
+        stream = self.stream
+        pairs = self.pairs
+        starts = []
+        semicolons = []
+        commas = []
+        dots = []
+        offset = lo
+        while offset < hi:
+            if stream.kinds[offset] == fJsonTokenType.TokenKind_SYMBOL:
+                token = stream.source[stream.starts[offset]:stream.ends[offset]]
+                if token == ';':
+                    semicolons.append(len(starts))
+                elif token == ',':
+                    commas.append(len(starts))
+                elif token == '.':
+                    dots.append(len(starts))
+            starts.append(offset)
+            offset = pairs[offset] + 1 if pairs[offset] >= 0 else offset + 1
+        starts.append(hi)
+        return starts, semicolons, commas, dots
+
+    def parse_value(self, lo, hi):
+        # 对应fJsonValue
+        if lo >= hi:
+            return None
+        starts, semicolons, commas, dots = self.scan_groups(lo, hi)
+        production, operands, data = value_production(self.stream, starts, semicolons, commas, dots, lo, hi)
+        return self.reduce(production, operands, data, starts, dots)
+
+    def parse_expression(self, starts, dots, first, last):
+        # 解析第first到第last-1个分组，没有顶层的分号和逗号
+        production, operands, data = expression_production(self.stream, starts, dots, first, last)
+        return self.reduce(production, operands, data, starts, dots)
+
+    def reduce(self, production, operands, data, starts, dots):
+        # 解析各操作数，再由PRODUCTION_REDUCERS得到产生式的结果
+        if production in VALUE_PRODUCTIONS:
+            values = [self.parse_item(lo, hi, extra) for lo, hi, extra in operands]
+        else:
+            values = [self.parse_expression(starts, dots, first, last) for first, last in operands]
+        return PRODUCTION_REDUCERS[production](self.stream, values, data)
+
+    def parse_item(self, lo, hi, extra):
+        # 字典的值中有被忽略的冒号(extra不为0)时，去掉它们后用同一种引擎解析
+        if extra == 0:
+            return self.parse_value(lo, hi)
+        return self.parse_stream(strip_colons(self.stream, lo, hi))
+
+    def parse_stream(self, tokens):
+        # 用同一种引擎解析另一个token流(strip_colons的结果)
+        return type(self)().parse_tokens(tokens)
+
+class fJsonStackParser(fJsonParser):
+    """
+    不使用递归的解析器，产生式的选择和结果与fJsonParser相同
+
+    每个产生式写成生成器(task)，需要子结果时yield子task，由run用显式的栈依次执行并把结果send回去，
+    嵌套深度只受内存限制，不会因为Python的递归深度限制而抛出RecursionError。
+    单个非符号token直接取值，不创建task
+    """
+    def parse_tokens(self, tokens):
+        if not isinstance(tokens, fJsonTokenStream):
+            tokens = fJsonTokenStream.from_tokens(tokens)
+        if tokens.pairs is None:
+            tokens.pair_brackets()
+        self.stream = tokens
+        self.pairs = tokens.pairs
+        return self.run(self.value_task(0, len(tokens)))
+
+    def parse_value(self, lo, hi):
+        return self.run(self.value_task(lo, hi))
+
+    def run(self, task):
+        # stack中是等待子结果的task，栈顶的task结束时把结果send给下一个
+        stack = [task]
+        result = None
+        while True:
+            try:
+                child = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                if len(stack) == 0:
+                    return stop.value
+                result = stop.value
+                continue
+            stack.append(child)
+            result = None
+
+    def leaf(self, lo, hi):
+        # [lo, hi)是单个非符号token时返回它的值，否则返回None，由调用者创建task
+        stream = self.stream
+        if hi - lo == 1 and stream.kinds[lo] != fJsonTokenType.TokenKind_SYMBOL:
+            return get_value_from_token(stream.kinds[lo], stream.text(lo)),
+        return None
+
+    def value_task(self, lo, hi):
+        # 对应parse_value
+        if lo >= hi:
+            return self.reduce_task('Constant', (), None, None, None)
+        starts, semicolons, commas, dots = self.scan_groups(lo, hi)
+        production, operands, data = value_production(self.stream, starts, semicolons, commas, dots, lo, hi)
+        return self.reduce_task(production, operands, data, starts, dots)
+
+    def expression_task(self, starts, dots, first, last):
+        # 对应parse_expression
+        production, operands, data = expression_production(self.stream, starts, dots, first, last)
+        return self.reduce_task(production, operands, data, starts, dots)
+
+    def reduce_task(self, production, operands, data, starts, dots):
+        # 对应reduce，操作数是单个非符号token时直接取值
+        stream = self.stream
+        values = []
+        if production in VALUE_PRODUCTIONS:
+            for lo, hi, extra in operands:
+                if extra != 0:
+                    values.append(self.parse_stream(strip_colons(stream, lo, hi)))
+                    continue
+                leaf = self.leaf(lo, hi)
+                values.append(leaf[0] if leaf is not None else (yield self.value_task(lo, hi)))
+        else:
+            for first, last in operands:
+                leaf = self.leaf(starts[first], starts[last]) if last - first == 1 else None
+                values.append(leaf[0] if leaf is not None else (yield self.expression_task(starts, dots, first, last)))
+        return PRODUCTION_REDUCERS[production](stream, values, data)
+
+def constant_node(value):
+    # 求值结果固定的节点，只用于不可变的值
+    return lambda bindings: value
+
+# 不可修改的值的类型，编译时得到的这类值可以在多次求值之间共享
+IMMUTABLE_CLASSES = frozenset((str, int, float, bool, bytes, type(None)))
+
+def is_immutable(value):
+    if value.__class__ in IMMUTABLE_CLASSES:
+        return True
+    if value.__class__ is tuple:
+        return all(is_immutable(item) for item in value)
+    return False
+
+def constant_copy_node(value):
+    # 编译时得到的值对应的节点: 不可修改的值直接共享，元素都不可修改的list、set、dict每次返回浅复制，
+    # 嵌套的list、dict由各元素的节点重新构造，其余每次用copy_value复制
+    if is_immutable(value):
+        return constant_node(value)
+    cls = value.__class__
+    if cls is list:
+        if all(map(is_immutable, value)):
+            return lambda bindings: value.copy()
+        nodes = [constant_copy_node(item) for item in value]
+        return lambda bindings: [node(bindings) for node in nodes]
+    if cls is dict:
+        if all(map(is_immutable, value.values())):
+            return lambda bindings: value.copy()
+        items = [(key, constant_copy_node(item)) for key, item in value.items()]
+        return lambda bindings: {key: node(bindings) for key, node in items}
+    if cls is set and all(map(is_immutable, value)):
+        return lambda bindings: value.copy()
+    return lambda bindings: copy_value(value)
+
+class fJsonCompiler(fJsonParser):
+    """
+    把token流编译为求值节点，节点是接受绑定字典、返回值的函数
+
+    产生式的选择与fJsonParser相同，只取决于token；运算、条件判断以及标识符的替换这类依赖值的部分推迟到求值时进行。
+    除true、false、null这类关键字以外的标识符都可以被绑定，没有绑定时与decode相同，仍是标识符本身的字符串；
+    字典的键和--key的参数名与decode相同，是名字本身，其中的标识符不被替换(bindable为False)。
+    不含可以被绑定的标识符的部分在编译时计算(constants记录这些节点的值)，求值时只返回它的副本
+    """
+    bindable = True
+
+    def compile_tokens(self, tokens):
+        if tokens.pairs is None:
+            tokens.pair_brackets()
+        self.stream = tokens
+        self.pairs = tokens.pairs
+        self.names = set()
+        self.constants = {}
+        return self.compile_value(0, len(tokens))
+
+    def compile_stream(self, tokens):
+        # 编译另一个token流(strip_colons的结果)，其中可以被绑定的标识符并入names
+        compiler = fJsonCompiler()
+        compiler.bindable = self.bindable
+        node = compiler.compile_tokens(tokens)
+        self.names |= compiler.names
+        self.constants.update(compiler.constants)
+        return node
+
+    def constant(self, value):
+        # 求值结果固定的节点，外层的产生式的操作数都是这样的节点时在编译时直接计算
+        node = constant_copy_node(value)
+        self.constants[node] = value
+        return node
+
+    def compile_value(self, lo, hi):
+        # 对应parse_value
+        if lo >= hi:
+            return self.constant(None)
+        starts, semicolons, commas, dots = self.scan_groups(lo, hi)
+        production, operands, data = value_production(self.stream, starts, semicolons, commas, dots, lo, hi)
+        return self.compile_production(production, operands, data, starts, dots)
+
+    def compile_expression(self, starts, dots, first, last):
+        # 对应parse_expression
+        production, operands, data = expression_production(self.stream, starts, dots, first, last)
+        return self.compile_production(production, operands, data, starts, dots)
+
+    def compile_token(self, index):
+        # 单个token，可以被绑定的标识符在求值时查找绑定
+        stream = self.stream
+        text = stream.text(index)
+        value = get_value_from_token(stream.kinds[index], text)
+        if self.bindable and stream.kinds[index] == fJsonTokenType.TokenKind_IDENTIFIER and value is text:
+            self.names.add(text)
+            return lambda bindings: bindings.get(text, text)
+        return self.constant(value)
+
+    def compile_operand(self, production, operand, starts, dots):
+        if production in VALUE_PRODUCTIONS:
+            lo, hi, extra = operand
+            if extra != 0:
+                return self.compile_stream(strip_colons(self.stream, lo, hi))
+            return self.compile_value(lo, hi)
+        first, last = operand
+        return self.compile_expression(starts, dots, first, last)
+
+    def compile_name(self, production, operand, starts, dots):
+        # 字典的键、--key的参数名，其中的标识符不被替换
+        bindable = self.bindable
+        self.bindable = False
+        try:
+            return self.compile_operand(production, operand, starts, dots)
+        finally:
+            self.bindable = bindable
+
+    def compile_production(self, production, operands, data, starts, dots):
+        # 对应reduce: 先编译各操作数，求值时把它们的值交给PRODUCTION_REDUCERS
+        if production == 'Token':
+            return self.compile_token(data)
+        if production == 'Constant':
+            return self.constant(data)
+        if production == 'Dict':
+            names = range(0, len(operands), 2)
+        elif production == 'Argument':
+            names = set()
+            offset = 0
+            for count in data:
+                names.add(offset)
+                offset += 1 + count
+        else:
+            names = ()
+        nodes = [self.compile_name(production, operand, starts, dots) if index in names else self.compile_operand(production, operand, starts, dots)
+                 for index, operand in enumerate(operands)]
+        stream = self.stream
+        reduce = PRODUCTION_REDUCERS[production]
+        constants = self.constants
+        if all(node in constants for node in nodes):
+            try:
+                # 结果可能包含操作数本身，传入副本，constants中的值不被共享
+                value = reduce(stream, [copy_value(constants[node]) for node in nodes], data)
+            except Exception:
+                pass # 与decode相同的异常在每次求值时抛出
+            else:
+                return self.constant(value)
+        if production == 'Dict':
+            # 与reduce_dict相同，逐项求值，省去中间的列表
+            items = list(zip(nodes[::2], nodes[1::2]))
+            def dictionary(bindings):
+                match_dict = {}
+                for key, value in items:
+                    key = key(bindings)
+                    value = value(bindings)
+                    if key.__class__ is not str:
+                        key = dict_key(key)
+                        if key is None:
+                            continue
+                    match_dict[key] = value
+                return match_dict
+            return dictionary
+        if production == 'List':
+            return lambda bindings: [node(bindings) for node in nodes]
+        # 大多数产生式只有一两个操作数，直接调用PRODUCTION_REDUCERS所用的运算函数，不经过列表
+        if len(nodes) == 1:
+            node, = nodes
+            if production == 'Paren':
+                # 与paren_value相同，内联以省去一层调用
+                def parenthesized(bindings):
+                    result = node(bindings)
+                    if result is None:
+                        raise Exception('Invalid JSON value')
+                    return result
+                return parenthesized
+            return lambda bindings: reduce(stream, [node(bindings)], data)
+        if len(nodes) == 2:
+            left, right = nodes
+            if production == 'Concat':
+                budget = stream.budget
+                return lambda bindings: concat_values(left(bindings), right(bindings), budget, data)
+            if production == 'MulDiv':
+                operator, position = data
+                lazy = stream.lazy
+                budget = stream.budget
+                return lambda bindings: mul_div_values(left(bindings), operator, right(bindings), lazy, budget, position)
+            if production == 'Contains':
+                return lambda bindings: contains_values(left(bindings), right(bindings))
+            if production == 'FunctionCall':
+                # 与function_call_value相同，内联以省去一层调用
+                def function_call(bindings):
+                    function_name = left(bindings)
+                    if function_name is None:
+                        raise Exception('Invalid JSON value')
+                    arguments = right(bindings)
+                    if not isinstance(arguments, tuple):
+                        arguments = (arguments,)
+                    return fJsonSpecialType("FunctionCall", (function_name, arguments))
+                return function_call
+            return lambda bindings: reduce(stream, [left(bindings), right(bindings)], data)
+        return lambda bindings: reduce(stream, [node(bindings) for node in nodes], data)
+
+class fJsonTemplate:
+    """
+    compile返回的编译后的表达式
+
+    evaluate(**bindings)把标识符替换为同名绑定的值后求值，不会重新进行词法分析和解析；
+    names是表达式中可以被绑定的标识符
+    """
+    def __init__(self, node, names):
+        self.node = node
+        self.names = frozenset(names)
+
+    def evaluate(self, **bindings):
+        return self.node(bindings)
 
 class fJsonBuilder:
     def __init__(self,tokens):
+        if not isinstance(tokens, fJsonTokenView):
+            if not isinstance(tokens, fJsonTokenStream):
+                tokens = fJsonTokenStream.from_tokens(tokens)
+            tokens = tokens.view()
         self.tokens = tokens
     def build(self):
         return fJsonValue(self.tokens).match()
         
 
-class NextToken:
-    # 用于获取下一个token list的类，自动匹配括号
+class fJsonLiteral:
+    """
+    只含字面量的括号分组: pair_brackets标记在literal_groups中的{...}、[...]、(...)，括号内除逗号和冒号外没有运算符，
+    不经过各个表达式匹配器，直接按逗号和冒号切分(与各个解析引擎共用collection_production)，
+    结果与fJsonDict、fJsonSet、fJsonList、fJsonOrderChange相同。
+    每一项是单个非符号token时直接取值，其余(更深的分组、a b、f(x)、列表中的a: 1等)交给fJsonValue
+    """
     def __init__(self, tokens):
         self.tokens = tokens
-        self.index = 0
-    def next(self, start_idx:int):
-        stack = []
-        next_tokens = []
-        if start_idx >= len(self.tokens):
-            return next_tokens
-        while True:
-            if self.tokens[start_idx]['token'] in ('{', '[', '(') and self.tokens[start_idx]['type'] == fJsonTokenType.TokenType_SYMBOL:
-                stack.append(self.tokens[start_idx]['token'])
-                next_tokens.append(self.tokens[start_idx])
-            elif self.tokens[start_idx]['token'] in ('}', ']', ')') and self.tokens[start_idx]['type'] == fJsonTokenType.TokenType_SYMBOL:
-                if len(stack) == 0:
-                    return next_tokens
-                    #raise Exception('Unmatched bracket')
-                poped = stack.pop()
-                if (poped == '{' and self.tokens[start_idx]['token'] != '}') or \
-                    (poped == '[' and self.tokens[start_idx]['token'] != ']') or \
-                    (poped == '(' and self.tokens[start_idx]['token'] != ')'):
-                    raise Exception('Unmatched bracket')
-                
-                next_tokens.append(self.tokens[start_idx])
+    def match(self):
+        tokens = self.tokens
+        stream = tokens.stream
+        start = tokens.start
+        if tokens.stop - start < 2 or not stream.literal_groups[start] or stream.pairs[start] != tokens.stop - 1:
+            return None
+        self.stream = stream
+        head = stream.text(start)
+        if head == '(':
+            items = split_items(stream, start + 1, tokens.stop - 1)
+            if len(items) != 1:
+                return tuple([self.value(begin, end) for begin, end, colon, extra in items if begin < end])
+            if tokens.stop - start == 2:
+                return () # 空元组
+            result = self.value(start + 1, tokens.stop - 1)
+            if result is None:
+                raise Exception('Invalid JSON value')
+            return result
+        production, operands, data = collection_production(stream, head, start + 1, tokens.stop - 1)
+        kinds = stream.kinds
+        SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+        values = []
+        for lo, hi, extra in operands:
+            if hi - lo == 1 and extra == 0 and kinds[lo] != SYMBOL:
+                values.append(get_value_from_token(kinds[lo], stream.text(lo)))
             else:
-                next_tokens.append(self.tokens[start_idx])
-            start_idx += 1            
-            if len(stack) == 0 or start_idx >= len(self.tokens):
-                break
-        return next_tokens
+                values.append(self.value(lo, hi, extra))
+        return PRODUCTION_REDUCERS[production](stream, values, data)
+
+    def value(self, lo, hi, extra=0):
+        stream = self.stream
+        if extra != 0:
+            # 值中第一个冒号之后的顶层冒号被忽略
+            return fJsonValue(strip_colons(stream, lo, hi).view()).match()
+        if hi - lo == 1 and stream.kinds[lo] != fJsonTokenType.TokenKind_SYMBOL:
+            return get_value_from_token(stream.kinds[lo], stream.text(lo))
+        return fJsonValue(fJsonTokenView(stream, lo, hi)).match()
+
+def strip_colons(stream, lo, hi):
+    """
+    token流中[lo, hi)去掉顶层冒号后组成的新token流，继承lazy、budget和hook
 
+    字典的一项中第一个顶层冒号之后的冒号都被忽略(例如{a: 1 :}的值是1)，此时值不再是token流中连续的一段
+    """
+    pairs = stream.pairs
+    indices = []
+    offset = lo
+    while offset < hi:
+        end = pairs[offset] + 1 if pairs[offset] >= 0 else offset + 1
+        if end - offset != 1 or not stream.is_symbol(offset, ':'):
+            indices.extend(range(offset, end))
+        offset = end
+    tokens = stream.select(indices)
+    tokens.lazy = stream.lazy
+    tokens.budget = stream.budget
+    tokens.hook = stream.hook
+    return tokens.pair_brackets()
 
 class fJsonDict:
     def __init__(self, tokens):
@@ -510,50 +1449,46 @@ class fJsonDict:
         if len(self.tokens) < 2:
             return None
         
-        if self.tokens[0]['token'] != '{' or self.tokens[-1]['token'] != '}':
+        if self.tokens.text(0) != '{' or self.tokens.text(-1) != '}':
             return None
         
         match_dict = {}
 
-        offset = 1
-        key_token = []
-        value_token = []
-        is_value = False
-
-        key_list = []
-        value_list = []
-        while offset < len(self.tokens) - 1:
-            next_token = NextToken(self.tokens).next(offset)
-            if len(next_token) == 0:
-                break
-            if len(next_token) == 1 and next_token[0]['type'] == fJsonTokenType.TokenType_SYMBOL and next_token[0]['token'] == ':':
-                is_value = True
-                offset += 1
-                continue
-            if len(next_token) == 1 and next_token[0]['type'] == fJsonTokenType.TokenType_SYMBOL and next_token[0]['token'] == ',':
-                key_list.append(key_token)
-                value_list.append(value_token)
-                key_token = []
-                value_token = []
-                is_value = False
-                offset += 1
+        # 括号内的顶层分组与fJsonSet共用
+        inner = self.tokens[1:-1]
+        bounds = inner.groups()
+        begin = 0
+        colon = None
+        # 第一个顶层冒号之前是键，之后是值，值中其余的顶层冒号都被忽略
+        extra = 0
+
+        items = []
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset != 1:
                 continue
-            if is_value:
-                value_token += next_token
-            else:
-                key_token += next_token
-            offset += len(next_token)
-            
-        key_list.append(key_token)
-        value_list.append(value_token)
-
-        for value in value_list:
-            if len(value) == 0:
+            if inner.is_symbol(offset, ':'):
+                if colon is None:
+                    colon = offset
+                else:
+                    extra += 1
+            elif inner.is_symbol(offset, ','):
+                items.append((begin, offset, colon, extra))
+                begin = offset + 1
+                colon = None
+                extra = 0
+        items.append((begin, bounds[-1], colon, extra))
+
+        for begin, end, colon, extra in items:
+            if colon is None or end - colon - 1 == extra:
                 return None
 
-        for i in range(len(key_list)):
-            key = fJsonBuilder(key_list[i]).build()
-            value = fJsonBuilder(value_list[i]).build()
+        for begin, end, colon, extra in items:
+            key = fJsonBuilder(inner[begin:colon]).build()
+            if extra == 0:
+                value = fJsonBuilder(inner[colon + 1:end]).build()
+            else:
+                value = fJsonBuilder(strip_colons(inner.stream, inner.start + colon + 1, inner.start + end).view()).build()
             if key is None:
                 continue
             try:
@@ -561,8 +1496,6 @@ class fJsonDict:
             except:
                 raise Exception('Invalid JSON key')
             match_dict[key] = value
-        if DEBUG:
-            print("Dict", match_dict)
         return match_dict
 
 class fJsonList:
@@ -572,33 +1505,25 @@ class fJsonList:
         # 检查是否是一个JSON列表
         if len(self.tokens) < 2:
             return None
-        if self.tokens[0]['token'] != '[' or self.tokens[-1]['token'] != ']':
+        if self.tokens.text(0) != '[' or self.tokens.text(-1) != ']':
             return None
         
         match_list = []
-        tmp_list = []
-
-        offset = 1
-        while offset < len(self.tokens):
-            next_token = NextToken(self.tokens).next(offset)
-            if len(next_token) == 0:
-                break
-            if len(next_token) == 1 and next_token[0]['type'] == fJsonTokenType.TokenType_SYMBOL and next_token[0]['token'] == ',':
-                match_list.append(tmp_list)
-                tmp_list = []
-                offset += 1
-                continue
-            tmp_list += next_token
-            offset += len(next_token)
-        match_list.append(tmp_list)
+        inner = self.tokens[1:-1]
+        bounds = inner.groups()
+        begin = 0
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset == 1 and inner.is_symbol(offset, ','):
+                match_list.append(inner[begin:offset])
+                begin = offset + 1
+        match_list.append(inner[begin:bounds[-1]])
         
         return_list = []
         for x in match_list:
-            if x == []:
+            if len(x) == 0:
                 continue
             return_list.append(fJsonBuilder(x).build())
-        if DEBUG:
-            print("List", return_list)
         return return_list
 
 class fJsonTuple:
@@ -609,32 +1534,25 @@ class fJsonTuple:
         # 检查是否是一个JSON元组
         #if len(self.tokens) < 2:
         #    return None
-        #if self.tokens[0]['token'] != '(' or self.tokens[-1]['token'] != ')':
+        #if self.tokens.text(0) != '(' or self.tokens.text(-1) != ')':
         #    return None
         
         match_list = []
 
-        arg = []
+        bounds = self.tokens.groups()
+        begin = 0
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset == 1 and self.tokens.is_symbol(offset, ','):
+                match_list.append(self.tokens[begin:offset])
+                begin = offset + 1
 
-        offset = 0
-        while offset < len(self.tokens):
-            if self.tokens[offset]['type'] == fJsonTokenType.TokenType_SYMBOL and self.tokens[offset]['token'] == ',':
-                match_list.append(arg)
-                arg = []
-                offset += 1
-                continue
-            next_token = NextToken(self.tokens).next(offset)
-            if len(next_token) == 0:
-                break
-            arg += next_token
-            offset += len(next_token)
-
-        match_list.append(arg)
+        match_list.append(self.tokens[begin:bounds[-1]])
 
 
         new_list = []
         for x in match_list:
-            if x != []:
+            if len(x) != 0:
                 new_list.append(x)
 
         if len(match_list) == 1:
@@ -643,8 +1561,6 @@ class fJsonTuple:
         return_list = []
         for x in new_list:
             return_list.append(fJsonBuilder(x).build())
-        if DEBUG:
-            print("Tuple", return_list)
         return tuple(return_list)
 
 class fJsonSet:
@@ -654,29 +1570,24 @@ class fJsonSet:
         # 检查是否是一个JSON集合
         if len(self.tokens) < 2:
             return None
-        if self.tokens[0]['token'] != '{' or self.tokens[-1]['token'] != '}':
+        if self.tokens.text(0) != '{' or self.tokens.text(-1) != '}':
             return None
         
         match_list = []
-        tmp_list = []
-        offset = 1
-        while offset < len(self.tokens):
-            next_token = NextToken(self.tokens).next(offset)
-            if len(next_token) == 0:
-                break
-            if len(next_token) == 1 and next_token[0]['type'] == fJsonTokenType.TokenType_SYMBOL and next_token[0]['token'] == ',':
-                match_list.append(tmp_list)
-                tmp_list = []
-                offset += 1
-                continue
-            tmp_list += next_token
-            offset += len(next_token)
-        match_list.append(tmp_list)
+        inner = self.tokens[1:-1]
+        bounds = inner.groups()
+        begin = 0
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset == 1 and inner.is_symbol(offset, ','):
+                match_list.append(inner[begin:offset])
+                begin = offset + 1
+        match_list.append(inner[begin:bounds[-1]])
         set_list = [fJsonBuilder(x).build() for x in match_list]
-        if DEBUG:
-            print("Set", set_list)
         return set(set_list)
 
+# 每个线程中正在进行的匹配器尝试，各项为其中嵌套的匹配器的总耗时，只在有hook时使用
+MATCHER_TIMES = threading.local()
 
 class fJsonValue:
     # 用于匹配JSON值
@@ -686,6 +1597,7 @@ class fJsonValue:
         # 检查是否是一个JSON值
         def match_json_value(self):
             matchers = [
+                fJsonLiteral,
                 fJsonLines,
                 fJsonTuple,
                 fJsonDeclaration,
@@ -705,6 +1617,9 @@ class fJsonValue:
                 fJsonOrderChange
             ]
 
+            hook = self.tokens.stream.hook
+            if hook is not None:
+                return self.match_with_hook(matchers, hook)
             for matcher in matchers:
                 result = matcher(self.tokens).match()
                 if result is not None:
@@ -718,40 +1633,40 @@ class fJsonValue:
         if len(self.tokens) == 0:
             return None
         if len(self.tokens) == 1:
-            if self.tokens[0]['type'] == fJsonTokenType.TokenType_NUMBER:
-                if self.tokens[0]['token'].isdigit() or self.tokens[0]['token'].lstrip('-').isdigit():
-                    return int(self.tokens[0]['token'])
-                return float(self.tokens[0]['token'])
-            if self.tokens[0]['type'] == fJsonTokenType.TokenType_STRING:
-                return self.tokens[0]['token']
-            if self.tokens[0]['type'] == fJsonTokenType.TokenType_BASE64:
-                try:
-                    return base64.b64decode(self.tokens[0]['token'])
-                except:
-                    raise Exception('Invalid base64 string')
-            if self.tokens[0]['type'] == fJsonTokenType.TokenType_IDENTIFIER:
-                if self.tokens[0]['token'].lower() == 'true':
-                    return True
-                if self.tokens[0]['token'].lower() == 'false':
-                    return False
-                if self.tokens[0]['token'].lower() in ('null', 'none'):
-                    return None                
-                return self.tokens[0]['token']
-            raise Exception('Invalid JSON value: ' + self.tokens[0]['token'])        
-        
+            return get_value_from_token(self.tokens.kind(0), self.tokens.text(0))
 
         raise Exception('Invalid JSON value')
 
+    def match_with_hook(self, matchers, hook):
+        # 与match_json_value相同，另外向hook报告每个匹配器的自身耗时和是否匹配，抛出异常时记为未匹配。
+        # 嵌套的匹配器的耗时(包括其中hook的调用)累加到栈顶，从外层匹配器的耗时中减去，避免重复计算
+        clock = time.perf_counter
+        nested = getattr(MATCHER_TIMES, 'stack', None)
+        if nested is None:
+            nested = MATCHER_TIMES.stack = []
+        for matcher in matchers:
+            nested.append(0.0)
+            start = clock()
+            result = None
+            try:
+                result = matcher(self.tokens).match()
+            finally:
+                elapsed = clock() - start
+                hook.on_matcher(matcher.__name__, elapsed - nested.pop(), result is not None)
+                if nested:
+                    nested[-1] += clock() - start
+            if result is not None:
+                return result
+        return None
+
 class fJsonOrderChange:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
         if len(self.tokens) < 2:
             return None
-        if self.tokens[0]['token'] != '(' or self.tokens[-1]['token'] != ')':
+        if self.tokens.text(0) != '(' or self.tokens.text(-1) != ')':
             return None
-        if DEBUG:
-            print("OrderChange", get_str_from_tokens(self.tokens[1:-1]))
         if len(self.tokens) == 2:
             return () # 空元组
         return fJsonValue(self.tokens[1:-1]).match()
@@ -766,30 +1681,26 @@ class fJsonArgument:
         size_tokens = len(self.tokens)
         if size_tokens < 2:
             return None
-        if self.tokens[0]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[0]['token'] != '--':
+        if not self.tokens.is_symbol(0, '--'):
             return None
         # --key开头，则认定为参数组
 
         match_dict = {}
         match_list = []
-        offset = 0
+        bounds = self.tokens.groups()
         pair = [None, []]
-        while offset < size_tokens:
-            if self.tokens[offset]['type'] == fJsonTokenType.TokenType_SYMBOL and self.tokens[offset]['token'] == '--':
-                offset += 1
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset == 1 and self.tokens.is_symbol(offset, '--'):
                 if pair[0] is not None:
                     match_list.append(pair)
                 pair = [None, []]
                 continue
-            next_token = NextToken(self.tokens).next(offset)
-            if len(next_token) == 0:
-                break
+            next_token = self.tokens[offset:bounds[i + 1]]
             if pair[0] is None:
                 pair[0] = next_token
-                offset += len(next_token)
                 continue
             pair[1].append(next_token)
-            offset += len(next_token)
         if pair[0] is None:
             return None # 非法格式
         match_list.append(pair)
@@ -800,10 +1711,8 @@ class fJsonArgument:
             for y in x[1]:
                 value.append(fJsonBuilder(y).build())
             match_dict[key] = value
-        if DEBUG:
-            print("Argument", match_dict)
         return match_dict
-            
+
 class fJsonPipe:
     """
     A |> B |> C，结合方式从左到右
@@ -811,26 +1720,18 @@ class fJsonPipe:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-
-        if len(left) == 0:
-            return None
-        
-        middle = NextToken(self.tokens).next(offset)
-        offset += len(middle)
-        if len(middle) == 0:
+        # 第一个分组之后是|>
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
         
-        if middle[0]['type'] != fJsonTokenType.TokenType_SYMBOL or middle[0]['token'] != '|>':
+        if not self.tokens.is_symbol(bounds[1], '|>'):
             return None
         
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[2]:]
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
-        if DEBUG:
-            print("Pipe", left_value, right_value)
         return fJsonSpecialType("Pipe", (left_value, right_value))
 
 class fJsonConcat:
@@ -840,72 +1741,38 @@ class fJsonConcat:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-
-        if len(left) == 0:
-            return None
-        
-        middle = NextToken(self.tokens).next(offset)
-        offset += len(middle)
-        if len(middle) == 0:
+        # 第一个分组之后是+
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
-        if middle[0]['type'] != fJsonTokenType.TokenType_SYMBOL or middle[0]['token'] != '+':
+        if not self.tokens.is_symbol(bounds[1], '+'):
             return None
         
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[2]:]
         
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
 
-        if DEBUG:
-            print("Concat", left_value, right_value)
 
-        if isinstance(left_value, str) and isinstance(right_value, str):
-            return left_value + right_value
-        if isinstance(left_value, list) and isinstance(right_value, list):
-            return left_value + right_value
-        if isinstance(left_value, tuple) and isinstance(right_value, tuple):
-            return left_value + right_value
-        if isinstance(left_value, dict) and isinstance(right_value, dict):
-            left_value.update(right_value)
-            return left_value
-        if isinstance(left_value, set) and isinstance(right_value, set):
-            return left_value.union(right_value)
-        if isinstance(left_value, int) and isinstance(right_value, int):
-            return left_value + right_value
-        if type(left_value) in [int, float] and type(right_value) in [int, float]:
-            return float(left_value + right_value)
-        if isinstance(left_value, bytes) and isinstance(right_value, bytes):
-            return left_value + right_value
-        
-        raise Exception('Invalid concat operation: ' + str(left_value) + ' + ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+        stream = self.tokens.stream
+        return concat_values(left_value, right_value, stream.budget, stream.positions[self.tokens.start + bounds[1]])
 
 class fJsonIfExpression:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        condition = NextToken(self.tokens).next(offset)
-        offset += len(condition)
-        if len(condition) == 0:
-            return None
-        if offset >= len(self.tokens):
-            return None
-        if self.tokens[offset]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[offset]['token'] != '?':
+        # 分组依次为 条件 ? 真值 : 假值...
+        bounds = self.tokens.groups()
+        if len(bounds) < 5:
             return None
-        offset += 1
-        true_value = NextToken(self.tokens).next(offset)
-        offset += len(true_value)
-        if len(true_value) == 0:
+        if not self.tokens.is_symbol(bounds[1], '?'):
             return None
-        if offset >= len(self.tokens):
+        if not self.tokens.is_symbol(bounds[3], ':'):
             return None
-        if self.tokens[offset]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[offset]['token'] != ':':
-            return None
-        offset += 1
-        false_value = self.tokens[offset:]
+        condition = self.tokens[:bounds[1]]
+        true_value = self.tokens[bounds[2]:bounds[3]]
+        false_value = self.tokens[bounds[4]:]
 
         condition_value = fJsonBuilder(condition).build()
         true_value = fJsonBuilder(true_value).build()
@@ -914,8 +1781,6 @@ class fJsonIfExpression:
         if type(condition_value) != bool:
             raise Exception('Invalid if condition: ' + str(condition_value))
         
-        if DEBUG:
-            print("IfExpression", condition_value, true_value, false_value)
 
         return true_value if condition_value else false_value
 
@@ -926,56 +1791,22 @@ class fJsonMulAndDiv:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-        if len(left) == 0:
-            return None
-        middle = NextToken(self.tokens).next(offset)
-        offset += len(middle)
-        if len(middle) == 0:
+        # 第一个分组之后是*或/
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
-        if middle[0]['type'] != fJsonTokenType.TokenType_SYMBOL or middle[0]['token'] not in ('*', '/'):
+        operator = bounds[1]
+        if self.tokens.kind(operator) != fJsonTokenType.TokenKind_SYMBOL or self.tokens.text(operator) not in ('*', '/'):
             return None
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[2]:]
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
 
-        if DEBUG:
-            print("MulAndDiv", left_value, middle[0]['token'], right_value)
 
-        if isinstance(left_value, list) and isinstance(right_value, list):
-            if len(left_value) != len(right_value):
-                raise Exception('Invalid mul/div operation: ' + str(left_value) + ' ' + middle[0]['token'] + ' ' + str(right_value)+ '\n\tExpected same length, but found ' + str(len(left_value)) + ', ' + str(len(right_value)))
-            if middle[0]['token'] == '*':
-                return [left_value[i] * right_value[i] for i in range(len(left_value))]
-            else:
-                return [left_value[i] / right_value[i] for i in range(len(left_value))]
-        if type(left_value) in [int, float] and type(right_value) in [int, float]:
-            if middle[0]['token'] == '*':
-                return left_value * right_value
-            if middle[0]['token'] == '/':
-                return left_value / right_value
-        if middle[0]['token'] == '/':
-            raise Exception('Invalid div operation: ' + str(left_value) + ' / ' + str(right_value))
-        if isinstance(left_value, str) and isinstance(right_value, int):
-            return left_value * right_value
-        if isinstance(left_value, int) and isinstance(right_value, str):
-            return right_value * left_value
-        if isinstance(left_value, list) and isinstance(right_value, int):
-            return left_value * right_value
-        if isinstance(left_value, int) and isinstance(right_value, list):
-            return right_value * left_value
-        if isinstance(left_value, bytes) and isinstance(right_value, int):
-            return left_value * right_value
-        if isinstance(left_value, int) and isinstance(right_value, bytes):
-            return right_value * left_value
-        if isinstance(left_value, set) and isinstance(right_value, set):
-            # 笛卡尔积
-            return {(x, y) for x in left_value for y in right_value}
-
-            
-        raise Exception('Invalid mul/div operation: ' + str(left_value) + ' ' + middle[0]['token'] + ' ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+        stream = self.tokens.stream
+        return mul_div_values(left_value, self.tokens.text(operator), right_value,
+                              stream.lazy, stream.budget, stream.positions[self.tokens.start + operator])
 
 class fJsonContains:
     """
@@ -984,38 +1815,19 @@ class fJsonContains:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-        if len(left) == 0:
+        # 第一个分组之后是:>
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
-        middle = NextToken(self.tokens).next(offset)
-        offset += len(middle)
-        if len(middle) == 0:
+        if not self.tokens.is_symbol(bounds[1], ':>'):
             return None
-        if middle[0]['type'] != fJsonTokenType.TokenType_SYMBOL or middle[0]['token'] != ':>':
-            return None
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[2]:]
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
 
-        if DEBUG:
-            print("Contains", left_value, right_value)
-
-        if isinstance(right_value, list):
-            return left_value in right_value
-        if isinstance(right_value, tuple):
-            return left_value in right_value
-        if isinstance(right_value, set):
-            return left_value in right_value
-        if isinstance(right_value, dict):
-            return left_value in right_value
-        if isinstance(right_value, str) and isinstance(left_value, str):
-            return left_value in right_value
-        if isinstance(right_value, bytes) and isinstance(left_value, bytes):
-            return left_value in right_value
 
-        raise Exception('Invalid contains operation: ' + str(left_value) + ' in ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+        return contains_values(left_value, right_value)
 
 class fJsonSpecialType:
     """
@@ -1053,18 +1865,16 @@ class fJsonFunctionType:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-        if len(left) == 0:
+        # 第一个分组之后是->
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
-        middle = NextToken(self.tokens).next(offset)
-        offset += len(middle)
-        if len(middle) != 1:
+        if bounds[2] - bounds[1] != 1:
             return None
-        if middle[0]['type'] != fJsonTokenType.TokenType_SYMBOL or middle[0]['token'] != '->':
+        if not self.tokens.is_symbol(bounds[1], '->'):
             return None
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[2]:]
         
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
@@ -1074,11 +1884,8 @@ class fJsonFunctionType:
         if not isinstance(right_value, tuple):
             right_value = (right_value,)
 
-        print("FunctionType", left_value, right_value)
         return fJsonSpecialType("FunctionType", (left_value, right_value))
 
-
-
 class fJsonLines:
     """
     匹配用分号分隔的多行表达式
@@ -1086,20 +1893,17 @@ class fJsonLines:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
+        bounds = self.tokens.groups()
+        if bounds[-1] != len(self.tokens):
+            return None
         lines = []
-        tmp_tokens = []
-        while offset < len(self.tokens):
-            line = NextToken(self.tokens).next(offset)
-            offset += len(line)
-            if len(line) == 0:
-                return None
-            if len(line) == 1 and line[0]['type'] == fJsonTokenType.TokenType_SYMBOL and line[0]['token'] == ';':
-                    lines.append(tmp_tokens)
-                    tmp_tokens = []
-                    continue
-            tmp_tokens += line
-        lines.append(tmp_tokens)
+        begin = 0
+        for i in range(len(bounds) - 1):
+            offset = bounds[i]
+            if bounds[i + 1] - offset == 1 and self.tokens.is_symbol(offset, ';'):
+                    lines.append(self.tokens[begin:offset])
+                    begin = offset + 1
+        lines.append(self.tokens[begin:])
         if len(lines) < 2:
             return None
         
@@ -1113,31 +1917,20 @@ class fJsonDeclaration:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        name = NextToken(self.tokens).next(offset)
-        offset += len(name)
-        if len(name) == 0:
-            return None
-        if offset >= len(self.tokens):
-            return None
-        if self.tokens[offset]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[offset]['token'] != ':':
+        # 分组依次为 name : type := value...
+        bounds = self.tokens.groups()
+        if len(bounds) < 5:
             return None
-        offset += 1
-        type_ = NextToken(self.tokens).next(offset)
-        offset += len(type_)
-        if len(type_) == 0:
+        if not self.tokens.is_symbol(bounds[1], ':'):
             return None
-        if offset >= len(self.tokens):
+        if not self.tokens.is_symbol(bounds[3], ':='):
             return None
-        if self.tokens[offset]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[offset]['token'] != ':=':
-            return None
-        offset += 1
-        value = self.tokens[offset:]
+        name = self.tokens[:bounds[1]]
+        type_ = self.tokens[bounds[2]:bounds[3]]
+        value = list(self.tokens[bounds[4]:])
         name = fJsonBuilder(name).build()
         type_ = fJsonBuilder(type_).build()
         #value = fJsonBuilder(value).build()
-        if DEBUG:
-            print("Declaration", name, type_, get_str_from_tokens(value))
         return fJsonSpecialType("Declaration", (name, type_, value))
 
 class fJsonGetMember:
@@ -1148,34 +1941,24 @@ class fJsonGetMember:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        _tokens = []
-        while offset < len(self.tokens):
-            token = NextToken(self.tokens).next(offset)
-            offset += len(token)
-            if len(token) == 0:
-                return None
-            _tokens.append(token)
+        bounds = self.tokens.groups()
+        if bounds[-1] != len(self.tokens):
+            return None
         
         # 逆序检查 "."
 
-        if len(_tokens) < 2:
+        if len(bounds) < 3:
             return None
         
-        token_len = 0
-        for i in range(1, len(_tokens)):
-            if len(_tokens[-i]) != 1:
-                token_len += len(_tokens[-i])
+        for i in range(len(bounds) - 2, 0, -1):
+            if bounds[i + 1] - bounds[i] != 1:
                 continue
-            if _tokens[-i][0]['type'] == fJsonTokenType.TokenType_SYMBOL and _tokens[-i][0]['token'] == '.':
-                if token_len == 0:
+            if self.tokens.is_symbol(bounds[i], '.'):
+                if bounds[i + 1] == len(self.tokens):
                     return None
-                left = fJsonBuilder(self.tokens[:- token_len - 1]).build()
-                right = fJsonBuilder(self.tokens[- token_len:]).build()
-                if DEBUG:
-                    print("GetMember", left, right)
+                left = fJsonBuilder(self.tokens[:bounds[i]]).build()
+                right = fJsonBuilder(self.tokens[bounds[i + 1]:]).build()
                 return fJsonSpecialType("GetMember", (left, right))
-            token_len += len(_tokens[-i])
         return None
 
 class fJsonFunctionCall:
@@ -1186,35 +1969,28 @@ class fJsonFunctionCall:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        patterns = []
-
-        offset = 0
-        while offset < len(self.tokens):
-            token = NextToken(self.tokens).next(offset)
-            offset += len(token)
-            if len(token) == 0:
-                return None
-            patterns.append(token)
+        bounds = self.tokens.groups()
+        if bounds[-1] != len(self.tokens):
+            return None
 
-        # 如果最后一个pattern是 "(...)"，则认为是函数调用
-        if len(patterns) == 0:
+        # 如果最后一个分组是 "(...)"，则认为是函数调用
+        if len(bounds) < 2:
             return None
         
-        if len(patterns[-1]) < 2:
+        arguments = self.tokens[bounds[-2]:]
+        if len(arguments) < 2:
             return None
-        if patterns[-1][0]['type'] != fJsonTokenType.TokenType_SYMBOL or patterns[-1][0]['token'] != '(': # (
+        if not arguments.is_symbol(0, '('): # (
             return None
-        if patterns[-1][-1]['type'] != fJsonTokenType.TokenType_SYMBOL or patterns[-1][-1]['token'] != ')': # )
+        if not arguments.is_symbol(-1, ')'): # )
             return None
         
-        function_name = fJsonBuilder(self.tokens[:-len(patterns[-1])]).build()
+        function_name = fJsonBuilder(self.tokens[:bounds[-2]]).build()
         if function_name == None:
             return None
-        arguments = fJsonBuilder(patterns[-1]).build()
+        arguments = fJsonBuilder(arguments).build()
         if not isinstance(arguments, tuple):
             arguments = (arguments,)
-        if DEBUG:
-            print("FunctionCall", function_name, arguments)
         return fJsonSpecialType("FunctionCall", (function_name, arguments))
 
 class fJsonAssign:
@@ -1225,109 +2001,1556 @@ class fJsonAssign:
     def __init__(self, tokens):
         self.tokens = tokens
     def match(self):
-        offset = 0
-        left = NextToken(self.tokens).next(offset)
-        offset += len(left)
-        if len(left) == 0:
+        # 第一个分组之后是=
+        bounds = self.tokens.groups()
+        if len(bounds) < 3:
             return None
-        if offset >= len(self.tokens):
+        if not self.tokens.is_symbol(bounds[1], '='):
             return None
-        if self.tokens[offset]['type'] != fJsonTokenType.TokenType_SYMBOL or self.tokens[offset]['token'] != '=':
-            return None
-        offset += 1
-        right = self.tokens[offset:]
+        left = self.tokens[:bounds[1]]
+        right = self.tokens[bounds[1] + 1:]
         left_value = fJsonBuilder(left).build()
         right_value = fJsonBuilder(right).build()
-        if DEBUG:
-            print("Assign", left_value, right_value)
         return fJsonSpecialType("Assign", (left_value, right_value))
 
 def get_str_from_tokens(tokens):
     return ''.join([x['token'] for x in tokens])
 
-def decode(json_str):
+def get_value_from_token(kind, text):
+    # 单个token对应的值
+    if kind == fJsonTokenType.TokenKind_NUMBER:
+        if text.isdigit() or text.lstrip('-').isdigit():
+            return int(text)
+        return float(text)
+    if kind == fJsonTokenType.TokenKind_STRING:
+        return text
+    if kind == fJsonTokenType.TokenKind_BASE64:
+        try:
+            return base64.b64decode(text)
+        except:
+            raise Exception('Invalid base64 string')
+    if kind == fJsonTokenType.TokenKind_IDENTIFIER:
+        if text.lower() == 'true':
+            return True
+        if text.lower() == 'false':
+            return False
+        if text.lower() in ('null', 'none'):
+            return None
+        return text
+    raise Exception('Invalid JSON value: ' + text)
+
+class fJsonProductView(Set):
+    """
+    惰性的笛卡尔积 A * B，lazy模式下集合相乘的结果
+
+    不生成全部元组，长度为两个操作数长度之积，可以迭代、按下标取元素、判断元素是否存在，
+    与立即计算得到的集合比较时相等。操作数可以是集合或者另一个fJsonProductView，所以连续相乘也不会展开。
+    materialize()返回立即计算的结果
+    """
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        # 集合按固定的顺序编号，按下标取元素时使用
+        self.left_items = left if isinstance(left, fJsonProductView) else tuple(left)
+        self.right_items = right if isinstance(right, fJsonProductView) else tuple(right)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # 集合运算(&、|、-)的结果为普通集合
+        return set(iterable)
+
+    def __len__(self):
+        return len(self.left_items) * len(self.right_items)
+
+    def __iter__(self):
+        right_items = self.right_items
+        for x in self.left_items:
+            for y in right_items:
+                yield (x, y)
+
+    def __contains__(self, item):
+        return isinstance(item, tuple) and len(item) == 2 and item[0] in self.left and item[1] in self.right
+
+    def __getitem__(self, index):
+        if index.__class__ is slice:
+            return [self[i] for i in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('product index out of range')
+        x, y = divmod(index, len(self.right_items))
+        return (self.left_items[x], self.right_items[y])
+
+    def __repr__(self):
+        return 'fJsonProductView(%r, %r)' % (self.left, self.right)
+
+    def materialize(self):
+        return set(self)
+
+class fJsonRepeatView(Sequence):
+    """
+    惰性的重复 A * n，lazy模式下list、str、bytes乘以整数的结果
+
+    不复制n份内容，长度、下标、切片、迭代和in都直接由value和count计算，
+    与立即计算得到的list、str、bytes比较时相等。materialize()返回立即计算的结果
+    """
+    def __init__(self, value, count):
+        self.value = value
+        self.count = max(int(count), 0)
+
+    def __len__(self):
+        return len(self.value) * self.count
+
+    def __iter__(self):
+        value = self.value
+        for _ in range(self.count):
+            yield from value
+
+    def __contains__(self, item):
+        value = self.value
+        if not isinstance(value, (str, bytes)):
+            return self.count > 0 and item in value
+        # 子串最多跨越len(item) // len(value) + 2份
+        if not value:
+            return item in value
+        return item in value * min(self.count, len(item) // len(value) + 2)
+
+    def __getitem__(self, index):
+        value = self.value
+        if index.__class__ is slice:
+            items = [self[i] for i in range(*index.indices(len(self)))]
+            if isinstance(value, str):
+                return ''.join(items)
+            return value.__class__(items)
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('repeat index out of range')
+        return value[index % len(value)]
+
+    def __eq__(self, other):
+        value = self.value
+        if isinstance(other, fJsonRepeatView):
+            return value.__class__ is other.value.__class__ and len(self) == len(other) and all(x == y for x, y in zip(self, other))
+        if other.__class__ is not value.__class__:
+            return NotImplemented
+        # 逐份比较，不生成完整的结果
+        size = len(value)
+        return len(other) == len(self) and all(other[i:i + size] == value for i in range(0, len(other), size))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.materialize())
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return self.materialize()
+        return repr(self)
+
+    def __bytes__(self):
+        return bytes(self.materialize())
+
+    def __repr__(self):
+        return 'fJsonRepeatView(%r, %d)' % (self.value, self.count)
+
+    def materialize(self):
+        return self.value * self.count
+
+# 有长度的运算结果，DecodeBudget按长度限制它们的大小
+SIZED_VALUES = (str, bytes, list, tuple, dict, set, fJsonProductView, fJsonRepeatView)
+
+def product_size(left_value, right_value):
+    # A * B的结果为重复或笛卡尔积时返回它的长度，其余为0
+    if isinstance(left_value, int) and isinstance(right_value, (list, str, bytes, fJsonRepeatView)):
+        left_value, right_value = right_value, left_value
+    if isinstance(left_value, (list, str, bytes, fJsonRepeatView)) and isinstance(right_value, int):
+        return len(left_value) * max(right_value, 0)
+    if isinstance(left_value, (set, fJsonProductView)) and isinstance(right_value, (set, fJsonProductView)):
+        return len(left_value) * len(right_value)
+    return 0
+
+def materialize_value(value):
+    # lazy模式的结果参与其他运算之前先立即计算
+    if isinstance(value, (fJsonProductView, fJsonRepeatView)):
+        return value.materialize()
+    return value
+
+def concat_values(left_value, right_value, budget=None, position=-1):
+    # A + B，budget不为None时先检查结果的大小(合并字典、集合时为上限)，position是运算符的位置
+    if budget is not None and isinstance(left_value, SIZED_VALUES) and isinstance(right_value, SIZED_VALUES):
+        budget.check_size(len(left_value) + len(right_value), position)
+    left_value = materialize_value(left_value)
+    right_value = materialize_value(right_value)
+    if isinstance(left_value, str) and isinstance(right_value, str):
+        return left_value + right_value
+    if isinstance(left_value, list) and isinstance(right_value, list):
+        return left_value + right_value
+    if isinstance(left_value, tuple) and isinstance(right_value, tuple):
+        return left_value + right_value
+    if isinstance(left_value, dict) and isinstance(right_value, dict):
+        # 生成新的字典，compile求值时的操作数可能是调用者传入的绑定
+        return {**left_value, **right_value}
+    if isinstance(left_value, set) and isinstance(right_value, set):
+        return left_value.union(right_value)
+    if isinstance(left_value, int) and isinstance(right_value, int):
+        return left_value + right_value
+    if type(left_value) in [int, float] and type(right_value) in [int, float]:
+        return float(left_value + right_value)
+    if isinstance(left_value, bytes) and isinstance(right_value, bytes):
+        return left_value + right_value
+
+    raise Exception('Invalid concat operation: ' + str(left_value) + ' + ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+
+def mul_div_values(left_value, operator, right_value, lazy=False, budget=None, position=-1):
+    # A * B 或 A / B，lazy为True时集合相乘、list/str/bytes重复返回惰性的视图；
+    # budget不为None时先检查重复和笛卡尔积的大小(惰性的视图也按展开后的大小计算)，position是运算符的位置
+    if budget is not None and operator == '*':
+        budget.check_size(product_size(left_value, right_value), position)
+        if isinstance(left_value, list) and isinstance(right_value, list):
+            for x, y in zip(left_value, right_value):
+                budget.check_size(product_size(x, y), position)
+    if lazy and operator == '*':
+        if isinstance(left_value, (set, fJsonProductView)) and isinstance(right_value, (set, fJsonProductView)):
+            return fJsonProductView(left_value, right_value)
+        if isinstance(left_value, int) and isinstance(right_value, (list, str, bytes, fJsonRepeatView)):
+            left_value, right_value = right_value, left_value
+        if isinstance(right_value, int):
+            if isinstance(left_value, fJsonRepeatView):
+                return fJsonRepeatView(left_value.value, left_value.count * right_value)
+            if isinstance(left_value, (list, str, bytes)):
+                return fJsonRepeatView(left_value, right_value)
+    left_value = materialize_value(left_value)
+    right_value = materialize_value(right_value)
+    if isinstance(left_value, list) and isinstance(right_value, list):
+        if len(left_value) != len(right_value):
+            raise Exception('Invalid mul/div operation: ' + str(left_value) + ' ' + operator + ' ' + str(right_value)+ '\n\tExpected same length, but found ' + str(len(left_value)) + ', ' + str(len(right_value)))
+        if operator == '*':
+            return [left_value[i] * right_value[i] for i in range(len(left_value))]
+        else:
+            return [left_value[i] / right_value[i] for i in range(len(left_value))]
+    if type(left_value) in [int, float] and type(right_value) in [int, float]:
+        if operator == '*':
+            return left_value * right_value
+        if operator == '/':
+            return left_value / right_value
+    if operator == '/':
+        raise Exception('Invalid div operation: ' + str(left_value) + ' / ' + str(right_value))
+    if isinstance(left_value, str) and isinstance(right_value, int):
+        return left_value * right_value
+    if isinstance(left_value, int) and isinstance(right_value, str):
+        return right_value * left_value
+    if isinstance(left_value, list) and isinstance(right_value, int):
+        return left_value * right_value
+    if isinstance(left_value, int) and isinstance(right_value, list):
+        return right_value * left_value
+    if isinstance(left_value, bytes) and isinstance(right_value, int):
+        return left_value * right_value
+    if isinstance(left_value, int) and isinstance(right_value, bytes):
+        return right_value * left_value
+    if isinstance(left_value, set) and isinstance(right_value, set):
+        # 笛卡尔积
+        return {(x, y) for x in left_value for y in right_value}
+
+    raise Exception('Invalid mul/div operation: ' + str(left_value) + ' ' + operator + ' ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+
+def contains_values(left_value, right_value):
+    # A :> B
+    if isinstance(right_value, fJsonProductView):
+        return left_value in right_value
+    left_value = materialize_value(left_value)
+    right_value = materialize_value(right_value)
+    if isinstance(right_value, list):
+        return left_value in right_value
+    if isinstance(right_value, tuple):
+        return left_value in right_value
+    if isinstance(right_value, set):
+        return left_value in right_value
+    if isinstance(right_value, dict):
+        return left_value in right_value
+    if isinstance(right_value, str) and isinstance(left_value, str):
+        return left_value in right_value
+    if isinstance(right_value, bytes) and isinstance(left_value, bytes):
+        return left_value in right_value
+
+    raise Exception('Invalid contains operation: ' + str(left_value) + ' in ' + str(right_value) + '\n\tFound types: ' + str(type(left_value)) + ', ' + str(type(right_value)))
+
+def reject_json_constant(name):
+    # NaN、Infinity、-Infinity不是标准JSON，在fJson中是标识符
+    raise ValueError('Not a JSON constant: ' + name)
+
+def empty_json_object(obj):
+    return obj if obj else {None}
+
+def decode_strict_json(text, start=0):
+    """
+    用json模块(C实现)解析标准JSON，text和start是lexer_input返回的文本和起始偏移
+
+    两种语法都接受的输入结果与fJson相同；不是标准JSON、或者含有两者含义不同的写法(\\/、\\b、\\f、\\r转义)时
+    抛出ValueError，嵌套过深时抛出RecursionError，由调用者改用fJson语法解析
+    """
+    if text.__class__ is not str:
+        text = str(text[start:], 'utf-8')
+    if STRICT_JSON_START.match(text) is None:
+        raise ValueError('Not strict JSON')
+    tail = text[-64:].rstrip(' \t\n\r')
+    if not tail or tail[-1] not in STRICT_JSON_END:
+        raise ValueError('Not strict JSON')
+    if '\\' in text and STRICT_JSON_ESCAPES.search(text) is not None:
+        raise ValueError('Escape differs from strict JSON')
+    object_hook = empty_json_object if STRICT_JSON_EMPTY_OBJECT.search(text) is not None else None
+    return json.loads(text, object_hook=object_hook, parse_constant=reject_json_constant)
+
+def decode(json_str, engine='builder', lazy=False, budget=None, hook=None, json_first=False):
     """
     解析JSON字符串，返回对应的Python对象
+
+    参数:
+    json_str: JSON字符串，也可以是bytes、bytearray、memoryview，编码按BOM判断，没有BOM时为UTF-8
+    engine: 解析引擎，'builder'为匹配器级联(fJsonBuilder)，'parser'为单遍解析器(fJsonParser)，
+            'stack'为不使用递归的解析器(fJsonStackParser)，嵌套深度只受内存限制
+    lazy: 为True时集合的笛卡尔积返回fJsonProductView，list、str、bytes乘以整数返回fJsonRepeatView，
+          只在需要时才展开，与立即计算的结果比较时相等
+    budget: DecodeBudget，限制token数、嵌套深度、运算结果的大小和字符串的总长度，超出时抛出BudgetExceeded
+    hook: DecodeHook，接收各阶段的耗时、各个匹配器的尝试(只有builder引擎)、token数和最大嵌套深度，例如DecodeProfile
+    json_first: 为True时先用json模块(C实现)按标准JSON解析，失败时再使用fJson语法，两者都接受的输入结果相同；
+                开头或结尾明显不是标准JSON时不尝试json模块，budget或hook不为None时不使用
     """
-    tokens = fJsonLexer().tokenize(json_str)
-    tokens = fJsonLexer().reject_comments(tokens)
-    tokens = fJsonLexer().concat_negative_number(tokens)
-    #tokens = Lexer().concat_multi_line_string(tokens)
-    return fJsonBuilder(tokens).build()
+    source, text, start = lexer_input(json_str)
+    if json_first and budget is None and hook is None:
+        try:
+            return decode_strict_json(text, start)
+        except (ValueError, RecursionError):
+            pass
+    if hook is not None:
+        tokens = lex_stages(source, text, start, budget, hook)
+    else:
+        # 跳过注释和合并负数在词法分析时一并完成，只生成一个token流
+        tokens = fJsonLexer().iter_tokens(text, start=start)
+        if budget is not None:
+            tokens = budget.limit_tokens(tokens)
+        tokens = fJsonTokenStream(source).extend(tokens)
+    tokens.lazy = lazy
+    tokens.budget = budget
+    tokens.hook = hook
+    return decode_tokens(tokens, engine)
+
+def lex_stages(source, text, start, budget, hook):
+    # 有hook时分别进行词法分析、去掉注释和合并负数，向hook报告每一步的耗时，结果与合并为一遍时相同
+    lexer = fJsonLexer()
+    clock = time.perf_counter
+    begin = clock()
+    tokens = lexer.iter_tokens(text, comments=True, merge_negative=False, start=start)
+    if budget is not None:
+        tokens = budget.limit_tokens(tokens)
+    tokens = fJsonTokenStream(source).extend(tokens)
+    end = clock()
+    hook.on_stage('lex', end - begin)
+    tokens = lexer.reject_comments(tokens)
+    begin = clock()
+    hook.on_stage('reject_comments', begin - end)
+    tokens = lexer.concat_negative_number(tokens)
+    hook.on_stage('merge_negative', clock() - begin)
+    return tokens
+
+def compile(json_str, lazy=False, budget=None):
+    """
+    编译JSON表达式，返回可以多次求值的fJsonTemplate
 
-def encode(obj, indent=None, multi_line=False, ascii_only = False) -> str:
+    json_str可以是decode接受的任意输入；evaluate()不给绑定时的结果与decode(json_str, lazy=lazy, budget=budget)相同，
+    budget在编译时检查token数、嵌套深度和字符串的总长度，每次求值时检查运算结果的大小
     """
-    将Python对象编码为JSON字符串
+    source, text, start = lexer_input(json_str)
+    tokens = fJsonLexer().iter_tokens(text, start=start)
+    if budget is not None:
+        tokens = budget.limit_tokens(tokens)
+    tokens = fJsonTokenStream(source).extend(tokens)
+    tokens.lazy = lazy
+    tokens.budget = budget
+    compiler = fJsonCompiler()
+    node = compiler.compile_tokens(tokens)
+    return fJsonTemplate(node, compiler.names)
+
+def decode_file(path, engine='builder', lazy=False, budget=None, hook=None, json_first=False):
+    """
+    解析文件中的JSON，编码的判断与decode解析bytes时相同，engine、lazy、budget、hook、json_first的含义与decode相同
+
+    文件通过mmap映射，不会先读入整个文件再解码为str，峰值内存比open().read()之后decode低
+    """
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return decode('', engine, lazy, budget, hook, json_first)
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return decode(buffer, engine, lazy, budget, hook, json_first)
+        finally:
+            try:
+                buffer.close()
+            except BufferError:
+                # 词法分析中抛出的异常(例如BudgetExceeded)的traceback仍引用着映射的内容，映射在异常释放时关闭
+                pass
+
+def decode_tokens(tokens, engine='builder'):
+    """
+    解析已经跳过注释、合并负数的token流(fJsonTokenStream)，engine的含义与decode相同
+    token流的hook不为None时向它报告括号配对和构建的耗时、token数以及最大嵌套深度
+    """
+    hook = tokens.hook
+    if hook is None:
+        tokens.pair_brackets()
+        return build_tokens(tokens, engine)
+    clock = time.perf_counter
+    begin = clock()
+    tokens.pair_brackets()
+    end = clock()
+    hook.on_stage('pair_brackets', end - begin)
+    hook.on_tokens(len(tokens))
+    hook.on_depth(tokens.max_depth)
+    value = build_tokens(tokens, engine)
+    hook.on_stage('build', clock() - end)
+    return value
+
+def build_tokens(tokens, engine):
+    # 用engine指定的引擎解析已经配对括号的token流
+    if engine == 'parser':
+        return fJsonParser().parse_tokens(tokens)
+    if engine == 'stack':
+        return fJsonStackParser().parse_tokens(tokens)
+    if engine != 'builder':
+        raise Exception('Unknown engine: ' + str(engine))
+    return fJsonBuilder(tokens.view()).build()
+
+class DecodeHook:
+    """
+    decode的性能分析接口，各方法默认什么都不做，子类按需覆盖
+
+    on_stage(name, seconds): 一个阶段的耗时，name为'lex'、'reject_comments'、'merge_negative'、'pair_brackets'、'build'
+    on_matcher(name, seconds, matched): builder引擎中一个匹配器的一次尝试，seconds是自身耗时，
+                                        不包括其中嵌套的匹配器(子值的解析)，所以各次尝试的耗时之和不超过'build'阶段
+    on_tokens(count): 去掉注释、合并负数之后的token数
+    on_depth(depth): 括号的最大嵌套深度
+
+    'parser'和'stack'引擎不经过匹配器，只报告各阶段的总耗时('build'为整个解析)、token数和最大嵌套深度，不调用on_matcher。
+    没有hook时decode不计时，也不会调用这些方法
+    """
+    def on_stage(self, name, seconds):
+        pass
+
+    def on_matcher(self, name, seconds, matched):
+        pass
+
+    def on_tokens(self, count):
+        pass
+
+    def on_depth(self, depth):
+        pass
+
+class DecodeProfile(DecodeHook):
+    """
+    汇总报告的DecodeHook，同一个实例可以用于多次decode，结果累加
+
+    stages: {阶段: 总耗时}
+    matchers: {匹配器: [尝试次数, 匹配次数, 未匹配次数, 自身总耗时]}，只有builder引擎会记录，其他引擎为空
+    tokens: token总数
+    max_depth: 最大嵌套深度
+    report()返回便于阅读的汇总
+
+    e.g.
+    ```
+    profile = DecodeProfile()
+    decode(text, hook=profile)
+    print(profile.report())
+    ```
+    """
+    def __init__(self):
+        self.stages = {}
+        self.matchers = {}
+        self.tokens = 0
+        self.max_depth = 0
+
+    def on_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def on_matcher(self, name, seconds, matched):
+        counts = self.matchers.get(name)
+        if counts is None:
+            counts = self.matchers[name] = [0, 0, 0, 0.0]
+        counts[0] += 1
+        counts[1 if matched else 2] += 1
+        counts[3] += seconds
+
+    def on_tokens(self, count):
+        self.tokens += count
+
+    def on_depth(self, depth):
+        self.max_depth = max(self.max_depth, depth)
+
+    def report(self):
+        lines = ['tokens %d, max depth %d' % (self.tokens, self.max_depth)]
+        for name, seconds in self.stages.items():
+            lines.append('%-16s %10.6f s' % (name, seconds))
+        for name, (attempts, matched, failed, seconds) in sorted(self.matchers.items(), key=lambda item: -item[1][3]):
+            lines.append('%-18s %8d attempts %8d matched %8d failed %10.6f s' % (name, attempts, matched, failed, seconds))
+        return '\n'.join(lines)
+
+class BudgetExceeded(Exception):
+    """
+    解析超出DecodeBudget的限制时抛出
+
+    limit是超出的限制的名字(max_tokens、max_depth、max_size、max_string_bytes)，maximum是它的值，
+    position是超出限制的token或运算符在输入中的位置
+    """
+    def __init__(self, limit, maximum, position):
+        super().__init__('Decode budget exceeded: ' + limit + '=' + str(maximum) + ' at position ' + str(position))
+        self.limit = limit
+        self.maximum = maximum
+        self.position = position
+
+    def __reduce__(self):
+        # 从工作进程传回时按构造参数重建
+        return BudgetExceeded, (self.limit, self.maximum, self.position)
+
+class DecodeBudget:
+    """
+    解析不可信输入时的资源限制，None表示不限制
+
+    max_tokens: token数，词法分析时逐个计数，超出时不再继续分析
+    max_depth: 括号的嵌套深度，在构建任何值之前检查
+    max_size: 运算结果的长度，重复、笛卡尔积和连接在分配之前按结果的长度检查
+    max_string_bytes: 字符串和base64字符串的总长度(str输入按字符，bytes输入按字节)，词法分析时累计
+
+    e.g.
+    ```
+    budget = DecodeBudget(max_tokens=100000, max_depth=64, max_size=1000000, max_string_bytes=1 << 20)
+    decode(text, budget=budget)
+    ```
+    """
+    def __init__(self, max_tokens=None, max_depth=None, max_size=None, max_string_bytes=None):
+        self.max_tokens = max_tokens
+        self.max_depth = max_depth
+        self.max_size = max_size
+        self.max_string_bytes = max_string_bytes
+
+    def limit_tokens(self, tokens, usage=None):
+        # 包装iter_tokens生成的token，超出max_tokens或max_string_bytes时在对应的token处抛出BudgetExceeded，注释不计数；
+        # usage不为None时，全部token生成之后在其中记录[token数, 字符串的总长度]
+        max_tokens = self.max_tokens
+        max_string_bytes = self.max_string_bytes
+        STRING = fJsonTokenType.TokenKind_STRING
+        BASE64 = fJsonTokenType.TokenKind_BASE64
+        COMMENT = fJsonTokenType.TokenKind_COMMENT
+        count = 0
+        string_bytes = 0
+        for token in tokens:
+            if token[0] == COMMENT:
+                yield token
+                continue
+            count += 1
+            if max_tokens is not None and count > max_tokens:
+                raise BudgetExceeded('max_tokens', max_tokens, token[1])
+            if max_string_bytes is not None and (token[0] == STRING or token[0] == BASE64):
+                string_bytes += token[3] - token[2]
+                if string_bytes > max_string_bytes:
+                    raise BudgetExceeded('max_string_bytes', max_string_bytes, token[1])
+            yield token
+        if usage is not None:
+            usage[:] = [count, string_bytes]
+
+    def check_size(self, size, position):
+        if self.max_size is not None and size > self.max_size:
+            raise BudgetExceeded('max_size', self.max_size, position)
+
+def copy_value(value):
+    """
+    复制decode的结果，所有可变的容器都重新创建，不可变的值直接共享
+    """
+    cls = value.__class__
+    if cls is dict:
+        return {key: copy_value(item) for key, item in value.items()}
+    if cls is list:
+        return [copy_value(item) for item in value]
+    if cls is set:
+        # 集合的元素都可以哈希，不需要复制
+        return set(value)
+    if cls is tuple:
+        return tuple([copy_value(item) for item in value])
+    if cls is fJsonSpecialType:
+        return fJsonSpecialType(value.name, copy_value(value.elements))
+    if cls is fJsonRepeatView:
+        return fJsonRepeatView(copy_value(value.value), value.count)
+    if cls is fJsonProductView:
+        return fJsonProductView(copy_value(value.left), copy_value(value.right))
+    return value
+
+def freeze_value(value):
+    """
+    把decode的结果转换为不可修改的结构: dict转为MappingProxyType，list转为tuple，set转为frozenset，
+    fJsonRepeatView、fJsonProductView保存的内容也同样转换
+    """
+    cls = value.__class__
+    if cls is dict:
+        return MappingProxyType({key: freeze_value(item) for key, item in value.items()})
+    if cls is list or cls is tuple:
+        return tuple([freeze_value(item) for item in value])
+    if cls is set:
+        return frozenset(value)
+    if cls is fJsonSpecialType:
+        return fJsonSpecialType(value.name, freeze_value(value.elements))
+    if cls is fJsonRepeatView:
+        return fJsonRepeatView(freeze_value(value.value), value.count)
+    if cls is fJsonProductView:
+        return fJsonProductView(freeze_value(value.left), freeze_value(value.right))
+    return value
+
+def value_size(value):
+    """
+    估计decode的结果占用的内存(字节): 每个对象按sys.getsizeof计算，容器加上所有元素，同一个对象只计一次；
+    fJsonProductView、fJsonRepeatView按实际保存的内容计算，不按展开后的长度
+    """
+    getsizeof = sys.getsizeof
+    seen = set()
+    pending = [value]
+    total = 0
+    # 用显式的栈遍历，stack引擎得到的深层嵌套结果不会超出递归深度限制
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += getsizeof(value)
+        cls = value.__class__
+        if cls is dict:
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif cls is list or cls is tuple or cls is set or cls is frozenset:
+            pending.extend(value)
+        elif cls is fJsonSpecialType:
+            pending.append(value.name)
+            pending.append(value.elements)
+        elif cls is fJsonRepeatView:
+            pending.append(value.value)
+        elif cls is fJsonProductView:
+            pending.extend((value.left, value.right, value.left_items, value.right_items))
+    return total
+
+class DecodeCache:
+    """
+    带LRU淘汰的decode缓存，以输入的文本为键
 
     参数:
-    obj: Python对象
-    indent: 缩进空格数,None表示不缩进
-    multi_line: 是否多行显示
-    ascii_only: 是否只显示ASCII字符
+    max_entries: 最多缓存的条目数
+    max_bytes: 缓存占用内存的上限，每个条目按输入文本和结果的大小之和计算(见value_size)，超过上限的单个条目不缓存
+    strategy: 'copy'每次返回缓存结果的副本，'freeze'在缓存时把结果转换为不可修改的结构(见freeze_value)并直接共享
+    engine: 解析引擎，与decode相同
+
+    decode的lazy、budget、json_first与decode的同名参数相同，它们也是键的一部分，同一文本以不同的参数解析时分别缓存。
+    hits、misses、evictions分别记录命中、未命中和淘汰的次数；解析失败的输入不缓存。可以在多个线程中共享
+    """
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024, strategy='copy', engine='builder'):
+        if strategy not in ('copy', 'freeze'):
+            raise Exception('Unknown cache strategy: ' + str(strategy))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.strategy = strategy
+        self.engine = engine
+        self.entries = OrderedDict() # 键 -> (结果, 大小)，最近使用的在末尾
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def decode(self, json_str, lazy=False, budget=None, json_first=False):
+        # bytearray、memoryview不能哈希，转为bytes作为键；DecodeBudget按各项限制作为键
+        text = json_str if isinstance(json_str, (str, bytes)) else bytes(json_str)
+        limits = None if budget is None else (budget.max_tokens, budget.max_depth, budget.max_size, budget.max_string_bytes)
+        key = (text, bool(lazy), limits, bool(json_first))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is not None:
+            return copy_value(entry[0]) if self.strategy == 'copy' else entry[0]
+
+        value = decode(text, self.engine, lazy, budget, None, json_first)
+        stored = freeze_value(value) if self.strategy == 'freeze' else copy_value(value)
+        size = sys.getsizeof(text) + value_size(value)
+        if size <= self.max_bytes and self.max_entries > 0:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = (stored, size)
+                    self.size += size
+                    while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                        _, (_, evicted_size) = self.entries.popitem(last=False)
+                        self.size -= evicted_size
+                        self.evictions += 1
+        return value if self.strategy == 'copy' else stored
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+def decode_batch_item(engine, lazy, budget, item):
+    # 在工作进程中解析一项，异常作为结果返回，不中断整批
+    index, text = item
+    try:
+        return index, decode(text, engine, lazy, budget), None
+    except Exception as e:
+        return index, None, e
+
+def decode_parallel_item(engine, lazy, budget, item):
+    # decode_parallel有budget时在工作进程中解析一段，值之外再返回[token数, 字符串的总长度]，由调用者检查整个文本的总量
+    index, text = item
+    usage = [0, 0]
+    try:
+        tokens = fJsonTokenStream(text).extend(budget.limit_tokens(fJsonLexer().iter_tokens(text), usage))
+        tokens.lazy = lazy
+        tokens.budget = budget
+        return index, (decode_tokens(tokens, engine), usage), None
+    except Exception as e:
+        return index, None, e
+
+def decode_batch_chunk(function, chunk):
+    # 工作进程一次解析一块，减少进程间通信的次数
+    return [function(item) for item in chunk]
+
+class BatchDecoder:
+    """
+    用进程池并行解析多段互相独立的文本
+
+    进程池在第一次decode时创建，之后的调用都复用同一组工作进程，close()或退出with时结束它们。
+    workers为1时直接在当前进程中解析，不创建进程池
+
+    e.g.
+    ```
+    with BatchDecoder(workers=8) as decoder:
+        for index, value, error in decoder.decode(responses, ordered=False):
+            ...
+    ```
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def decode(self, texts, chunksize=64, ordered=True, engine='builder', lazy=False, budget=None):
+        """
+        逐个返回(下标, 值, 异常)，解析成功时异常为None，失败时值为None，一项失败不影响其他项
+
+        texts可以是任意可迭代对象，按需读取: 同时交给进程池的最多为工作进程数的2倍块，每取走一块的结果才再读取一块，
+        所以texts可以是很长的生成器；ordered为False时按完成的顺序返回，用下标对应输入；
+        chunksize是每次发给一个工作进程的项数，较大时进程间通信的开销较小；engine、lazy、budget的含义与decode相同
+        """
+        return self.decode_with(partial(decode_batch_item, engine, lazy, budget), texts, chunksize, ordered)
+
+    def decode_with(self, function, texts, chunksize=64, ordered=True):
+        # 用function(下标, 文本)解析每一项，function须是可以pickle的模块级函数
+        items = enumerate(texts)
+        if self.workers == 1:
+            return map(function, items)
+        with self.lock:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            pool = self.pool
+        return self.decode_windows(pool, partial(decode_batch_chunk, function), items, max(int(chunksize), 1), ordered)
+
+    def decode_windows(self, pool, function, items, chunksize, ordered):
+        # Pool.imap会在后台线程中读完整个输入，这里用apply_async逐块提交，保持固定数量的块在进程池中
+        window = self.workers * 2
+        # ordered时按提交顺序等待各块；否则由回调把完成的块放入队列
+        pending = deque()
+        done = queue.Queue()
+        submitted = 0
+        exhausted = False
+        while True:
+            while not exhausted and submitted < window:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    exhausted = True
+                    break
+                if ordered:
+                    pending.append(pool.apply_async(function, (chunk,)))
+                else:
+                    pool.apply_async(function, (chunk,), callback=done.put, error_callback=done.put)
+                submitted += 1
+            if submitted == 0:
+                return
+            results = pending.popleft().get() if ordered else done.get()
+            submitted -= 1
+            if isinstance(results, BaseException):
+                raise results
+            yield from results
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# decode_batch按工作进程数共用的BatchDecoder，进程退出时关闭
+BATCH_DECODERS = {}
+BATCH_DECODERS_LOCK = threading.Lock()
+
+@atexit.register
+def close_batch_decoders():
+    with BATCH_DECODERS_LOCK:
+        for decoder in BATCH_DECODERS.values():
+            decoder.close()
+        BATCH_DECODERS.clear()
+
+def decode_batch(texts, workers=None, chunksize=64, ordered=True, engine='builder', lazy=False, budget=None):
+    """
+    并行解析多段互相独立的文本，逐个返回(下标, 值, 异常)，参数与BatchDecoder.decode相同
+
+    workers相同的调用共用同一个进程池，工作进程在多次调用之间保留；workers默认为CPU核数
+    """
+    return batch_decoder(workers).decode(texts, chunksize, ordered, engine, lazy, budget)
+
+def batch_decoder(workers=None):
+    # workers相同的调用共用的BatchDecoder
+    workers = workers or os.cpu_count() or 1
+    with BATCH_DECODERS_LOCK:
+        decoder = BATCH_DECODERS.get(workers)
+        if decoder is None:
+            decoder = BATCH_DECODERS[workers] = BatchDecoder(workers)
+    return decoder
+
+def split_top_level(text):
+    """
+    快速扫描text，整个文本(除空白和注释外)是一个[...]或{...}时返回(左括号, 各元素的[起点, 终点)列表)，否则返回None
+
+    只识别字符串、注释、括号和逗号，不生成token；遇到无法在不做完整词法分析的情况下确定的写法
+    (紧跟在其他字符后面的R"或“、字符串和注释之外的*/、未闭合的字符串、不配对的括号)时返回None，由调用者按顺序解析
+    """
+    match_at = SPLIT_PATTERN.match
+    stack = []
+    opener = None
+    begin = 0
+    ranges = []
+    position = 0
+    while True:
+        match = match_at(text, position)
+        if match is None:
+            return None
+        kind = match.lastgroup
+        if kind is None:
+            start = match.end()
+        else:
+            start = match.start(kind)
+        if len(stack) == 0 and text[match.start():start].strip():
+            return None # 顶层的括号之外还有其他内容
+        if kind is None:
+            break
+        position = match.end()
+        if kind == 'string' or kind == 'comment':
+            if len(stack) == 0 and kind == 'string':
+                return None
+            continue
+        if kind == 'literal':
+            if len(stack) == 0:
+                return None
+            token = match.group(kind)
+            if token in ('R"', '“') and start > 0 and text[start - 1] not in IDENTIFIER_BREAKS:
+                return None
+            literal = scan_literal(text, start, token)
+            if literal is None:
+                return None
+            position = literal[3]
+            continue
+        if kind == 'opening':
+            if len(stack) == 0:
+                if opener is not None:
+                    return None
+                opener = match.group(kind)
+                begin = position
+            stack.append(match.group(kind))
+            continue
+        if kind == 'closing':
+            if len(stack) == 0 or BRACKET_PAIRS[stack.pop()] != match.group(kind):
+                return None
+            if len(stack) == 0:
+                ranges.append((begin, start))
+            continue
+        if kind == 'comma':
+            if len(stack) == 0:
+                return None
+            if len(stack) == 1:
+                ranges.append((begin, start))
+                begin = position
+            continue
+        return None
+    if opener not in ('[', '{') or len(stack) != 0:
+        return None
+    return opener, ranges
+
+def decode_parallel(json_str, workers=None, engine='builder', lazy=False, min_size=1 << 20, budget=None):
+    """
+    用进程池并行解析一个很大的顶层[...]或{...}，结果与decode相同
+
+    先用split_top_level找出顶层元素的范围，把连续的元素分成若干段，用decode_batch的进程池分别解析后按顺序拼接。
+    文本短于min_size、无法切分、某一段解析失败或者字典中有元素缺少值(此时整体是集合)时按顺序调用decode，
+    所以异常和各种特殊情况都与decode相同。engine、lazy、budget的含义与decode相同，workers的含义与decode_batch相同；
+    每一段都在budget的限制下解析，各段的token数和字符串长度之和超出限制时按顺序调用decode，抛出与decode相同的BudgetExceeded
+    """
+    workers = workers or os.cpu_count() or 1
+    _, text, start = lexer_input(json_str)
+    split = None
+    if workers > 1 and len(text) - start >= min_size:
+        if text.__class__ is not str:
+            text = str(text[start:], 'utf-8')
+        split = split_top_level(text)
+    if split is None or len(split[1]) < 2:
+        return decode(json_str, engine, lazy, budget)
+    opener, ranges = split
+    closing = BRACKET_PAIRS[opener]
+
+    # 每个工作进程分到约4段，每段包含长度相近的若干个连续元素
+    chunks = []
+    target = (ranges[-1][1] - ranges[0][0]) / (workers * 4)
+    first = ranges[0][0]
+    for begin, end in ranges:
+        if end - first >= target:
+            chunks.append((first, end))
+            first = end + 1
+    if first <= ranges[-1][1]:
+        chunks.append((first, ranges[-1][1]))
+    if len(chunks) < 2:
+        return decode(json_str, engine, lazy, budget)
+
+    expected = list if opener == '[' else dict
+    result = expected()
+    texts = (opener + text[begin:end] + closing for begin, end in chunks)
+    if budget is None:
+        function = partial(decode_batch_item, engine, lazy, None)
+    else:
+        function = partial(decode_parallel_item, engine, lazy, budget)
+    # 整个文本的token数: 各段多出的一对括号不计，段之间的逗号以及外层的括号计入
+    token_count = 2 + len(chunks) - 1
+    string_bytes = 0
+    for _, value, error in batch_decoder(workers).decode_with(function, texts, 1, True):
+        if budget is not None and error is None:
+            value, (count, size) = value
+            token_count += count - 2
+            string_bytes += size
+        if error is not None or value.__class__ is not expected:
+            return decode(json_str, engine, lazy, budget)
+        if expected is list:
+            result.extend(value)
+        else:
+            result.update(value)
+    if budget is not None and (budget.max_tokens is not None and token_count > budget.max_tokens
+                               or budget.max_string_bytes is not None and string_bytes > budget.max_string_bytes):
+        return decode(json_str, engine, lazy, budget)
+    return result
+
+class IncrementalDecoder:
+    """
+    增量解析器，边接收流式输出的文本边解析
+
+    顶层用逗号或分号分隔的每个值在其后的分隔符到达时解析并由feed返回，最后一个值由close返回，
+    每个值的结果与用decode单独解析这段文本相同(值后面还可能出现运算符，所以右括号到达时还不能确定值已经结束)。
+    词法分析的进度在多次feed之间保留，每次只重新分析上次末尾还不能确定的token；
+    末尾是未闭合的字符串时，只有新文本中可能出现它的结束符才会重新扫描这个字符串。
+    输入也可以是bytes: 编码按开头的BOM判断(与decode相同，没有BOM时为UTF-8)，跨越两次feed的多字节字符会被正确拼接，
+    此时token位置是解码后的字符偏移；同一个输入中不能混用str和bytes。
+    budget(DecodeBudget)对每个顶层值分别计算，与用decode(budget=budget)单独解析这个值相同，字符串的长度按解码后的字符计算；
+    token数、嵌套深度和字符串的长度在接收文本时检查(包括还未闭合的字符串)，所以一个不断增长的值不会无限占用内存
+
+    e.g.
+    ```
+    decoder = IncrementalDecoder()
+    for chunk in chunks:
+        for value in decoder.feed(chunk):
+            ...
+        print(decoder.partial())
+    values = decoder.close()
+    ```
+    """
+    # 后面再出现任何字符都不会改变的运算符，出现在已收到文本的末尾时也可以确定
+    STABLE_SYMBOLS = frozenset(x for x in OPERATORS | BRACKETS
+                               if len(x) == 1 and x not in (' ', '\n', '-', '.') and not any(y != x and y.startswith(x) for y in OPERATORS))
+
+    def __init__(self, engine='builder', budget=None):
+        self.engine = engine
+        self.budget = budget
+        self.lexer = fJsonLexer()
+        self.reset()
+
+    def reset(self):
+        # base是当前顶层值在整个输入中的起点，''.join(parts)[skip:]是从base开始已收到的文本
+        self.base = 0
+        self.parts = []
+        self.skip = 0
+        # resume是下次词法分析开始的位置，pending是从resume开始已收到的文本
+        self.resume = 0
+        self.pending = []
+        # tokens是当前顶层值中已经确定的token，文本偏移相对于base，位置相对于整个输入
+        self.tokens = fJsonTokenStream()
+        self.brackets = []
+        self.string_bytes = 0
+        self.previous = fJsonTokenType.TokenKind_SYMBOL
+        # literal是pending中未闭合的字符串的(位置, 开头)，blocked是(它的结束符, 已收到文本末尾可能属于结束符的部分)，
+        # pending_size是pending的总长度，literal_start是字符串内容的起点，literal_slack是结束符的长度减1
+        self.literal = None
+        self.blocked = None
+        self.pending_size = 0
+        self.literal_start = 0
+        self.literal_slack = 0
+        # binary表示输入是bytes还是str(还没有输入时为None)；byte_head是判断BOM之前收到的字节，byte_decoder是之后的增量解码器
+        self.binary = None
+        self.byte_head = b''
+        self.byte_decoder = None
+
+    def feed(self, chunk):
+        """
+        追加一段文本(str或bytes)，返回因此结束的顶层值列表
+        """
+        binary = not isinstance(chunk, str)
+        if self.binary is None:
+            self.binary = binary
+        elif self.binary != binary:
+            raise TypeError('Cannot mix str and bytes input in one IncrementalDecoder')
+        if binary:
+            chunk = self.decode_bytes(chunk, False)
+        return self.feed_text(chunk)
+
+    def feed_text(self, chunk):
+        # 追加一段已经解码的文本
+        if len(chunk) == 0:
+            return []
+        self.parts.append(chunk)
+        self.pending.append(chunk)
+        if self.blocked is not None and not self.may_unblock(chunk):
+            self.pending_size += len(chunk)
+            self.check_literal()
+            return []
+        return self.scan(False)
+
+    def close(self):
+        """
+        结束输入，返回剩下的顶层值列表，之后可以用同一个解析器解析新的输入
+        """
+        values = self.feed_text(self.decode_bytes(b'', True)) if self.binary else []
+        values += self.scan(True)
+        if len(self.tokens) != 0:
+            values.append(self.finish(None))
+        self.reset()
+        return values
+
+    def partial(self):
+        """
+        尽力解析当前还没有结束的顶层值: 补全未闭合的字符串和括号，去掉末尾悬空的运算符和没有值的键，无法解析时返回None
+        每次调用都会重新解析整个值
+        """
+        SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+        text = ''.join(self.parts)[self.skip:]
+        window = ''.join(self.pending)
+        shift = self.resume - self.base
+        tokens = self.tokens.select(range(len(self.tokens)))
+        tokens.source = text
+        tokens.extend((kind, position + self.resume, start + shift, end + shift, string)
+                      for kind, position, start, end, string in self.lexer.iter_tokens(window, previous=self.previous))
+        if self.literal is not None:
+            # 假设未闭合的字符串在这里结束，末尾落单的反斜杠不计入
+            position, opener = self.literal
+            content = window[:-1] if (len(window) - len(window.rstrip('\\'))) % 2 == 1 else window
+            terminator = literal_terminator(content, position, opener)
+            if terminator is not None:
+                literal = scan_literal(content + terminator[0], position, opener)
+                if literal is not None:
+                    start, end, string, _ = literal
+                    kind = fJsonTokenType.TokenKind_BASE64 if opener == '$"' else fJsonTokenType.TokenKind_STRING
+                    tokens.append(kind, position + self.resume, 0, 0, content[start:end] if string is None else string)
+
+        def trim(count):
+            # 去掉末尾悬空的运算符和分隔符
+            while count > 0 and tokens.kinds[count - 1] == SYMBOL and tokens.text(count - 1) not in BRACKETS:
+                count -= 1
+            return count
+
+        count = trim(len(tokens))
+        # stack中是未闭合的[左括号, 当前元素之前可以截断的位置, 当前元素中是否出现了':']
+        stack = []
+        for i in range(count):
+            if tokens.kinds[i] != SYMBOL:
+                continue
+            symbol = tokens.text(i)
+            if symbol in BRACKET_PAIRS:
+                stack.append([symbol, i + 1, False])
+            elif symbol in (')', ']', '}'):
+                if len(stack) != 0:
+                    stack.pop()
+            elif len(stack) != 0 and symbol == ',':
+                stack[-1][1] = i
+                stack[-1][2] = False
+            elif len(stack) != 0 and symbol == ':':
+                stack[-1][2] = True
+        if len(stack) != 0 and stack[-1][0] == '{' and not stack[-1][2]:
+            # 字典中最后一个元素只有键，去掉它
+            count = trim(stack[-1][1])
+        if count == 0:
+            return None
+
+        if count != len(tokens):
+            tokens = tokens.select(range(count))
+        closing = ''.join(BRACKET_PAIRS[x[0]] for x in reversed(stack))
+        for i in range(len(closing)):
+            tokens.append(SYMBOL, self.resume + len(window), len(text) + i, len(text) + i + 1)
+        tokens.source = text + closing
+        tokens.budget = self.budget
+        try:
+            return decode_tokens(tokens, self.engine)
+        except Exception:
+            return None
+
+    def decode_bytes(self, chunk, final):
+        # 收到4个字节后按BOM选择编码，之后用增量解码器转为str，不完整的多字节字符留到下次
+        if self.byte_decoder is None:
+            self.byte_head += bytes(chunk)
+            if len(self.byte_head) < 4 and not final:
+                return ''
+            chunk = self.byte_head
+            self.byte_head = b''
+            self.byte_decoder = codecs.getincrementaldecoder(bom_encoding(chunk[:4]))()
+        return self.byte_decoder.decode(chunk, final)
+
+    def may_unblock(self, chunk):
+        # 新文本中出现了前面不是奇数个反斜杠的结束符时才需要重新扫描未闭合的字符串
+        terminator, tail = self.blocked
+        probe = tail + chunk
+        # 完全落在旧文本中的结束符上次已经检查过
+        index = probe.find(terminator, max(0, len(tail) - len(terminator) + 1))
+        while index >= 0:
+            begin = index
+            while begin > 0 and probe[begin - 1] == '\\':
+                begin -= 1
+            if begin == 0 or (index - begin) % 2 == 0:
+                self.blocked = None
+                return True
+            index = probe.find(terminator, index + 1)
+        self.blocked = terminator, self.literal_tail(probe, 0, terminator)
+        return False
+
+    def literal_tail(self, text, start, terminator):
+        # text[start:]是未闭合字符串的内容，返回末尾可能与后续文本组成结束符的部分，
+        # 连同它前面连续的反斜杠和再前面一个字符，用来判断结束符是否被转义
+        cut = max(start, len(text) - len(terminator))
+        while cut > start and text[cut - 1] == '\\':
+            cut -= 1
+        return text[max(start, cut - 1):]
+
+    def scan(self, final):
+        # 分析pending中的文本，确定的token加入当前顶层值；final为False时末尾还可能变化的token留到下次
+        SYMBOL = fJsonTokenType.TokenKind_SYMBOL
+        window = ''.join(self.pending)
+        origin = self.resume
+        values = []
+        withheld = None
+        stop = 0
+        for token in self.lexer.iter_tokens(window, previous=self.previous):
+            if withheld is not None:
+                # 距末尾不到3个字符的数字可能因为后面的'.'、'e'、'e+'而变长
+                if not final and withheld[0] == fJsonTokenType.TokenKind_NUMBER and withheld[3] > len(window) - 3:
+                    break
+                stop = self.accept(withheld, window, origin, values)
+            withheld = token
+        else:
+            if withheld is not None and (final or withheld[0] == SYMBOL and window[withheld[2]:withheld[3]] in self.STABLE_SYMBOLS):
+                stop = self.accept(withheld, window, origin, values)
+                withheld = None
+        if withheld is not None:
+            stop = withheld[1]
+        if final:
+            return values
+
+        self.pending = [window[stop:]]
+        self.resume = origin + stop
+        self.literal = self.find_open_literal(window, stop)
+        if self.literal is None:
+            self.blocked = None
+        else:
+            position, opener = self.literal
+            terminator = literal_terminator(window, position, opener)
+            terminator, start = ('(', position + 2) if terminator is None else (terminator[0], terminator[2])
+            self.blocked = terminator, self.literal_tail(window, start, terminator)
+            self.literal = position - stop, opener
+            self.literal_start = start - stop
+            self.literal_slack = len(terminator) - 1
+            self.pending_size = len(window) - stop
+            self.check_literal()
+        return values
+
+    def accept(self, token, window, origin, values):
+        # 把一个确定的token加入当前顶层值，遇到顶层的分隔符时解析当前值并开始下一个值；返回token在window中的终点
+        kind, position, start, end, text = token
+        if kind == fJsonTokenType.TokenKind_SYMBOL:
+            symbol = window[start:end]
+            if symbol in BRACKET_PAIRS:
+                self.brackets.append(symbol)
+                if self.budget is not None and self.budget.max_depth is not None and len(self.brackets) > self.budget.max_depth:
+                    raise BudgetExceeded('max_depth', self.budget.max_depth, origin + position)
+            elif symbol in (')', ']', '}'):
+                if len(self.brackets) == 0 or BRACKET_PAIRS[self.brackets[-1]] != symbol:
+                    raise Exception('Unmatched bracket ' + symbol + ' at position ' + str(origin + position))
+                self.brackets.pop()
+            elif (symbol == ',' or symbol == ';') and len(self.brackets) == 0:
+                if len(self.tokens) != 0:
+                    values.append(self.finish(origin + start - self.base))
+                self.base = origin + end
+                self.parts = [window]
+                self.skip = end
+                self.tokens = fJsonTokenStream()
+                self.string_bytes = 0
+                self.previous = kind
+                return end
+        if self.budget is not None:
+            self.check_budget(kind, origin + position, end - start)
+        shift = origin - self.base
+        self.tokens.append(kind, origin + position, start + shift, end + shift, text)
+        self.previous = kind
+        return end
+
+    def check_budget(self, kind, position, size):
+        # 与DecodeBudget.limit_tokens相同，按当前顶层值计数
+        budget = self.budget
+        if budget.max_tokens is not None and len(self.tokens) >= budget.max_tokens:
+            raise BudgetExceeded('max_tokens', budget.max_tokens, position)
+        if kind == fJsonTokenType.TokenKind_STRING or kind == fJsonTokenType.TokenKind_BASE64:
+            self.string_bytes += size
+            if budget.max_string_bytes is not None and self.string_bytes > budget.max_string_bytes:
+                raise BudgetExceeded('max_string_bytes', budget.max_string_bytes, position)
+
+    def check_literal(self):
+        # 未闭合的字符串已收到的内容(除去末尾可能属于结束符的部分)计入max_string_bytes，超出时不再等待它的结束符；
+        # R"的分隔符还没有结束时按分隔符的长度计算
+        budget = self.budget
+        if budget is None or budget.max_string_bytes is None:
+            return
+        if self.string_bytes + self.pending_size - self.literal_start - self.literal_slack > budget.max_string_bytes:
+            raise BudgetExceeded('max_string_bytes', budget.max_string_bytes, self.resume + self.literal[0])
+
+    def finish(self, stop):
+        # 解析当前顶层值，stop是它的文本终点(相对于base)
+        text = ''.join(self.parts)
+        self.tokens.source = text[self.skip:] if stop is None else text[self.skip:self.skip + stop]
+        self.tokens.budget = self.budget
+        return decode_tokens(self.tokens, self.engine)
+
+    def find_open_literal(self, window, position):
+        # 从position开始跳过完整的token，返回末尾未闭合的字符串的(位置, 开头)
+        while True:
+            match = TOKEN_PATTERN.match(window, position)
+            kind = match.lastgroup
+            if kind is None:
+                return None
+            if kind == 'string' or kind == 'base64':
+                literal = scan_literal(window, match.start(kind), match.group(kind))
+                if literal is None:
+                    return match.start(kind), match.group(kind)
+                position = literal[3]
+            else:
+                position = match.end()
+
+def iterdecode(fp_or_text, engine='builder', block_size=65536, budget=None):
+    """
+    逐个生成顶层用逗号或分号分隔的值，每个值在其后的分隔符读到时立即生成
+
+    参数:
+    fp_or_text: 文件对象(按块调用read，文本模式和二进制模式都可以)、str或bytes，bytes的编码判断与decode相同
+    engine: 解析引擎，与decode相同
+    block_size: 每次读取的字符数(二进制模式为字节数)
+    budget: DecodeBudget，对每个值分别计算，见IncrementalDecoder
+
+    内存占用取决于最大的单个值和block_size，而不是整个文件
+    """
+    decoder = IncrementalDecoder(engine, budget)
+    if isinstance(fp_or_text, (str, bytes, bytearray, memoryview)):
+        for start in range(0, len(fp_or_text), block_size):
+            yield from decoder.feed(fp_or_text[start:start + block_size])
+    else:
+        while True:
+            block = fp_or_text.read(block_size)
+            if len(block) == 0:
+                break
+            yield from decoder.feed(block)
+    yield from decoder.close()
+
+ENCODE_CHUNK_ITEMS = 1024
+
+# ascii_only时需要转义的字符: 可打印ASCII以外的字符以及引号、反斜杠
+ASCII_ESCAPE_PATTERN = re.compile('[^ !#-\\[\\]-~]')
+ASCII_SHORT_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\t': '\\t'}
+# json的转义把这些字符写成decode不支持的\\b、\\f、\\r
+JSON_ONLY_ESCAPES = re.compile('[\b\f\r]')
+
+def escape_ascii_char(match):
+    char = match.group()
+    escaped = ASCII_SHORT_ESCAPES.get(char)
+    if escaped is not None:
+        return escaped
+    code = ord(char)
+    if code < 0x10000:
+        return '\\u%04x' % code
+    # 拆成UTF-16代理对
+    code -= 0x10000
+    return '\\u%04x\\u%04x' % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+
+def escape_string(s):
+    # 没有需要转义的字符时str.replace直接返回原字符串，比正则或translate的单遍替换更快
+    return '"' + s.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t') + '"'
+
+def escape_ascii(s):
+    """
+    只输出ASCII字符的转义，非ASCII字符写成\\uXXXX(BMP以外的字符写成代理对)，结果可以被decode还原
+
+    含非ASCII字符时只遍历一遍: 通常交给json模块的C实现(与ASCII_ESCAPE_PATTERN的替换结果相同)，
+    含有\\b、\\f、\\r时由ASCII_ESCAPE_PATTERN逐个替换
+    """
+    if s.isascii():
+        return escape_string(s)
+    if JSON_ONLY_ESCAPES.search(s) is None:
+        return json.encoder.encode_basestring_ascii(s)
+    return '"' + ASCII_ESCAPE_PATTERN.sub(escape_ascii_char, s) + '"'
+
+# 容器按类型查找括号，子类再走isinstance判断。DecodeCache的freeze策略返回的
+# MappingProxyType、frozenset与dict、set相同
+ENCODE_BRACKETS = {list: '[]', tuple: '()', set: '{}', dict: '{}', frozenset: '{}', MappingProxyType: '{}'}
+ENCODE_MAPPINGS = (dict, MappingProxyType)
+
+def iterencode(obj, indent=None, multi_line=False, ascii_only=False):
+    """
+    将Python对象编码为JSON字符串，逐段生成编码结果，参数与encode相同
+
+    不会先拼出每一层的完整字符串，内存占用取决于嵌套深度而不是输出的长度
     """
-    def escape_string(s):
-        s = '"' + s.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t') + '"'
-        if ascii_only:
-            s = s.encode('unicode_escape').decode()
-        return s
-
-    def encode_value(obj, level=0):
-        if obj is None:
-            return 'null'
-        if obj is True:
-            return 'true'
-        if obj is False:
-            return 'false'
+    escape = escape_ascii if ascii_only else escape_string
+
+    # 标量按类型直接查到编码函数，不用逐个isinstance
+    encoders = {
+        str: escape,
+        int: int.__repr__,
+        float: float.__repr__,
+        bool: {True: 'true', False: 'false'}.__getitem__,
+        type(None): lambda value: 'null',
+        bytes: lambda value: '$"' + base64.b64encode(value).decode() + '"',
+    }
+
+    def encode_scalar(obj):
+        # 标量直接返回编码结果，容器返回None
+        encoder = encoders.get(obj.__class__)
+        if encoder is not None:
+            return encoder(obj)
         if isinstance(obj, (int, float)):
             return str(obj)
         if isinstance(obj, str):
-            return escape_string(obj)
+            return escape(obj)
         if isinstance(obj, bytes):
             return '$"' + base64.b64encode(obj).decode() + '"'
+        if isinstance(obj, fJsonRepeatView) and isinstance(obj.value, (str, bytes)):
+            return encode_scalar(obj.materialize())
+        return None
 
-        # 计算当前和下一级的缩进
-        curr_indent = ' ' * (indent * level) if indent else ''
-        next_indent = ' ' * (indent * (level + 1)) if indent else ''
-        
+    # 每一层的(左括号之后, 分隔符, 右括号之前)，按层缓存
+    layouts = []
+
+    def layout(level):
+        while len(layouts) <= level:
+            current = ' ' * (indent * len(layouts))
+            inner = current + ' ' * indent
+            layouts.append(('\n' + inner, ',\n' + inner, '\n' + current))
+        return layouts[level]
+
+    def container_brackets(obj):
+        brackets = ENCODE_BRACKETS.get(obj.__class__)
+        if brackets is not None:
+            return brackets
         if isinstance(obj, list):
-            if not obj:  # 空列表
-                return '[]'
-            items = [encode_value(x, level + 1) for x in obj]
-            if multi_line and indent:
-                return '[\n' + next_indent + f',\n{next_indent}'.join(items) + '\n' + curr_indent + ']'
-            return '[' + ', '.join(items) + ']'
-            
+            return '[]'
         if isinstance(obj, tuple):
-            if not obj:  # 空元组
-                return '()'
-            items = [encode_value(x, level + 1) for x in obj]
-            if len(obj) == 1:
-                return f'({items[0]},)'
-            if multi_line and indent:
-                return '(\n' + next_indent + f',\n{next_indent}'.join(items) + '\n' + curr_indent + ')'
-            return '(' + ', '.join(items) + ')'
-            
-        if isinstance(obj, set):
-            if not obj:  # 空集合
-                return '{}'
-            items = [encode_value(x, level + 1) for x in obj]
-            if multi_line and indent:
-                return '{\n' + next_indent + f',\n{next_indent}'.join(items) + '\n' + curr_indent + '}'
-            return '{' + ', '.join(items) + '}'
-            
-        if isinstance(obj, dict):
-            if not obj:  # 空字典
-                return '{}'
-            items = [encode_value(k, level + 1) + ': ' + encode_value(v, level + 1) 
-                    for k, v in obj.items()]
-            if multi_line and indent:
-                return '{\n' + next_indent + f',\n{next_indent}'.join(items) + '\n' + curr_indent + '}'
-            return '{' + ', '.join(items) + '}'
-            
+            return '()'
+        if isinstance(obj, (set, frozenset, dict)):
+            return '{}'
+        # lazy模式的结果逐项编码，不先展开
+        if isinstance(obj, fJsonRepeatView):
+            return '()' if isinstance(obj.value, tuple) else '[]'
+        if isinstance(obj, fJsonProductView):
+            return '{}'
         raise Exception('Invalid JSON value: ' + str(obj))
 
+    def delimiters(obj, brackets, level):
+        # 返回(左括号, 分隔符, 右括号)，单元素元组总是写成(x,)
+        if brackets == '()' and len(obj) == 1:
+            return '(', ', ', ',)'
+        if multi_line and indent:
+            after, separator, before = layout(level)
+            return brackets[0] + after, separator, before + brackets[1]
+        return brackets[0], ', ', brackets[1]
+
+    # 小容器直接拼成完整的字符串，比逐段生成快；budget是还能直接拼接的项数，
+    # 用完时放弃，改为逐段生成，所以一次拼出的字符串不会超过ENCODE_CHUNK_ITEMS项
+    budget = 0
+
+    def encode_inline(obj, level):
+        # 返回obj的完整编码，超出budget时返回None
+        nonlocal budget
+        brackets = ENCODE_BRACKETS.get(obj.__class__)
+        if brackets is None:
+            text = encode_scalar(obj)
+            if text is not None:
+                return text
+            brackets = container_brackets(obj)
+        if not obj:  # 空容器
+            return brackets
+        budget -= len(obj)
+        if budget < 0:
+            return None
+        opening, separator, closing = delimiters(obj, brackets, level)
+        texts = []
+        get_encoder = encoders.get
+        if brackets == '{}' and isinstance(obj, ENCODE_MAPPINGS):
+            for key, value in obj.items():
+                encoder = get_encoder(key.__class__)
+                key_text = encode_inline(key, level + 1) if encoder is None else encoder(key)
+                if key_text is None:
+                    return None
+                encoder = get_encoder(value.__class__)
+                text = encode_inline(value, level + 1) if encoder is None else encoder(value)
+                if text is None:
+                    return None
+                texts.append(key_text + ': ' + text)
+        else:
+            for item in obj:
+                encoder = get_encoder(item.__class__)
+                text = encode_inline(item, level + 1) if encoder is None else encoder(item)
+                if text is None:
+                    return None
+                texts.append(text)
+        return opening + separator.join(texts) + closing
+
+    def encode_item(obj, level):
+        # 标量和小容器返回完整的编码，大容器返回None
+        nonlocal budget
+        budget = ENCODE_CHUNK_ITEMS
+        return encode_inline(obj, level)
+
+    def encode_container(obj, level):
+        brackets = container_brackets(obj)
+        opening, separator, closing = delimiters(obj, brackets, level)
+
+        # texts是还没有生成的一串项，用separator一次拼接；超过ENCODE_CHUNK_ITEMS项时先生成，
+        # 使很长的列表也不会全部留在内存中。lead是下一段输出之前要加的左括号或分隔符
+        texts = []
+        lead = opening
+        get_encoder = encoders.get
+        if brackets == '{}' and isinstance(obj, ENCODE_MAPPINGS):
+            for key, value in obj.items():
+                encoder = get_encoder(key.__class__)
+                key_text = encode_item(key, level + 1) if encoder is None else encoder(key)
+                encoder = get_encoder(value.__class__)
+                text = encode_item(value, level + 1) if encoder is None else encoder(value)
+                if key_text is not None and text is not None:
+                    texts.append(key_text + ': ' + text)
+                    if len(texts) > ENCODE_CHUNK_ITEMS:
+                        yield lead + separator.join(texts)
+                        texts = []
+                        lead = separator
+                    continue
+                if texts:
+                    yield lead + separator.join(texts)
+                    texts = []
+                    lead = separator
+                if key_text is None:
+                    yield lead
+                    yield from encode_container(key, level + 1)
+                    lead = ': '
+                else:
+                    lead += key_text + ': '
+                if text is None:
+                    yield lead
+                    yield from encode_container(value, level + 1)
+                else:
+                    yield lead + text
+                lead = separator
+        else:
+            for item in obj:
+                encoder = get_encoder(item.__class__)
+                text = encode_item(item, level + 1) if encoder is None else encoder(item)
+                if text is not None:
+                    texts.append(text)
+                    if len(texts) > ENCODE_CHUNK_ITEMS:
+                        yield lead + separator.join(texts)
+                        texts = []
+                        lead = separator
+                    continue
+                if texts:
+                    yield lead + separator.join(texts)
+                    texts = []
+                    lead = separator
+                yield lead
+                yield from encode_container(item, level + 1)
+                lead = separator
+        if texts:
+            yield lead + separator.join(texts) + closing
+        else:
+            yield closing
+
+    def encode_value(obj):
+        text = encode_item(obj, 0)
+        if text is not None:
+            yield text
+        else:
+            yield from encode_container(obj, 0)
+
     return encode_value(obj)
 
+def encode(obj, indent=None, multi_line=False, ascii_only = False) -> str:
+    """
+    将Python对象编码为JSON字符串
+
+    参数:
+    obj: Python对象
+    indent: 缩进空格数,None表示不缩进
+    multi_line: 是否多行显示
+    ascii_only: 是否只显示ASCII字符
+    """
+    return ''.join(iterencode(obj, indent, multi_line, ascii_only))
+
+def encode_to(fp, obj, indent=None, multi_line=False, ascii_only=False, block_size=65536):
+    """
+    将Python对象编码后写入文本文件对象fp，其余参数与encode相同
+
+    编码结果攒满block_size个字符后调用一次fp.write，不会在内存中保留完整的输出
+    """
+    chunks = []
+    size = 0
+    for chunk in iterencode(obj, indent, multi_line, ascii_only):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= block_size:
+            fp.write(''.join(chunks))
+            chunks = []
+            size = 0
+    if chunks:
+        fp.write(''.join(chunks))
+
 
     
 from functools import wraps
@@ -1418,8 +3641,9 @@ if __name__ == "__main__":
 
     print(fJsonLexer().tokenize(text))
 
-    DEBUG = True
+    profile = DecodeProfile()
     try:
-        print(decode(text))
+        print(decode(text, hook=profile))
     except Exception as e:
-        print(e)
\ No newline at end of file
+        print(e)
+    print(profile.report())
\ No newline at end of file
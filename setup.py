@@ -9,7 +9,7 @@ readme_path = os.path.join(current_dir, 'readme-en.md')
 setup(
     name='simple-fjson',
     version='0.1.4',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
     description='A flexible JSON parser',
     long_description=open(readme_path, encoding='utf-8').read(),
     long_description_content_type='text/markdown',
@@ -0,0 +1,41 @@
+"""
+decode_batch: 每一项的结果与decode相同，输入按需读取
+"""
+import itertools
+
+import pytest
+
+from fJson import decode, decode_batch
+
+TEXTS = ['{a: %d, b: [1, 2]}' % i for i in range(200)] + ['[1, 2', 'abc', '"a" + 1']
+
+
+def expected(text):
+    try:
+        return decode(text), False
+    except Exception:
+        return None, True
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+@pytest.mark.parametrize('chunksize', [1, 7, 64])
+def test_results(ordered, chunksize):
+    results = list(decode_batch(TEXTS, workers=2, chunksize=chunksize, ordered=ordered))
+    if ordered:
+        assert [index for index, _, _ in results] == list(range(len(TEXTS)))
+    results.sort(key=lambda result: result[0])
+    assert [(value, error is not None) for _, value, error in results] == [expected(text) for text in TEXTS]
+
+
+def test_reads_on_demand():
+    # 同时交给进程池的最多为工作进程数的2倍块
+    read = []
+
+    def texts():
+        for i in itertools.count():
+            read.append(i)
+            yield '[%d]' % i
+
+    results = decode_batch(texts(), workers=2, chunksize=4)
+    assert [next(results) for _ in range(3)] == [(0, [0], None), (1, [1], None), (2, [2], None)]
+    assert len(read) <= 5 * 4
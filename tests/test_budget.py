@@ -0,0 +1,145 @@
+"""
+DecodeBudget: 各项限制在三种引擎、惰性求值、compile以及流式、文件、并行的解析中结果相同
+"""
+import random
+
+import pytest
+
+from fJson import (decode, compile, decode_file, decode_parallel, decode_batch, iterdecode, IncrementalDecoder,
+                   DecodeBudget, BudgetExceeded)
+from fJson.fjson import fJsonLexer
+
+ENGINES = ['builder', 'parser', 'stack']
+
+# (输入, 限制, 刚好不超出的值)
+LIMITS = [
+    ('[1, 2, {a: 3}]', 'max_tokens', 11),
+    ('[[1], {a: [2, (3)]}]', 'max_depth', 4),
+    ('([1, 2] * 3) + [4]', 'max_size', 7),
+    ('{a, b} * {1, 2, 3}', 'max_size', 6),
+    ('["abc", $"YQ==", \'de\']', 'max_string_bytes', 9),
+    ('[R"x(raw)x", """tri"""]', 'max_string_bytes', 6),
+]
+
+
+def outcome(function):
+    try:
+        return 'ok', function()
+    except BudgetExceeded as e:
+        return 'budget', e.limit, e.maximum, e.position
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('text, limit, maximum', LIMITS)
+def test_limits(engine, text, limit, maximum):
+    assert decode(text, engine=engine, budget=DecodeBudget(**{limit: maximum})) == decode(text)
+    with pytest.raises(BudgetExceeded) as info:
+        decode(text, engine=engine, budget=DecodeBudget(**{limit: maximum - 1}))
+    assert info.value.limit == limit and info.value.maximum == maximum - 1
+    # 其余引擎在同一处超出限制
+    budget = DecodeBudget(**{limit: maximum - 1})
+    assert outcome(lambda: decode(text, engine=engine, budget=budget)) == outcome(lambda: decode(text, budget=budget))
+
+
+def test_lazy():
+    # 惰性的视图按展开后的大小计算
+    budget = DecodeBudget(max_size=1000)
+    assert len(decode('[1] * 1000', lazy=True, budget=budget)) == 1000
+    for text in ('[1] * 1001', '"ab" * 501', '{1, 2, 3, 4, 5, 6, 7, 8} * {a, b, c, d, e, f, g, h} * {p, q, r, s, t, u, v, w} * {x, y}'):
+        for engine in ENGINES:
+            with pytest.raises(BudgetExceeded):
+                decode(text, engine=engine, lazy=True, budget=budget)
+    with pytest.raises(BudgetExceeded):
+        decode('([1] * 10) * 101', lazy=True, budget=budget)
+
+
+def test_compile():
+    with pytest.raises(BudgetExceeded):
+        compile('[1, 2, 3]', budget=DecodeBudget(max_tokens=6))
+    with pytest.raises(BudgetExceeded):
+        compile('[[[1]]]', budget=DecodeBudget(max_depth=2))
+    with pytest.raises(BudgetExceeded):
+        compile('["abcd"]', budget=DecodeBudget(max_string_bytes=3))
+    # 运算结果的大小在每次求值时检查
+    template = compile('([0] * n) + items', budget=DecodeBudget(max_size=10))
+    assert template.evaluate(n=8, items=[1, 2]) == [0] * 8 + [1, 2]
+    with pytest.raises(BudgetExceeded):
+        template.evaluate(n=11, items=[])
+    with pytest.raises(BudgetExceeded):
+        template.evaluate(n=9, items=[1, 2])
+    with pytest.raises(BudgetExceeded):
+        compile('[1] * 11', lazy=True, budget=DecodeBudget(max_size=10)).evaluate()
+
+
+def feed_all(text, budget, rng):
+    decoder = IncrementalDecoder(budget=budget)
+    values = []
+    offset = 0
+    while offset < len(text):
+        size = rng.choice([1, 2, 3, 7])
+        values.extend(decoder.feed(text[offset:offset + size]))
+        offset += size
+    return values + decoder.close()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental(seed):
+    # 每个顶层值分别计算，结果与单独decode这个值相同
+    rng = random.Random(seed)
+    for text, limit, maximum in LIMITS:
+        documents = [text, '1', text]
+        stream = ', '.join(documents)
+        budget = DecodeBudget(**{limit: maximum})
+        assert feed_all(stream, budget, rng) == [decode(document) for document in documents]
+        assert list(iterdecode(stream, block_size=3, budget=budget)) == [decode(document) for document in documents]
+        budget = DecodeBudget(**{limit: maximum - 1})
+        with pytest.raises(BudgetExceeded) as info:
+            feed_all(stream, budget, rng)
+        assert info.value.limit == limit
+        with pytest.raises(BudgetExceeded):
+            list(iterdecode(stream, block_size=5, budget=budget))
+
+
+def test_incremental_growing_value():
+    # 不断增长的值在接收文本时就超出限制，不必等到它结束
+    decoder = IncrementalDecoder(budget=DecodeBudget(max_string_bytes=100))
+    decoder.feed('[1, "')
+    with pytest.raises(BudgetExceeded):
+        for _ in range(20):
+            decoder.feed('x' * 10)
+    decoder = IncrementalDecoder(budget=DecodeBudget(max_tokens=100))
+    with pytest.raises(BudgetExceeded):
+        for _ in range(100):
+            decoder.feed('[1, 2, ')
+    decoder = IncrementalDecoder(budget=DecodeBudget(max_depth=50))
+    with pytest.raises(BudgetExceeded):
+        decoder.feed('[' * 51)
+
+
+def test_decode_file(tmp_path):
+    path = tmp_path / 'data.fjson'
+    path.write_bytes('{a: ["中文", [1]] * 3}'.encode('utf-8'))
+    assert decode_file(str(path), budget=DecodeBudget(max_size=6, max_depth=3)) == decode('{a: ["中文", [1]] * 3}')
+    for budget in (DecodeBudget(max_size=5), DecodeBudget(max_depth=2), DecodeBudget(max_tokens=10), DecodeBudget(max_string_bytes=1)):
+        with pytest.raises(BudgetExceeded):
+            decode_file(str(path), engine='stack', budget=budget)
+
+
+def test_decode_parallel():
+    # 每一段都不超出限制，但整个文本的总量超出时与decode相同
+    text = '[' + ', '.join('{id: %d, name: "item%d", tags: [x] * 3}' % (i, i) for i in range(400)) + ']'
+    value = decode(text)
+    tokens = len(list(fJsonLexer().iter_tokens(text)))
+    assert decode_parallel(text, workers=2, min_size=0, budget=DecodeBudget(max_tokens=tokens, max_size=3)) == value
+    for budget in (DecodeBudget(max_tokens=tokens - 1), DecodeBudget(max_string_bytes=5 * 400), DecodeBudget(max_depth=2),
+                   DecodeBudget(max_size=2)):
+        expected = outcome(lambda: decode(text, budget=budget))
+        assert expected[0] == 'budget'
+        assert outcome(lambda: decode_parallel(text, workers=2, min_size=0, budget=budget)) == expected
+
+
+def test_decode_batch():
+    results = list(decode_batch(['[1] * 3', '[1] * 30', '"abcdef"'], workers=1, budget=DecodeBudget(max_size=10, max_string_bytes=5)))
+    assert results[0] == (0, [1, 1, 1], None)
+    assert isinstance(results[1][2], BudgetExceeded) and results[1][2].limit == 'max_size'
+    assert isinstance(results[2][2], BudgetExceeded) and results[2][2].limit == 'max_string_bytes'
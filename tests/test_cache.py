@@ -0,0 +1,88 @@
+"""
+DecodeCache: 结果与decode相同，占用的内存按结果的大小计算，decode的参数是键的一部分
+"""
+import sys
+
+import pytest
+
+from fJson import decode, encode, iterencode, DecodeCache, DecodeBudget, BudgetExceeded, fJsonRepeatView
+from fJson.fjson import value_size, freeze_value
+
+
+@pytest.mark.parametrize('strategy', ['copy', 'freeze'])
+def test_hits(strategy):
+    cache = DecodeCache(strategy=strategy)
+    text = '{a: [1, 2], b: {x, y}}'
+    first = cache.decode(text)
+    second = cache.decode(text.encode('utf-8'))
+    assert first == (decode(text) if strategy == 'copy' else freeze_value(decode(text)))
+    assert cache.decode(text) == first and second == first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_copy_is_independent():
+    cache = DecodeCache()
+    value = cache.decode('{a: [1, 2]}')
+    value['a'].append(3)
+    assert cache.decode('{a: [1, 2]}') == {'a': [1, 2]}
+
+
+def test_max_bytes_counts_result():
+    # 很短的输入展开后很大，按结果的大小计入，超过上限时不缓存
+    text = '[1] * 100000'
+    assert value_size(decode(text)) > 100000 * 8
+    cache = DecodeCache(max_bytes=64 * 1024)
+    assert cache.decode(text) == [1] * 100000
+    assert len(cache) == 0 and cache.size == 0
+    cache.decode('[1, 2, 3]')
+    assert len(cache) == 1 and sys.getsizeof('[1, 2, 3]') < cache.size <= 64 * 1024
+
+
+def test_eviction():
+    cache = DecodeCache(max_entries=2)
+    for text in ('1', '2', '3', '1'):
+        cache.decode(text)
+    assert (len(cache), cache.evictions, cache.hits) == (2, 2, 0)
+
+
+def test_options_in_key():
+    cache = DecodeCache()
+    assert cache.decode('[1] * 3') == [1, 1, 1]
+    lazy = cache.decode('[1] * 3', lazy=True)
+    assert isinstance(lazy, fJsonRepeatView) and lazy == [1, 1, 1]
+    assert cache.decode('[1] * 3', json_first=True) == [1, 1, 1]
+    with pytest.raises(BudgetExceeded):
+        cache.decode('[1] * 3', budget=DecodeBudget(max_size=2))
+    assert cache.misses == 4 and cache.hits == 0
+    assert cache.decode('[1] * 3', budget=DecodeBudget(max_size=10)) == [1, 1, 1]
+    assert cache.decode('[1] * 3', budget=DecodeBudget(max_size=10)) == [1, 1, 1]
+    assert cache.hits == 1
+
+
+def test_lazy_views():
+    # 惰性视图保存的集合和列表同样被复制或冻结，修改返回值不影响缓存
+    cache = DecodeCache()
+    product = cache.decode('{a, b} * {1, 2}', lazy=True)
+    product.left.add('c')
+    assert cache.decode('{a, b} * {1, 2}', lazy=True) == decode('{a, b} * {1, 2}')
+    repeat = cache.decode('[[1], 2] * 3', lazy=True)
+    repeat.value[0].append(5)
+    assert cache.decode('[[1], 2] * 3', lazy=True) == [[1], 2] * 3
+
+    frozen = freeze_value(decode('{a, b} * {1, 2} * {x}', lazy=True))
+    assert isinstance(frozen.left, frozenset) and isinstance(frozen.right.right, frozenset)
+    assert frozen == decode('{a, b} * {1, 2} * {x}')
+    assert freeze_value(decode('[[1], 2] * 2', lazy=True)).value == ((1,), 2)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_encode_frozen(lazy):
+    # freeze策略的结果可以直接编码，字典和集合与未缓存的结果相同，列表编码为元组
+    cache = DecodeCache(strategy='freeze')
+    for text in ('{a: {1, 2}, b: {c: "x"}}', '[1, {a: [2]}]', '{a, b} * {1, 2}', '[{a: 1}] * 3'):
+        frozen = cache.decode(text, lazy=lazy)
+        for indent, multi_line in ((None, False), (2, True)):
+            encoded = encode(frozen, indent, multi_line)
+            assert ''.join(iterencode(frozen, indent, multi_line)) == encoded
+            assert freeze_value(decode(encoded)) == frozen
+    assert encode(cache.decode('{a: {1}, b: {c: "x"}}')) == encode(decode('{a: {1}, b: {c: "x"}}'))
@@ -0,0 +1,59 @@
+"""
+compile(): 绑定替换标识符，编译时计算的常量部分每次求值都返回新的副本
+"""
+import pytest
+
+from fJson import decode, compile
+
+
+def test_bindings():
+    template = compile('{role: assistant, id: n + 1, tags: [t, "x"], ok: n :> [1, 2]}')
+    assert template.names == {'assistant', 'n', 't'}
+    assert template.evaluate(n=1, t='y') == {'role': 'assistant', 'id': 2, 'tags': ['y', 'x'], 'ok': True}
+    assert template.evaluate(assistant='user', n=5) == {'role': 'user', 'id': 6, 'tags': ['t', 'x'], 'ok': False}
+
+
+def test_names_are_not_bound():
+    # 字典的键和--key的参数名与decode相同是名字本身，只替换值中的标识符
+    template = compile('{n: n, "m": [n]}')
+    assert template.names == {'n'}
+    assert template.evaluate(n=5) == {'n': 5, 'm': [5]}
+    assert compile('--n n m').evaluate(n=5, m=None) == {'n': [5, None]}
+    assert compile('{{a: b}: 1}').evaluate(a=1, b=2) == decode('{{a: b}: 1}')
+
+
+def test_bindings_are_not_modified():
+    # 绑定的值不会被运算修改，结果也不是绑定的对象本身
+    bound = {'k': 1}
+    items = [1]
+    template = compile('a + {x: 1}')
+    for _ in range(2):
+        result = template.evaluate(a=bound)
+        assert result == {'k': 1, 'x': 1} and result is not bound
+    assert bound == {'k': 1}
+    assert compile('{x: 1} + a').evaluate(a=bound) == {'x': 1, 'k': 1} and bound == {'k': 1}
+    assert compile('l + [2]').evaluate(l=items) == [1, 2] and items == [1]
+
+
+def test_constants_are_fresh():
+    # 不含可以被绑定的标识符的部分在编译时计算，修改某次的结果不影响之后的求值
+    for text in ('{"a": [1, 2], "b": {"c": [3]}, "d": "x"}', '[[1], {2}] * 2', '{"a": 1} + {"b": [2]}', '[1, 2]'):
+        template = compile(text)
+        first = template.evaluate()
+        assert first == decode(text)
+        if isinstance(first, dict):
+            first['a'] = None
+        else:
+            first[0] = None
+        assert template.evaluate() == decode(text)
+    value = compile('{"a": {"b": [1]}}').evaluate()
+    value['a']['b'].append(2)
+    assert compile('{"a": {"b": [1]}}').evaluate() == {'a': {'b': [1]}}
+
+
+def test_errors_at_evaluate():
+    # 与decode相同的异常在求值时抛出
+    template = compile('{"a": 1} + [x]')
+    for _ in range(2):
+        with pytest.raises(Exception):
+            template.evaluate()
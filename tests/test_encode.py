@@ -0,0 +1,176 @@
+"""
+encode: ascii_only的输出只含ASCII字符，decode后得到原来的值；iterencode、encode_to的输出与逐层拼接字符串的编码相同，
+按类型查表和按层缓存缩进的结果与逐个isinstance判断相同
+"""
+import io
+import base64
+import random
+from collections import OrderedDict
+
+import pytest
+
+from fJson import decode, encode, iterencode, encode_to, fJsonRepeatView
+from fJson.fjson import ASCII_ESCAPE_PATTERN, escape_ascii, escape_ascii_char
+
+# 反斜杠、引号、控制字符、U+007F~U+00FF、BMP内的其他字符、BMP以外的字符，以及形如转义序列的原文
+CHARS = ['a', ' ', '"', '\\', '\n', '\t', '\r', '\b', '\f', '\x00', '\x01', '\x1f', '\x7f', '\x80', 'é', 'ÿ',
+         'Ā', '中', '\ud7ff', '\ue000', '\uffff', '😀', '\U00010000', '\U0010ffff', '\\u0041', '\\x41', '\\U', '\\n', '/']
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_ascii_only_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        text = ''.join(rng.choice(CHARS) for _ in range(rng.randint(1, 12)))
+        encoded = encode(text, ascii_only=True)
+        assert encoded.isascii(), encoded
+        assert decode(encoded) == text and decode(encoded, engine='parser') == text, encoded
+        if not text.isascii():
+            # 交给json模块的结果与逐个替换的结果相同
+            assert escape_ascii(text) == '"' + ASCII_ESCAPE_PATTERN.sub(escape_ascii_char, text) + '"'
+
+
+def test_ascii_only_escapes():
+    assert encode('é\\"\n\t', ascii_only=True) == '"\\u00e9\\\\\\"\\n\\t"'
+    assert encode('\x7f中', ascii_only=True) == '"\\u007f\\u4e2d"'
+    assert encode('😀\r', ascii_only=True) == '"\\ud83d\\ude00\\u000d"'
+    value = {'键': ['值', '😀', {'ü': 'a\\b'}]}
+    encoded = encode(value, ascii_only=True)
+    assert encoded.isascii() and decode(encoded) == value
+
+
+def reference_encode(obj, indent=None, multi_line=False, level=0):
+    """
+    原来逐层递归拼接字符串的编码
+    """
+    if obj is None:
+        return 'null'
+    if obj is True:
+        return 'true'
+    if obj is False:
+        return 'false'
+    if isinstance(obj, (int, float)):
+        return str(obj)
+    if isinstance(obj, str):
+        return '"' + obj.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t') + '"'
+    if isinstance(obj, bytes):
+        return '$"' + base64.b64encode(obj).decode() + '"'
+    if isinstance(obj, dict):
+        items = [reference_encode(key, indent, multi_line, level + 1) + ': ' + reference_encode(value, indent, multi_line, level + 1)
+                 for key, value in obj.items()]
+        opening, closing = '{', '}'
+    else:
+        items = [reference_encode(item, indent, multi_line, level + 1) for item in obj]
+        opening, closing = {list: '[]', tuple: '()', set: '{}'}[next(cls for cls in (list, tuple, set) if isinstance(obj, cls))]
+    if not items:
+        return opening + closing
+    if isinstance(obj, tuple) and len(items) == 1:
+        return '(' + items[0] + ',)'
+    if multi_line and indent:
+        current = ' ' * (indent * level)
+        inner = current + ' ' * indent
+        return opening + '\n' + inner + (',\n' + inner).join(items) + '\n' + current + closing
+    return opening + ', '.join(items) + closing
+
+
+class Items(list):
+    pass
+
+
+def random_value(rng, depth=0):
+    if depth > 3 or rng.random() < 0.3:
+        return rng.choice([None, True, False, 0, -7, 2.5, 1e20, '', 'a"b\\c\n\t', '中文', b'\x00ab', 'x' * 50])
+    size = rng.choice([0, 1, 2, 5, 1100]) if depth == 0 else rng.choice([0, 1, 2, 3])
+    kind = rng.choice(['list', 'tuple', 'set', 'dict', 'ordered', 'items'])
+    if kind == 'set':
+        return set(range(size))
+    if kind in ('dict', 'ordered'):
+        items = [('k%d' % i if rng.random() < 0.8 else i, random_value(rng, depth + 1)) for i in range(size)]
+        return dict(items) if kind == 'dict' else OrderedDict(items)
+    items = [random_value(rng, depth + 1) for _ in range(size)]
+    return {'list': list, 'tuple': tuple, 'items': Items}[kind](items)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_iterencode(seed):
+    # 逐段生成的结果拼接后与encode、原来的编码相同，超过ENCODE_CHUNK_ITEMS项的容器分成多段生成
+    rng = random.Random(seed)
+    for _ in range(20):
+        value = random_value(rng)
+        for indent, multi_line in ((None, False), (2, False), (2, True), (4, True)):
+            expected = reference_encode(value, indent, multi_line)
+            assert encode(value, indent, multi_line) == expected
+            chunks = list(iterencode(value, indent, multi_line))
+            assert ''.join(chunks) == expected
+            fp = io.StringIO()
+            encode_to(fp, value, indent, multi_line, block_size=rng.choice([1, 100, 65536]))
+            assert fp.getvalue() == expected
+    assert len(list(iterencode(list(range(5000))))) > 1
+
+
+def test_encode_to_writes():
+    # 输出攒满block_size后才写入一次
+    class Writer:
+        def __init__(self):
+            self.writes = []
+
+        def write(self, text):
+            self.writes.append(text)
+
+    value = [{'id': i, 'name': 'x' * 20} for i in range(3000)]
+    writer = Writer()
+    encode_to(writer, value, block_size=4096)
+    assert ''.join(writer.writes) == encode(value)
+    assert len(writer.writes) > 1 and all(len(text) >= 4096 for text in writer.writes[:-1])
+
+
+def test_invalid_value():
+    for value in ([1, object()], {'a': {1: 1j}}):
+        with pytest.raises(Exception):
+            encode(value)
+        with pytest.raises(Exception):
+            encode_to(io.StringIO(), value)
+
+
+class Number(int):
+    pass
+
+
+class Real(float):
+    pass
+
+
+class Text(str):
+    pass
+
+
+class Data(bytes):
+    pass
+
+
+class Mapping(dict):
+    pass
+
+
+def test_subclasses():
+    # 不在类型表中的子类走isinstance判断，结果与原来的编码相同
+    value = Mapping({Text('k'): [Number(3), Real(1.5), Text('a"b'), Data(b'xy'), Items([Number(1)]), (Text('t'),), {Number(2)}]})
+    for indent, multi_line in ((None, False), (2, True)):
+        assert encode(value, indent, multi_line) == reference_encode(value, indent, multi_line)
+    assert encode([True, False, 1, 0]) == '[true, false, 1, 0]'
+    assert encode(fJsonRepeatView('ab', 3)) == '"ababab"' and encode(fJsonRepeatView([1], 2)) == '[1, 1]'
+
+
+def test_indent_cache():
+    # 每次编码按自己的indent生成各层的缩进，交替使用不同的indent、更深的嵌套结果都不受之前的影响
+    value = [1]
+    for _ in range(8):
+        value = [value, {'k': value}]
+    for indent in (2, 4, 2, 1, 3):
+        expected = reference_encode(value, indent, True)
+        assert encode(value, indent, True) == expected
+        assert ''.join(iterencode(value, indent, True)) == expected
+    generator = iterencode(value, 4, True)
+    first = next(generator)
+    assert encode(value, 2, True) == reference_encode(value, 2, True)
+    assert first + ''.join(generator) == reference_encode(value, 4, True)
@@ -0,0 +1,87 @@
+"""
+各个解析引擎的一致性: builder(匹配器级联)、parser、stack以及compile()不给绑定时的求值结果相同，
+builder抛出异常的输入其余引擎也抛出异常
+"""
+import random
+
+import pytest
+
+from fJson import decode, compile
+
+CASES = [
+    '1', '-1', '1.5', '-2.5e3', '1e5', 'true', 'FaLsE', 'null', 'None', 'abc', '"str"', "'s'", '“全角”',
+    '"""tri"ple"""', "'''x'''", 'R"d(multi\nline)d"', '$"YWJj"', '"a\\nb\\t\\"c\\\\d\\u4e2d\\q"',
+    '{}', '[]', '()', '{a: 1}', '{"a": 1, b: [1, 2, 3], c: (4, 5), d: {6, 7}}', '{1,2,}', '[1, , 2,]', '(1,)',
+    '1, 2', 'a; b; c', '(a)', '(null)', '(1, 2)', '--key value --k2 v1 v2 --flag', '--a 1, --b 2',
+    '"Ja" + "ne"', '1 + 2 + 3', '[1] + [2]', '{a:1} + {b:2}', '{1} + {2}', '$"YQ==" + $"Yg=="',
+    '2 * 3 + 4', '[1, 2] * [3, 4]', '[1, 2] / [2, 4]', '[1, 2] * 3', '"ab" * 2', '{A,B} * {1,2}', '6 / 4',
+    'A :> [A, B]', '"a" :> "abc"', '(A :> [A,B]) ? 1 : 2', 'false ? 1 : 2', 'x : int := 5 + 3', 'a = b = c',
+    'A(A=B,C)', 'f()', 'f(x, y)', 'a.b.c', 'a.b(c)', 'f(x).y', 'x |> f |> g', '(a)(b)', '()(b)',
+    '{a: x ? 1 : 2}', '{a: (true ? 1 : 2)}', '[1, 2', '{a: 1}}', '[1)', 'a b', '-', '.', 'a.',
+    '/* c */ 1 // x', '', '[-1, - 2, 3 - 4]', '[{}]', '{a: {}}', '[[[[1]]]]', '((((1))))', '{null: 1}',
+    '{(1,2): 3}', '{[1]: 2}', '{a: 1, b}', '"a" "b"', '"a" + 1', '{1} * 2', '$"!!"', '(a, b) -> (c, d)',
+    'a.b.c(d)(e).f', '--a --', '[a b]',
+    # 字典的一项中第一个顶层冒号之后的冒号都被忽略
+    '{-3: 1:}', '{a: 1 :}', '{a: x:int:=5}', '{a: :}', '{a: : 1}', '{a: 1 : + : 2}', '{a: {b: 1:}:}',
+    '[{a: 1:}]', '{a: f: (1)}', '{a: true ? 1 : 2}', '{a: :, b: 1}', '{a: "s" : * : 2}',
+]
+
+ATOMS = ['1', '-3', '1.5', 'a', 'true', 'null', '"s"', '$"YQ=="', '{}', '[]', '()']
+OPERATORS = ['+', '*', '/', ':>', '=', '|>', '?', ':', ',', ';', '.', '->', ':=', '--', '-']
+
+
+def random_document(rng, depth=0):
+    parts = []
+    count = rng.randint(1, 4)
+    for i in range(count):
+        if depth > 3 or rng.random() < 0.45:
+            parts.append(rng.choice(ATOMS))
+        else:
+            opening, closing = rng.choice([('[', ']'), ('{', '}'), ('(', ')')])
+            parts.append(opening + random_document(rng, depth + 1) + closing)
+        if i < count - 1 and rng.random() < 0.6:
+            parts.append(rng.choice(OPERATORS))
+    return ' '.join(parts)
+
+
+def outcome(function, text):
+    try:
+        return 'ok', function(text)
+    except Exception:
+        return 'error', None
+
+
+def check_engines(text):
+    expected = outcome(decode, text)
+    for name, function in (('parser', lambda t: decode(t, engine='parser')),
+                           ('stack', lambda t: decode(t, engine='stack')),
+                           ('compile', lambda t: compile(t).evaluate())):
+        assert outcome(function, text) == expected, (name, text)
+
+
+@pytest.mark.parametrize('text', CASES)
+def test_cases(text):
+    check_engines(text)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_random_documents(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        check_engines(random_document(rng))
+
+
+def test_colon_rule():
+    assert decode('{-3: 1:}') == {'-3': 1}
+    assert decode('{a: 1 : + : 2}', engine='parser') == {'a': 3}
+    with pytest.raises(Exception):
+        decode('{a: x:int:=5}', engine='stack')
+
+
+def test_deep_nesting():
+    # 递归引擎超出递归深度限制，stack引擎不受限制
+    text = '[' * 5000 + '1' + ']' * 5000
+    value = decode(text, engine='stack')
+    for _ in range(5000):
+        value, = value
+    assert value == 1
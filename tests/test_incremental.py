@@ -0,0 +1,98 @@
+"""
+IncrementalDecoder和iterdecode: 任意切分输入得到的顶层值与decode的结果相同
+"""
+import io
+import random
+
+import pytest
+
+from fJson import decode, IncrementalDecoder, iterdecode
+
+# 每一项都是单个顶层值，其中的逗号、分号都在括号或字符串内
+DOCUMENTS = [
+    '{role: assistant, content: "a, b; c", id: 12}',
+    '[1, 2.5, -3, 1e5, .5, true, null]',
+    '// comment, with comma\n{a: [1, 2], b: {x, y}}',
+    '/* block; comment */ "str\\"ing, with \\\\ escapes"',
+    'R"code(def f(x):\n    return [x, "y"]  # ; ,\n)code"',
+    '"""triple "quoted", text"""',
+    "'''single; quoted'''",
+    '$"YWJj"',
+    '{name: "svc" + "-1", replicas: 3 * 2, ok: 1 :> [1, 2]}',
+    '(--name svc --port 8080 --hosts "a" "b")',
+    'f(x, y).z',
+    '-42',
+    '{a: {b: {c: [1, [2, [3, "]"]]]}}}',
+    '“全角, 引号”',
+]
+
+
+def random_chunks(text, rng):
+    chunks = []
+    offset = 0
+    while offset < len(text):
+        size = rng.choice([1, 1, 2, 3, 5, 8, 40])
+        chunks.append(text[offset:offset + size])
+        offset += size
+    return chunks
+
+
+def feed_all(chunks, rng):
+    decoder = IncrementalDecoder()
+    values = []
+    for chunk in chunks:
+        values.extend(decoder.feed(chunk))
+        if rng.random() < 0.2:
+            decoder.partial()
+    return values + decoder.close()
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_random_chunks(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        documents = rng.sample(DOCUMENTS, rng.randint(1, 5))
+        text = rng.choice([', ', '; ', ',', ';\n']).join(documents)
+        expected = [decode(document) for document in documents]
+        assert feed_all(random_chunks(text, rng), rng) == expected, text
+        if len(documents) > 1 and ';' not in text:
+            assert tuple(expected) == decode(text)
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_single_value(document):
+    rng = random.Random(0)
+    assert feed_all(random_chunks(document, rng), rng) == [decode(document)]
+
+
+def test_partial():
+    decoder = IncrementalDecoder()
+    assert decoder.feed('[{a: 1}, {b: "tw') == []
+    assert decoder.partial() == [{'a': 1}, {'b': 'tw'}]
+    assert decoder.feed('o"}], 5') == [[{'a': 1}, {'b': 'two'}]]
+    assert decoder.close() == [5]
+
+
+def test_iterdecode_text_and_file():
+    text = ', '.join(DOCUMENTS)
+    expected = [decode(document) for document in DOCUMENTS]
+    assert list(iterdecode(text, block_size=7)) == expected
+    assert list(iterdecode(io.StringIO(text), block_size=5)) == expected
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'utf-16', 'utf-32'])
+def test_iterdecode_binary(encoding):
+    # 二进制文件按BOM判断编码，多字节字符可以跨越两个块
+    documents = ['{a: "中文😀"}', '[é, "ü"]', 'R"x(ß, ø)x"']
+    data = ', '.join(documents).encode(encoding)
+    expected = [decode(document) for document in documents]
+    for block_size in (1, 2, 3, 7, 64):
+        assert list(iterdecode(io.BytesIO(data), block_size=block_size)) == expected
+        assert list(iterdecode(data, block_size=block_size)) == expected
+
+
+def test_mixed_input():
+    decoder = IncrementalDecoder()
+    decoder.feed(b'[1')
+    with pytest.raises(TypeError):
+        decoder.feed('2]')
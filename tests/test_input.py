@@ -0,0 +1,101 @@
+"""
+decode_file和bytes、bytearray、memoryview输入: 结果与先解码为str再decode相同，编码按BOM判断
+"""
+import codecs
+
+import pytest
+
+from fJson import decode, decode_file
+from fJson.fjson import fJsonLexer
+
+ENGINES = ['builder', 'parser', 'stack']
+
+DOCUMENTS = [
+    '{role: assistant, content: "中文, 😀", id: -12}',
+    '// 注释\n[1, 2.5, "\\u4e2d", R"x(原文 "x")x", $"YQ=="]',
+    '{name: "服务" + "-1", tags: ["é"] * 3, ok: 1 :> [1, 2]}',
+    '(--名字 svc --port 8080)',
+    '"""三引号 "x" """',
+    '1',
+    '',
+]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'utf-16', 'utf-32'])
+def test_decode_file(tmp_path, engine, encoding):
+    path = tmp_path / 'data.fjson'
+    for text in DOCUMENTS:
+        path.write_bytes(text.encode(encoding))
+        assert decode_file(str(path), engine=engine) == decode(text), text
+        assert decode_file(str(path), engine=engine, lazy=True) == decode(text, lazy=True), text
+
+
+def test_decode_file_large(tmp_path):
+    # 跨越多个页的文件
+    text = '[' + ', '.join('{id: %d, name: "%s", tags: [x, y] * 2}' % (i, '名字' * 200) for i in range(200)) + ']'
+    path = tmp_path / 'large.fjson'
+    path.write_bytes(text.encode('utf-8'))
+    assert len(text.encode('utf-8')) > 1 << 16
+    for engine in ENGINES:
+        assert decode_file(str(path), engine=engine) == decode(text)
+
+
+def test_decode_file_errors(tmp_path):
+    # 解析失败时抛出与decode相同的异常，文件在之后仍可以改写
+    path = tmp_path / 'bad.fjson'
+    for text in ('[1, 2', '{a: "中文"', '[1] * {a}'):
+        path.write_bytes(text.encode('utf-8'))
+        with pytest.raises(Exception) as expected:
+            decode(text)
+        with pytest.raises(Exception) as info:
+            decode_file(str(path))
+        assert type(info.value) is type(expected.value)
+        path.write_bytes(b'[1]')
+        assert decode_file(str(path)) == [1]
+
+
+# 各种编码和BOM，UTF-16、UTF-32总是带BOM
+ENCODINGS = [
+    lambda text: text.encode('utf-8'),
+    lambda text: codecs.BOM_UTF8 + text.encode('utf-8'),
+    lambda text: codecs.BOM_UTF16_LE + text.encode('utf-16-le'),
+    lambda text: codecs.BOM_UTF16_BE + text.encode('utf-16-be'),
+    lambda text: codecs.BOM_UTF32_LE + text.encode('utf-32-le'),
+    lambda text: codecs.BOM_UTF32_BE + text.encode('utf-32-be'),
+]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('encode', ENCODINGS)
+def test_bytes_input(engine, encode):
+    for text in DOCUMENTS:
+        data = encode(text)
+        expected = decode(text)
+        for source in (data, bytearray(data), memoryview(data), memoryview(b'xx' + data + b'yy')[2:-2]):
+            assert decode(source, engine=engine) == expected, (text, source)
+            assert decode(source, engine=engine, lazy=True) == decode(text, lazy=True), (text, source)
+
+
+def test_bytes_tokens():
+    # UTF-8输入的token位置是字节偏移，文本与解析str时相同
+    lexer = fJsonLexer()
+    for text in DOCUMENTS:
+        expected = list(lexer.tokenize(text))
+        for prefix in (b'', codecs.BOM_UTF8):
+            tokens = list(lexer.tokenize(prefix + text.encode('utf-8')))
+            assert [(token['type'], token['token']) for token in tokens] == [(token['type'], token['token']) for token in expected]
+            assert [token['position'] for token in tokens] == \
+                [len(prefix) + len(text[:token['position']].encode('utf-8')) for token in expected]
+
+
+def test_bytes_errors():
+    for text in ('[1, 2', '{a: "中文"', '[1] * {a}'):
+        with pytest.raises(Exception) as expected:
+            decode(text)
+        for source in (text.encode('utf-8'), bytearray(text.encode('utf-16')), memoryview(text.encode('utf-8'))):
+            with pytest.raises(Exception) as info:
+                decode(source)
+            assert type(info.value) is type(expected.value)
+    with pytest.raises(UnicodeDecodeError):
+        decode(b'["\xff"]')
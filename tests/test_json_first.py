@@ -0,0 +1,73 @@
+"""
+decode(json_first=True): 标准JSON的结果与json.loads相同，与不使用json_first时的结果也相同；
+{}、\\/、\\b、\\f、\\r这些两者结果不同的写法按fJson语法解析
+"""
+import json
+import random
+
+import pytest
+
+from fJson import decode
+
+# 不含两者结果不同的转义
+CHARACTERS = ['a', 'é', '😀', '\\n', '\\t', '\\\\', '\\"', '\\u00e9', '\\ud83d\\ude00', '//', ',', ':', ' ', "'", '“']
+
+
+def random_json(rng, depth=0):
+    choice = rng.random()
+    if depth > 4 or choice < 0.4:
+        return rng.choice([
+            lambda: str(rng.randint(-10 ** 20, 10 ** 20)),
+            lambda: repr(rng.uniform(-1e6, 1e6)),
+            lambda: '1e5',
+            lambda: '"' + ''.join(rng.choice(CHARACTERS) for _ in range(rng.randint(0, 5))) + '"',
+            lambda: rng.choice(['true', 'false', 'null']),
+        ])()
+    space = lambda: rng.choice(['', ' ', '\n  '])
+    if choice < 0.7:
+        return '[' + space() + (',' + space()).join(random_json(rng, depth + 1) for _ in range(rng.randint(0, 4))) + space() + ']'
+    # 空字典在fJson中是{None}，至少有一项
+    return '{' + space() + (',' + space()).join('"%s"%s:%s%s' % (rng.choice(['a', 'b', 'k é', '']), space(), space(), random_json(rng, depth + 1))
+                                                for _ in range(rng.randint(1, 4))) + space() + '}'
+
+
+def same(a, b):
+    # 类型也必须相同，字典还要求键的顺序相同
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(same, a, b))
+    return a == b
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_strict_json(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = random_json(rng)
+        expected = json.loads(text)
+        for data in (text, text.encode('utf-8'), b'\xef\xbb\xbf' + text.encode('utf-8')):
+            assert same(decode(data, json_first=True), expected), text
+            assert same(decode(data), expected), text
+
+
+@pytest.mark.parametrize('text', ['{}', '{"a": {}}', '[{}, 1]', '"a\\/b"', '"\\b\\f\\r"', '["x", "\\/"]'])
+def test_differences_use_fjson(text):
+    # 这些写法json.loads和fJson的结果不同，json_first时仍与fJson相同
+    assert not same(json.loads(text), decode(text))
+    assert same(decode(text, json_first=True), decode(text))
+
+
+@pytest.mark.parametrize('text', ['{a: 1}', '[1, 2,]', '// c\n[1]', '[1] + [2]', '"a" "b"', 'NaN', '[1, 2', '{"a": 1} x'])
+def test_fallback(text):
+    try:
+        expected = 'ok', decode(text)
+    except Exception:
+        expected = 'error', None
+    try:
+        actual = 'ok', decode(text, json_first=True)
+    except Exception:
+        actual = 'error', None
+    assert actual[0] == expected[0] and same(actual[1], expected[1]), text
@@ -0,0 +1,69 @@
+"""
+lazy模式: fJsonRepeatView、fJsonProductView的长度、下标、切片、迭代和in与立即计算的结果相同
+"""
+import pytest
+
+from fJson import decode, fJsonRepeatView, fJsonProductView
+
+ENGINES = ['builder', 'parser', 'stack']
+
+REPEATS = ['[1, [2]] * 3', '3 * [1, 2]', '"abc" * 4', '$"YWJj" * 2', '[1] * 0', '"ab" * -1', '([1] * 2) * 3', '"中" * 5']
+PRODUCTS = ['{a, b} * {1, 2, 3}', '{a, b} * {1, 2} * {x, y}', '{} * {1}', '{1} * {}']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('text', REPEATS)
+def test_repeat_view(engine, text):
+    view = decode(text, engine=engine, lazy=True)
+    eager = decode(text)
+    assert isinstance(view, fJsonRepeatView)
+    assert view == eager and eager == view and not view != eager
+    assert view.materialize() == eager and type(view.materialize()) is type(eager)
+    assert len(view) == len(eager)
+    assert list(view) == list(eager)
+    for index in range(-len(eager), len(eager)):
+        assert view[index] == eager[index]
+    for index in (len(eager), -len(eager) - 1):
+        with pytest.raises(IndexError):
+            view[index]
+    for start in (None, 0, 1, -2):
+        for stop in (None, 2, -1, 100):
+            for step in (None, 1, 2, -1, -3):
+                assert view[start:stop:step] == eager[start:stop:step]
+    for item in list(eager[:3]) + [eager[1:4], eager[-3:], 'x', 9, [2]]:
+        if isinstance(eager, (str, bytes)) and not isinstance(item, eager.__class__):
+            continue
+        assert (item in view) == (item in eager), item
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('text', PRODUCTS)
+def test_product_view(engine, text):
+    view = decode(text, engine=engine, lazy=True)
+    eager = decode(text)
+    assert isinstance(view, fJsonProductView)
+    assert view == eager and eager == view
+    assert view.materialize() == eager
+    assert len(view) == len(eager)
+    items = list(view)
+    assert len(items) == len(eager) and set(items) == eager
+    # 下标按迭代的顺序编号
+    assert [view[index] for index in range(len(view))] == items
+    assert [view[index] for index in range(-len(view), 0)] == items
+    assert view[1::2] == items[1::2] and view[::-1] == items[::-1]
+    with pytest.raises(IndexError):
+        view[len(view)]
+    for item in items:
+        assert item in view
+    for item in (('c', 1), ('a',), 'a', ('a', 1, 2)):
+        assert (item in view) == (item in eager)
+    # 集合运算的结果为普通集合
+    assert view & eager == eager and isinstance(view | set(), set)
+
+
+def test_nested_views():
+    # 容器中的视图与立即计算的结果相等
+    for engine in ENGINES:
+        value = decode('{a: [1] * 2, b: ["x" * 3, {1} * {2}]}', engine=engine, lazy=True)
+        assert value == decode('{a: [1] * 2, b: ["x" * 3, {1} * {2}]}')
+        assert isinstance(value['a'], fJsonRepeatView) and isinstance(value['b'][1], fJsonProductView)
@@ -0,0 +1,165 @@
+"""
+fJsonLexer: 主正则分析的token与原来逐字符分析的结果相同，字符串字面量分段读取的结果与逐字符读取相同，
+iter_tokens与tokenize之后依次去掉注释、合并负数的结果相同
+"""
+import random
+
+import pytest
+
+from fJson.fjson import fJsonLexer, fJsonTokenStream, fJsonTokenType, decode_escape, scan_literal, LITERAL_TERMINATORS
+
+# (输入, 原来逐字符的tokenize得到的(类型, 文本, 位置))
+TOKENS = [
+    ('a1 12abc 1.5.6 .5 5. a.5 1e5 1E+5 x-1', [('IDENTIFIER', 'a1', 0), ('NUMBER', '12', 3), ('IDENTIFIER', 'abc', 5), ('NUMBER', '1.5', 9), ('NUMBER', '.6', 12), ('NUMBER', '.5', 15), ('NUMBER', '5', 18), ('SYMBOL', '.', 19), ('IDENTIFIER', 'a', 21), ('NUMBER', '.5', 22), ('NUMBER', '1e5', 25), ('NUMBER', '1E+5', 29), ('IDENTIFIER', 'x', 34), ('SYMBOL', '-', 35), ('NUMBER', '1', 36)]),
+    ('fooR"x" R"d(a)d" $"YQ==" a$"x"', [('IDENTIFIER', 'fooR', 0), ('STRING', 'x', 4), ('STRING', 'a', 8), ('BASE64', 'YQ==', 17), ('IDENTIFIER', 'a$', 25), ('STRING', 'x', 27)]),
+    ('/* a */ // b\n c', [('COMMENT', ' a ', 0), ('COMMENT', ' b', 8), ('IDENTIFIER', 'c', 14)]),
+    ('ab“cd” “x” ”y', [('IDENTIFIER', 'ab“cd”', 0), ('STRING', 'x', 7), ('IDENTIFIER', '”y', 11)]),
+    ('::: :=> |>> <|| ->- ++ -- --- ** \\ % ^ ~ ! & && ||| ?= ?', [('SYMBOL', '::', 0), ('SYMBOL', ':', 2), ('SYMBOL', ':=', 4), ('SYMBOL', '>', 6), ('SYMBOL', '|>', 8), ('SYMBOL', '>', 10), ('SYMBOL', '<|', 12), ('SYMBOL', '|', 14), ('SYMBOL', '->', 16), ('SYMBOL', '-', 18), ('SYMBOL', '++', 20), ('SYMBOL', '--', 23), ('SYMBOL', '--', 26), ('SYMBOL', '-', 28), ('SYMBOL', '*', 30), ('SYMBOL', '*', 31), ('SYMBOL', '\\', 33), ('SYMBOL', '%', 35), ('SYMBOL', '^', 37), ('SYMBOL', '~', 39), ('SYMBOL', '!', 41), ('SYMBOL', '&', 43), ('SYMBOL', '&&', 45), ('SYMBOL', '||', 48), ('SYMBOL', '|', 50), ('SYMBOL', '?=', 52), ('SYMBOL', '?', 55)]),
+    ('"a\\"b" \'a\\\'b\' \'a\\"b\'', [('STRING', 'a"b', 0), ('STRING', "a'b", 7), ('STRING', 'a\\"b', 14)]),
+    ('"""a""b""" \'\'\'c\'\'\'', [('STRING', 'a""b', 0), ('STRING', 'c', 11)]),
+    ('x\ty\r\nz', [('IDENTIFIER', 'x', 0), ('IDENTIFIER', 'y', 2), ('IDENTIFIER', 'z', 5)]),
+    ("don't", [('IDENTIFIER', 'don', 0)]),
+    ('"\\u4e2d\\u00e9\\q"', [('STRING', '中é\\q', 0)]),
+    ('{a:-1,b:[+2]}', [('SYMBOL', '{', 0), ('IDENTIFIER', 'a', 1), ('SYMBOL', ':', 2), ('SYMBOL', '-', 3), ('NUMBER', '1', 4), ('SYMBOL', ',', 5), ('IDENTIFIER', 'b', 6), ('SYMBOL', ':', 7), ('SYMBOL', '[', 8), ('SYMBOL', '+', 9), ('NUMBER', '2', 10), ('SYMBOL', ']', 11), ('SYMBOL', '}', 12)]),
+    ('--name svc -3 - 4 (-5) a-6', [('SYMBOL', '--', 0), ('IDENTIFIER', 'name', 2), ('IDENTIFIER', 'svc', 7), ('SYMBOL', '-', 11), ('NUMBER', '3', 12), ('SYMBOL', '-', 14), ('NUMBER', '4', 16), ('SYMBOL', '(', 18), ('SYMBOL', '-', 19), ('NUMBER', '5', 20), ('SYMBOL', ')', 21), ('IDENTIFIER', 'a', 23), ('SYMBOL', '-', 24), ('NUMBER', '6', 25)]),
+    ('"unterminated', []),
+    ('a /* unterminated', [('IDENTIFIER', 'a', 0), ('COMMENT', ' unterminated', 2)]),
+]
+
+
+def token_tuples(tokens):
+    return [(token['type'], token['token'], token['position']) for token in tokens]
+
+
+@pytest.mark.parametrize('text, expected', TOKENS)
+def test_tokenize(text, expected):
+    assert token_tuples(fJsonLexer().tokenize(text)) == expected
+    # UTF-8输入的位置是字节偏移，类型和文本相同
+    tokens = token_tuples(fJsonLexer().tokenize(text.encode('utf-8')))
+    assert [token[:2] for token in tokens] == [token[:2] for token in expected]
+    assert [position for _, _, position in tokens] == [len(text[:position].encode('utf-8')) for _, _, position in expected]
+
+
+def reference_literal(text, opener):
+    """
+    逐字符读取text开头以opener开头的字符串字面量，返回(转义后的文本, 字面量之后的位置)，未闭合时返回None
+    """
+    if opener == 'R"':
+        paren = text.find('(')
+        if paren < 0:
+            return None
+        terminator, quote, position = ')' + text[2:paren] + '"', '"', paren + 1
+    else:
+        (terminator, quote), position = LITERAL_TERMINATORS[opener], len(opener)
+    hex_digits = '0123456789abcdefABCDEF'
+
+    def hex4(offset):
+        digits = text[offset:offset + 4]
+        return len(digits) == 4 and all(char in hex_digits for char in digits)
+
+    result = ''
+    while position < len(text):
+        if text.startswith(terminator, position):
+            return result, position + len(terminator)
+        char = text[position]
+        if char != '\\':
+            result += char
+            position += 1
+            continue
+        if position + 1 >= len(text):
+            return None
+        char = text[position + 1]
+        if char == 'n':
+            result += '\n'
+        elif char == 't':
+            result += '\t'
+        elif char == quote or char == '\\':
+            result += char
+        elif char == 'u' and hex4(position + 2):
+            code = int(text[position + 2:position + 6], 16)
+            low = int(text[position + 8:position + 12], 16) if text.startswith('\\u', position + 6) and hex4(position + 8) else 0
+            if 0xD800 <= code < 0xDC00 and 0xDC00 <= low < 0xE000:
+                result += chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+                position += 6
+            else:
+                result += chr(code)
+            position += 4
+        else:
+            result += '\\' + char
+        position += 2
+    return None
+
+
+# 转义序列、结束符的片段和多字节字符
+PIECES = ['a', ' ', '中', '😀', '\\', '\\n', '\\t', '\\"', "\\'", '\\\\', '\\q', '\\u0041', '\\u4E2d', '\\ud83d\\ude00',
+          '\\ud83d', '\\ude00', '\\u12', '\\u00zz', '"', "'", '""', "''", '”', '\\”', '\\“', ')', ')x', ')x"', '\\)x"']
+OPENERS = ['"', "'", '"""', "'''", '“', '$"', 'R"x(', 'R"(']
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_scan_literal(seed):
+    # find/join的分段读取与逐字符读取得到相同的文本和结尾，UTF-8字节输入也相同
+    rng = random.Random(seed)
+    for _ in range(400):
+        prefix = rng.choice(OPENERS)
+        opener = 'R"' if prefix.startswith('R"') else prefix
+        text = prefix + ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 8))) + rng.choice(['', prefix[-1], ')x"', '”'])
+        expected = reference_literal(text, opener)
+        for source in (text, text.encode('utf-8')):
+            literal = scan_literal(source, 0, opener if source.__class__ is str else opener.encode('utf-8'))
+            if expected is None:
+                assert literal is None, text
+                continue
+            start, end, string, after = literal
+            if string is None:
+                string = source[start:end]
+                string = string if string.__class__ is str else string.decode('utf-8')
+            assert string == expected[0], text
+            assert after == len(text[:expected[1]].encode('utf-8') if source.__class__ is bytes else text[:expected[1]]), text
+
+
+def test_decode_escape():
+    assert decode_escape('\\n', 0, '"') == ('\n', 2)
+    assert decode_escape('a\\"b', 1, '"') == ('"', 3)
+    assert decode_escape("\\'", 0, '"') == ("\\'", 2)
+    assert decode_escape('\\u4e2dx', 0, '"') == ('中', 6)
+    # 相邻的代理对合并为一个字符，单独的代理解码为代理字符本身，不合法的\\u保持原样
+    assert decode_escape('\\ud83d\\ude00', 0, '"') == ('😀', 12)
+    assert decode_escape('\\ud83d\\u0041', 0, '"') == ('\ud83d', 6)
+    assert decode_escape('\\u12g4', 0, '"') == ('\\u', 2)
+
+
+# 负号、注释、运算符和各种字面量的片段
+FRAGMENTS = ['-', '-', ' ', '\n', '1', '2.5', '.5', '1e3', 'a', 'x1', '[', ']', '(', ')', '{', '}', ',', ':', '+', '*', '--', '->',
+             '/* c */', '// c\n', '"s"', '"\\u0041"', "'t'", '$"YQ=="', 'R"d(-1)d"', '中']
+
+
+def iter_tuples(text, **options):
+    lexer = fJsonLexer()
+    return token_tuples(fJsonTokenStream(text).extend(lexer.iter_tokens(text, **options)))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_iter_tokens(seed):
+    # 合并在一次遍历中的结果与分步处理的token流相同
+    rng = random.Random(seed)
+    lexer = fJsonLexer()
+    for _ in range(500):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 12)))
+        tokens = lexer.tokenize(text)
+        assert iter_tuples(text) == token_tuples(lexer.concat_negative_number(lexer.reject_comments(tokens))), text
+        assert iter_tuples(text, comments=True, merge_negative=False) == token_tuples(tokens), text
+        assert iter_tuples(text, merge_negative=False) == token_tuples(lexer.reject_comments(tokens)), text
+
+
+def test_iter_tokens_negative():
+    assert iter_tuples('[-1, - /* c */ 2]') == [('SYMBOL', '[', 0), ('NUMBER', '-1', 1), ('SYMBOL', ',', 3), ('NUMBER', '-2', 5),
+                                              ('SYMBOL', ']', 16)]
+    # 负号与数字之间的注释保留在负数之后
+    assert iter_tuples('(- // c\n3)', comments=True) == [('SYMBOL', '(', 0), ('NUMBER', '-3', 1), ('COMMENT', ' c', 3),
+                                                         ('SYMBOL', ')', 9)]
+    # 接着之前的文本分析时，由上一个token的类型判断开头的'-'能否合并
+    lexer = fJsonLexer()
+    assert [token[:4] for token in lexer.iter_tokens('a -1', start=1)] == [(fJsonTokenType.TokenKind_NUMBER, 2, 2, 4)]
+    assert [token[:4] for token in lexer.iter_tokens('a -1', start=1, previous=fJsonTokenType.TokenKind_IDENTIFIER)] == \
+        [(fJsonTokenType.TokenKind_SYMBOL, 2, 2, 3), (fJsonTokenType.TokenKind_NUMBER, 3, 3, 4)]
@@ -0,0 +1,64 @@
+"""
+fJsonLiteral: 只含字面量的括号分组直接切分，结果与经过各个表达式匹配器的结果相同
+"""
+import random
+
+import pytest
+
+from fJson import decode
+from fJson import fjson
+from fJson.fjson import fJsonLexer
+
+SCALARS = ['1', '-2.5', '1e3', 'true', 'null', 'a', 'b', '"s"', '"中"', "'t'", '$"YQ=="', 'R"x(r)x"']
+
+
+def random_group(rng, depth=0):
+    # 括号内除逗号和冒号外没有运算符的分组，偶尔夹带运算符或相邻的值使它不是字面量分组
+    if depth > 3 or rng.random() < 0.35:
+        item = rng.choice(SCALARS)
+        roll = rng.random()
+        if roll < 0.05:
+            return item + ' ' + rng.choice(SCALARS)
+        if roll < 0.1:
+            return item + ' + ' + rng.choice(SCALARS)
+        return item
+    opening, closing = rng.choice(['[]', '{}', '()'])
+    items = []
+    for _ in range(rng.choice([0, 1, 1, 2, 3, 5])):
+        item = random_group(rng, depth + 1)
+        if rng.random() < 0.4:
+            item = random_group(rng, depth + 1) + ': ' + item
+        items.append(item)
+    separator = rng.choice([', ', ',', ' ,\n'])
+    return opening + separator.join(items) + rng.choice(['', '', ',']) + closing
+
+
+def outcome(text, engine):
+    try:
+        return 'ok', decode(text, engine=engine)
+    except Exception as e:
+        return 'error', str(e)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_literal_groups(seed, monkeypatch):
+    rng = random.Random(seed)
+    texts = [random_group(rng) for _ in range(300)]
+    expected = [outcome(text, 'builder') for text in texts]
+    assert sum(result[0] == 'ok' for result in expected) > 100
+    # 关掉fJsonLiteral后每个分组都经过匹配器
+    monkeypatch.setattr(fjson.fJsonLiteral, 'match', lambda self: None)
+    for text, result in zip(texts, expected):
+        assert outcome(text, 'builder') == result, text
+        if result[0] == 'ok':
+            assert decode(text, engine='parser') == result[1], text
+
+
+def test_marked_groups():
+    # 只有括号内(不含更深的分组)没有运算符的左括号被标记，函数调用和相邻的值不是运算符
+    for text, marked in (('[1, 2]', [1]), ('{a: [1], b: (2)}', [1, 1, 1]), ('[1 + 2, [3]]', [0, 1]), ('[f(x), {a b}]', [1, 1, 1]),
+                         ('[[1] * 2]', [0, 1]), ('{}', [1])):
+        tokens = fJsonLexer().concat_negative_number(fJsonLexer().reject_comments(fJsonLexer().tokenize(text)))
+        tokens.pair_brackets()
+        openings = [index for index in range(len(tokens)) if tokens.text(index) in ('[', '{', '(')]
+        assert [tokens.literal_groups[index] for index in openings] == marked, text
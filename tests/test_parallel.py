@@ -0,0 +1,88 @@
+"""
+split_top_level和decode_parallel: 按顶层元素切分后分段解析，结果与decode相同
+"""
+import random
+
+import pytest
+
+from fJson import decode, decode_parallel, encode
+from fJson.fjson import split_top_level
+
+# 括号、逗号出现在字符串、原始字符串和注释中
+TRICKY = ['R"d(a,],)d"', "'x\\',y'", '"""a,"b"]"""', '$"YQ=="', '“q,]”', '"e\\",f"', '-2', '1.5e3', 'true', 'null', 'abc']
+
+
+def random_value(rng, depth=0):
+    choice = rng.random()
+    if choice < 0.4 or depth > 2:
+        return rng.choice(TRICKY)
+    if choice < 0.6:
+        return '[' + ', '.join(random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))) + ']'
+    if choice < 0.8:
+        return '{' + ', '.join('k%d: %s' % (i, random_value(rng, depth + 1)) for i in range(rng.randint(1, 3))) + '}'
+    return encode(rng.choice([[1, 'a,]'], {'z': '}'}, 'q"', (1, 2)]))
+
+
+def random_document(rng):
+    opener, closing = rng.choice([('[', ']'), ('{', '}')])
+    items = []
+    for _ in range(rng.randint(2, 40)):
+        value = random_value(rng)
+        if rng.random() < 0.2:
+            value = rng.choice(['// c, ]\n', '/* ,} */ ']) + value
+        items.append(('k%d: ' % rng.randint(0, 30) if opener == '{' else '') + value)
+    return opener + ', '.join(items) + closing
+
+
+def outcome(function, *args, **kwargs):
+    try:
+        return 'ok', function(*args, **kwargs)
+    except Exception:
+        return 'error', None
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_split_top_level(seed):
+    # 每个范围单独放进同样的括号中解析，拼接后与整体解析的结果相同
+    rng = random.Random(seed)
+    for _ in range(50):
+        text = random_document(rng)
+        opener, ranges = split_top_level(text)
+        closing = {'[': ']', '{': '}'}[opener]
+        parts = [decode(opener + text[begin:end] + closing) for begin, end in ranges]
+        expected = decode(text)
+        if opener == '[':
+            assert [item for part in parts for item in part] == expected, text
+        else:
+            merged = {}
+            for part in parts:
+                merged.update(part)
+            assert merged == expected and list(merged) == list(expected), text
+
+
+@pytest.mark.parametrize('text', ['[1] + [2]', '[1, 2', 'x R"d(,)d"', '[a */ b]', '1, 2', '{a: 1} {b: 2}'])
+def test_split_top_level_refuses(text):
+    assert split_top_level(text) is None
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_decode_parallel(seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        text = random_document(rng)
+        engine = rng.choice(['builder', 'parser', 'stack'])
+        expected = outcome(decode, text, engine)
+        actual = outcome(decode_parallel, text, 2, engine, min_size=0)
+        assert actual == expected, text
+        if expected[0] == 'ok':
+            assert list(actual[1]) == list(expected[1])
+
+
+@pytest.mark.parametrize('text', ['[1] * 3', '{a: 1, b}', '{a: 1, b: 2}}', '[1, 2, [3', '[{}, {}]', '{a: 1, a: 2}', '[1, 2] + [3]'])
+def test_decode_parallel_fallback(text):
+    assert outcome(decode_parallel, text, 2, min_size=0) == outcome(decode, text)
+
+
+def test_decode_parallel_large():
+    text = '[' + ', '.join('{id: %d, name: "item, %d", tags: [a, "]"]}' % (i, i) for i in range(5000)) + ']'
+    assert decode_parallel(text, 2, min_size=0) == decode(text)
@@ -0,0 +1,27 @@
+"""
+DecodeProfile: builder引擎的匹配器按自身耗时记录，parser、stack引擎只报告各阶段
+"""
+import pytest
+
+from fJson import decode, DecodeProfile
+
+TEXT = '[' + ', '.join('{id: %d, tags: [a, b], ok: (1 + 2) * 3, f: g(x)}' % i for i in range(300)) + ']'
+
+
+def test_builder_self_time():
+    profile = DecodeProfile()
+    assert decode(TEXT, hook=profile) == decode(TEXT)
+    assert profile.matchers and profile.tokens > 0 and profile.max_depth == 3
+    total = sum(seconds for _, _, _, seconds in profile.matchers.values())
+    # 自身耗时之和不超过整个构建阶段
+    assert 0 < total <= profile.stages['build']
+    for attempts, matched, failed, seconds in profile.matchers.values():
+        assert attempts == matched + failed and seconds >= 0
+
+
+@pytest.mark.parametrize('engine', ['parser', 'stack'])
+def test_stage_totals_only(engine):
+    profile = DecodeProfile()
+    assert decode(TEXT, engine, hook=profile) == decode(TEXT)
+    assert profile.matchers == {}
+    assert set(profile.stages) >= {'lex', 'pair_brackets', 'build'} and profile.tokens > 0